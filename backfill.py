@@ -0,0 +1,38 @@
+from modules.DatabaseManager import DatabaseManager
+from modules.processor import DataProcessor
+import argparse
+import logging
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+)
+
+logger = logging.getLogger(__name__)
+
+# Derived columns -> DataProcessor method filling them
+BACKFILLS = {
+    "geo": DataProcessor.backfill_geo_cells,
+    "prices": DataProcessor.backfill_prices,
+}
+
+
+def backfill(column: str, batch_size: int) -> int:
+    db_manager = DatabaseManager(profile="worker")
+    processor = DataProcessor(db_manager)
+    updated = BACKFILLS[column](processor, batch_size=batch_size)
+    logger.info(f"Backfilled {column} of {updated} ads")
+    return updated
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Fill derived ad columns of rows stored before the columns existed")
+    parser.add_argument("column", choices=sorted(BACKFILLS), help="derived columns to fill")
+    parser.add_argument("--batch-size", type=int, default=5000, help="ads per transaction")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    backfill(args.column, args.batch_size)
@@ -0,0 +1,150 @@
+from typing import Any, Dict, List, Optional
+from sqlalchemy import event
+from modules.DatabaseManager import DatabaseManager
+from modules.models import Base
+from modules.processor import DataProcessor
+from benchmarks.payload import iter_pages
+import argparse
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [20, 1_000, 100_000, 1_000_000]
+
+
+class QueryCounter:
+    """Counts statements sent to the database; an executemany counts once."""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def _database_url(database: str, workdir: str) -> Optional[str]:
+    if database == "sqlite":
+        return f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    return os.getenv("BENCH_POSTGRES_URL")
+
+
+def run_pass(processor: DataProcessor, counter: QueryCounter, size: int, batch_size: int, seed: int, trace_memory: bool) -> Dict[str, Any]:
+    """
+    Ingest `size` synthetic ads in batches of `batch_size` and measure the pass.
+
+    Only process_ads() calls are timed, payload generation is excluded. Peak memory is
+    traced with tracemalloc, which slows Python code down noticeably; disable it for
+    pure throughput numbers.
+    """
+    stats: Dict[str, int] = {}
+    timings: Dict[str, int] = {}
+    batch: List[Dict[str, Any]] = []
+    queries_before = counter.count
+    elapsed = 0.0
+    if trace_memory:
+        tracemalloc.start()
+
+    def flush():
+        nonlocal elapsed
+        started = time.perf_counter()
+        batch_stats = processor.process_ads(batch, timings)
+        elapsed += time.perf_counter() - started
+        for key, value in batch_stats.items():
+            stats[key] = stats.get(key, 0) + value
+        batch.clear()
+
+    for page in iter_pages(size, seed=seed):
+        batch.extend(page["ads"])
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    queries = counter.count - queries_before
+    return {
+        "seconds": round(elapsed, 3),
+        "ads_per_second": round(size / elapsed, 1) if elapsed else None,
+        "queries": queries,
+        "queries_per_ad": round(queries / size, 4),
+        "peak_memory_mb": round(peak / 2 ** 20, 2) if peak is not None else None,
+        "stats": stats,
+        "stage_ms": timings,
+    }
+
+
+def run_benchmark(database: str, size: int, batch_size: int, seed: int, workdir: str, trace_memory: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Benchmark one database at one listing size: a cold pass into empty tables and a
+    warm pass re-ingesting the same, unchanged ads.
+
+    WARNING: the PostgreSQL database behind BENCH_POSTGRES_URL is dropped and recreated.
+    """
+    url = _database_url(database, workdir)
+    if url is None:
+        logger.warning(f"Skipping {database}: BENCH_POSTGRES_URL is not set")
+        return None
+
+    db_manager = DatabaseManager(url, profile="ingest")
+    Base.metadata.drop_all(bind=db_manager.engine)
+    db_manager.create_tables()
+    counter = QueryCounter(db_manager.engine)
+    processor = DataProcessor(db_manager)
+
+    logger.info(f"{database}: ingesting {size} ads")
+    result = {
+        "database": database,
+        "ads": size,
+        "batch_size": batch_size,
+        "cold": run_pass(processor, counter, size, batch_size, seed, trace_memory),
+        "warm": run_pass(processor, counter, size, batch_size, seed, trace_memory),
+    }
+    db_manager.engine.dispose()
+    logger.info(f"{database}: {size} ads cold {result['cold']['ads_per_second']} ads/s, warm {result['warm']['ads_per_second']} ads/s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark DataProcessor ingest on synthetic chotot payloads")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="listing sizes in ads")
+    parser.add_argument("--databases", nargs="+", default=["sqlite", "postgres"], choices=["sqlite", "postgres"])
+    parser.add_argument("--batch-size", type=int, default=500, help="ads per process_ads() call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc for undisturbed throughput")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file receiving the results")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    logging.getLogger("modules").setLevel(logging.WARNING)
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for database in args.databases:
+            for size in args.sizes:
+                result = run_benchmark(database, size, args.batch_size, args.seed, workdir, not args.no_memory)
+                if result:
+                    results.append(result)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    logger.info(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
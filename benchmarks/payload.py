@@ -0,0 +1,155 @@
+from typing import Any, Dict, Iterator, List, Optional
+from modules.puller import ResponseDict
+import hashlib
+import random
+
+# Cities with a realistic spread of coordinates: (region, region_v2, name, lat, lon)
+REGIONS = [
+    (13, 13000, "Tp Hồ Chí Minh", 10.7769, 106.7009),
+    (12, 12000, "Hà Nội", 21.0278, 105.8342),
+    (3, 3017, "Đà Nẵng", 16.0544, 108.2022),
+    (9, 9008, "Cần Thơ", 10.0452, 105.7469),
+    (7, 7005, "Khánh Hòa", 12.2388, 109.1967),
+]
+
+CATEGORIES = [
+    (1010, "Căn hộ/Chung cư", "s"),
+    (1020, "Nhà ở", "s"),
+    (1030, "Văn phòng, Mặt bằng kinh doanh", "u"),
+    (1040, "Đất", "s"),
+    (1050, "Phòng trọ", "u"),
+]
+
+SUBJECT_WORDS = [
+    "Cho thuê", "Bán", "nhà", "căn hộ", "mặt bằng", "phòng trọ", "giá rẻ", "chính chủ",
+    "gần chợ", "mặt tiền", "hẻm xe hơi", "full nội thất", "view sông", "sổ hồng riêng",
+    "trung tâm", "yên tĩnh", "an ninh", "thoáng mát",
+]
+
+BODY_SENTENCES = [
+    "Nhà mới xây, sạch sẽ, thoáng mát, có chỗ để xe.",
+    "Điện nước giá nhà nước, wifi miễn phí.",
+    "Gần trường học, bệnh viện, siêu thị và chợ.",
+    "Khu dân cư an ninh, yên tĩnh, hẻm xe tải vào được.",
+    "Pháp lý rõ ràng, sổ hồng chính chủ, công chứng ngay.",
+    "Bàn giao nội thất cơ bản: máy lạnh, nóng lạnh, tủ bếp.",
+    "Liên hệ chính chủ, miễn trung gian. Gọi điện trực tiếp: ***",
+]
+
+PARAMS = [
+    ("commercial_type", "Loại hình văn phòng", ["Mặt bằng kinh doanh", "Văn phòng", "Shophouse"]),
+    ("furnishing_sell", "Tình trạng nội thất", ["Bàn giao thô", "Nội thất đầy đủ", "Nội thất cơ bản"]),
+    ("property_legal_document", "Giấy tờ pháp lý", ["Đã có sổ", "Đang chờ sổ", "Giấy tờ khác"]),
+    ("rooms", "Số phòng ngủ", ["1 phòng", "2 phòng", "3 phòng", "4 phòng"]),
+    ("direction", "Hướng cửa chính", ["Đông", "Tây", "Nam", "Bắc"]),
+]
+
+CDN = "https://cdn.chotot.com"
+
+# Newest list_time of the generated listing, in milliseconds like the API
+BASE_LIST_TIME = 1_750_000_000_000
+
+
+def _image_urls(rng: random.Random, ad_id: int, count: int) -> List[Dict[str, str]]:
+    images = []
+    for index in range(count):
+        digest = hashlib.md5(f"{ad_id}-{index}".encode()).hexdigest()
+        images.append({
+            "image": f"{CDN}/{digest[:43]}/preset:view/plain/{digest}-{ad_id}{index}.jpg",
+            "thumbnail": f"{CDN}/{digest[::-1][:43]}/preset:listing/plain/{digest}-{ad_id}{index}.jpg",
+        })
+    return images
+
+
+def _price_string(rng: random.Random, ad_type: str) -> str:
+    if ad_type == "u":
+        return f"{rng.choice([1.5, 2, 3.5, 5, 8, 12, 25])} triệu/tháng"
+    if rng.random() < 0.5:
+        return f"{rng.randint(1, 30)},{rng.randint(0, 9)} tỷ"
+    return f"{rng.randint(500, 990)} triệu"
+
+
+def make_ad(rng: random.Random, ad_id: int, list_time: int, account_count: int = 1000) -> Dict[str, Any]:
+    """One ad shaped like an entry of response.json's "ads" list."""
+    region, region_v2, region_name, lat, lon = rng.choice(REGIONS)
+    category, category_name, ad_type = rng.choice(CATEGORIES)
+    account_id = 10_000_000 + rng.randrange(account_count)
+    size = rng.choice([20, 35, 50, 75, 100, 150, 300])
+    images = _image_urls(rng, ad_id, rng.randint(1, 12))
+    latitude = round(lat + rng.uniform(-0.15, 0.15), 6)
+    longitude = round(lon + rng.uniform(-0.15, 0.15), 6)
+    params = [
+        {"id": param_id, "value": rng.choice(values), "label": label}
+        for param_id, label, values in rng.sample(PARAMS, rng.randint(1, len(PARAMS)))
+    ]
+    map_tile = f"{latitude:.6f}_{longitude:.6f}".replace(".", "x")
+    full_name = f"Anh {rng.choice(['Nam', 'Hùng', 'Minh', 'Tuấn', 'Lan', 'Hoa', 'Đức'])} {account_id % 97}"
+    area = region_v2 * 100 + rng.randint(1, 20)
+
+    return {
+        "ad_id": ad_id,
+        "list_id": ad_id - 42_000_000,
+        "list_time": list_time,
+        "state": "accepted",
+        "type": ad_type,
+        "account_name": full_name,
+        "region": region,
+        "category": category,
+        "subject": " ".join(rng.sample(SUBJECT_WORDS, rng.randint(3, 7))).capitalize(),
+        "body": "\n".join(rng.sample(BODY_SENTENCES, rng.randint(2, len(BODY_SENTENCES)))),
+        "image": images[0]["thumbnail"],
+        "account_id": account_id,
+        "images": [image["image"] for image in images],
+        "videos": [],
+        "contain_videos": 2,
+        "status": "active",
+        "commercial_type": rng.randint(1, 4),
+        "size": size,
+        "area": area % 1000,
+        "longitude": longitude,
+        "latitude": latitude,
+        "property_legal_document": rng.randint(1, 3),
+        "region_v2": region_v2,
+        "area_v2": area,
+        "ward": rng.randint(1000, 9999),
+        "furnishing_sell": rng.randint(1, 4),
+        "street_name": f"Đường số {rng.randint(1, 60)}",
+        "location_id": f"osm:W{rng.randint(10**8, 10**9)}",
+        "unique_street_id": hashlib.md5(f"street-{ad_id % 5000}".encode()).hexdigest(),
+        "is_main_street": rng.random() < 0.3,
+        "location": f"{latitude},{longitude}",
+        "full_name": full_name,
+        "date": rng.choice(["Hôm qua", "2 ngày trước", "1 tuần trước", "1 tháng trước"]),
+        "account_oid": hashlib.md5(str(account_id).encode()).hexdigest(),
+        "category_name": category_name,
+        "area_name": f"Quận {area % 12 + 1}",
+        "region_name": region_name,
+        "price_string": _price_string(rng, ad_type),
+        "webp_image": images[0]["thumbnail"].replace(".jpg", ".webp"),
+        "image_thumbnails": images,
+        "number_of_images": len(images),
+        "ward_name": f"Phường {rng.randint(1, 20)}",
+        "pty_map": f"{CDN}/admincentre/location/{map_tile}_c.jpg",
+        "pty_map_modifier": 0.0008,
+        "thumbnail_image": images[0]["thumbnail"],
+        "size_unit_string": "m²",
+        "params": params,
+        "seller_info": {"full_name": full_name, "avatar": f"{CDN}/uac2/{account_id}", "live_ads": rng.randint(1, 30)},
+    }
+
+
+def iter_pages(total_ads: int, page_size: int = 20, seed: int = 0, total: Optional[int] = None) -> Iterator[ResponseDict]:
+    """
+    Generate a synthetic listing of `total_ads` ads, newest first, one page at a time.
+
+    Pages are built lazily so arbitrarily large listings never sit in memory.
+    The same seed always produces the same listing.
+    """
+    rng = random.Random(seed)
+    account_count = max(total_ads // 10, 1)
+    for start in range(0, total_ads, page_size):
+        ads = [
+            make_ad(rng, 170_000_000 + total_ads - index, BASE_LIST_TIME - index * 60_000, account_count)
+            for index in range(start, min(start + page_size, total_ads))
+        ]
+        yield {"total": total if total is not None else total_ads, "ads": ads}
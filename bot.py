@@ -1,47 +1,36 @@
 from dotenv import load_dotenv
 from os import getenv
-from telebot import types, async_telebot
+from telebot import async_telebot
 
 from modules.DatabaseManager import DatabaseManager
-from modules.models import Ad
+from modules.images import IMAGE_CACHE_DIR, ImageCache
+from modules.poster import Poster
 from modules.processor import DataProcessor
+import argparse
 import asyncio
 
 load_dotenv()
 
 TELEGRAM_BOT_TOKEN=getenv("TELEGRAM_BOT_TOKEN", "")
 TELEGRAM_GROUP_LINK=getenv("TELEGRAM_GROUP_LINK", "")
+IMAGE_CACHE=getenv("IMAGE_CACHE_DIR", IMAGE_CACHE_DIR)
+# Comma-separated chats to post to, defaults to the group link
+TELEGRAM_CHATS=[chat.strip() for chat in getenv("TELEGRAM_CHATS", TELEGRAM_GROUP_LINK).split(",") if chat.strip()]
+# Ads handled per run, at 20 messages per minute per chat a run of 50 ads takes a few minutes
+DEFAULT_LIMIT = 50
 
 
-def formatted_message(ad: Ad) -> str:
-    max_length = 950
-    message = f"""
-{ad.subject}\n{ad.body}\n
-"""
-    if len(message) > max_length:
-        message = message[:max_length-3] + "..."
-    return message
-
-
-async def main():
-    db_manager = DatabaseManager()
+async def main(limit: int = DEFAULT_LIMIT):
+    db_manager = DatabaseManager(profile="worker")
     
     # Initialize data processor
     processor = DataProcessor(db_manager)
-    ads = processor.get_recent_ads(5)
-    print(f"Link: {TELEGRAM_GROUP_LINK}")
+    print(f"Chats: {', '.join(TELEGRAM_CHATS)}")
     bot = async_telebot.AsyncTeleBot(TELEGRAM_BOT_TOKEN)
     try:
-        for i, ad in enumerate(ads):
-            print(f"ad {ad.id}")
-            media_group = [types.InputMediaPhoto(image.image_url) for image in ad.images[:7]]
-            media_group[0].caption = f"#{i + 1} of Top 5 annonces of this week!\n\n"
-            media_group[0].caption += formatted_message(ad)
-            await bot.send_media_group(
-                TELEGRAM_GROUP_LINK,
-                media=media_group,
-            )
-            await asyncio.sleep(2)
+        poster = Poster(bot, processor, TELEGRAM_CHATS, image_cache=ImageCache(IMAGE_CACHE))
+        stats = await poster.run(limit=limit or None)
+        print(f"Posted {stats['ads']} ads ({stats['posts']} posts), {stats['failed']} failed")
     except Exception as e:
         print(f"Error! {e}")
     finally:
@@ -49,5 +38,12 @@ async def main():
         await bot.close_session()
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Post unposted ads to the Telegram chats")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help=f"maximum number of ads to post, 0 for no limit (default {DEFAULT_LIMIT})")
+    return parser.parse_args()
+
+
 if __name__=="__main__":
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args()
+    asyncio.run(main(args.limit))
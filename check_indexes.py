@@ -0,0 +1,95 @@
+from typing import Dict, List, Tuple
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from modules.DatabaseManager import DatabaseManager
+from modules.models import Ad, AdImage, AdParameter
+from modules.geo import bounding_box, cover
+from modules.processor import ad_range_query, cell_query, recent_ads_query, untranslated_ads_query, unposted_ads_query
+import logging
+import sys
+
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+logger = logging.getLogger(__name__)
+
+
+def hot_queries() -> Dict[str, Tuple[object, str]]:
+    """Queries issued by the processor and the bot, with the index each one must use."""
+    ad_ids = [1, 2, 3]
+    return {
+        "child image diff": (
+            select(AdImage.id, AdImage.ad_id_fk, AdImage.image_url).where(AdImage.ad_id_fk.in_(ad_ids)),
+            "ix_ad_image_ad_id_fk",
+        ),
+        "child parameter diff": (
+            select(AdParameter.id, AdParameter.ad_id_fk, AdParameter.value).where(AdParameter.ad_id_fk.in_(ad_ids)),
+            "ix_ad_parameter_ad_id_fk",
+        ),
+        "child image delete": (
+            delete(AdImage).where(AdImage.ad_id_fk.in_(ad_ids)),
+            "ix_ad_image_ad_id_fk",
+        ),
+        "recent ads": (recent_ads_query(10), "ix_ad_created_at"),
+        "untranslated queue": (untranslated_ads_query(10), "ix_ad_untranslated"),
+        "unposted queue": (unposted_ads_query(10), "ix_ad_unposted"),
+        "crawl window": (
+            select(Ad.id).where(Ad.list_time > 0).order_by(Ad.list_time.desc()).limit(10),
+            "ix_ad_list_time",
+        ),
+        "price range": (
+            ad_range_query({"price_unit": "sale", "min_price": 10**9, "max_price": 3 * 10**9}),
+            "ix_ad_price",
+        ),
+        "price per m2 range": (
+            ad_range_query({"price_unit": "rent", "max_price_per_m2": 300_000}, order_by="price_per_m2"),
+            "ix_ad_price_per_m2",
+        ),
+        "size range": (
+            ad_range_query({"min_size": 50, "max_size": 80}, order_by="size"),
+            "ix_ad_size",
+        ),
+        "location cells": (
+            cell_query(cover(*bounding_box(10.7769, 106.7009, 2))),
+            "ix_ad_geo_cell",
+        ),
+    }
+
+
+def explain(session: Session, statement) -> List[str]:
+    """Plan of a statement, EXPLAIN QUERY PLAN on SQLite and EXPLAIN on PostgreSQL."""
+    dialect = session.get_bind().dialect
+    compiled = statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    prefix = "EXPLAIN QUERY PLAN" if dialect.name == "sqlite" else "EXPLAIN"
+    rows = session.connection().exec_driver_sql(f"{prefix} {compiled}").all()
+    return [str(row[-1]) for row in rows]
+
+
+def check_indexes() -> bool:
+    """
+    EXPLAIN every hot query and verify it uses its index.
+
+    On PostgreSQL sequential scans are disabled for the check, so the result does not
+    depend on how many rows the tables hold. Returns True if every query passed.
+    """
+    db_manager = DatabaseManager()
+    db_manager.create_tables()
+    session = db_manager.get_session()
+    ok = True
+    try:
+        if session.get_bind().dialect.name == "postgresql":
+            session.execute(select(1))
+            session.connection().exec_driver_sql("SET LOCAL enable_seqscan = off")
+        for name, (statement, index) in hot_queries().items():
+            plan = explain(session, statement)
+            used = any(index in line for line in plan)
+            ok &= used
+            logger.info(f"{'OK  ' if used else 'FAIL'} {name}: expected {index}")
+            for line in plan:
+                logger.info(f"       {line}")
+    finally:
+        session.rollback()
+        session.close()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_indexes() else 1)
@@ -0,0 +1,90 @@
+from typing import List, Optional
+from aio_pika import ExchangeType
+from modules.DatabaseManager import DatabaseManager
+from modules.processor import DataProcessor
+from modules.puller import Puller
+from modules.rabbit.connection import EVENTS_EXCHANGE, connect
+from modules.rabbit.crawl import Coordinator, FetchWorker, IngestWorker
+from modules.rabbit.events import EventRelay
+from modules.rabbit.producer import Producer
+import argparse
+import asyncio
+import logging
+
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def coordinate(categories: List[str], regions: List[str], max_pages: Optional[int]):
+    async with Producer(exchange_name="") as producer:
+        coordinator = Coordinator(producer, max_pages=max_pages)
+        total = 0
+        for category in categories:
+            for region in regions or [None]:
+                params = {**Puller.params, "cg": category}
+                if region:
+                    params["region_v2"] = region
+                total += await coordinator.plan(params)
+        logger.info(f"Planned {total} pages")
+
+
+async def fetch(concurrency: int, rps: Optional[float]):
+    connection = await connect()
+    async with connection, Producer(exchange_name="") as producer:
+        await FetchWorker(await connection.channel(), producer, concurrency=concurrency, requests_per_second=rps).run()
+
+
+async def ingest(prefetch: int, batch_pages: int):
+    db_manager = DatabaseManager(profile="ingest")
+    db_manager.create_tables()
+    processor = DataProcessor(db_manager)
+    connection = await connect()
+    async with connection:
+        await IngestWorker(await connection.channel(), processor, prefetch=prefetch, batch_pages=batch_pages).run()
+
+
+async def relay(batch_size: int):
+    db_manager = DatabaseManager(profile="worker")
+    db_manager.create_tables()
+    processor = DataProcessor(db_manager)
+    async with Producer(exchange_name=EVENTS_EXCHANGE, exchange_type=ExchangeType.TOPIC) as producer:
+        await EventRelay(processor, producer, batch_size=batch_size).run()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Distributed crawl over RabbitMQ: one coordinator, any number of workers")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    coordinator = commands.add_parser("coordinate", help="publish page-fetch tasks")
+    coordinator.add_argument("--category", nargs="+", default=[Puller.params["cg"]], help="chotot category ids (cg)")
+    coordinator.add_argument("--region", nargs="*", default=[], help="chotot region ids (region_v2), all regions by default")
+    coordinator.add_argument("--pages", type=int, default=0, help="maximum number of pages per query, 0 for no limit")
+
+    fetcher = commands.add_parser("fetch", help="run a fetch worker")
+    fetcher.add_argument("--concurrency", type=int, default=8, help="maximum number of pages fetched at a time")
+    fetcher.add_argument("--rps", type=float, default=None, help="maximum requests per second of this worker")
+
+    ingester = commands.add_parser("ingest", help="run an ingest worker")
+    ingester.add_argument("--prefetch", type=int, default=100, help="pages delivered ahead of the write")
+    ingester.add_argument("--batch-pages", type=int, default=25, help="pages written per transaction")
+
+    relayer = commands.add_parser("relay", help="publish ad change events to the events exchange")
+    relayer.add_argument("--batch-size", type=int, default=500, help="events published per round")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "coordinate":
+        asyncio.run(coordinate(args.category, args.region, args.pages or None))
+    elif args.command == "fetch":
+        asyncio.run(fetch(args.concurrency, args.rps))
+    elif args.command == "ingest":
+        asyncio.run(ingest(args.prefetch, args.batch_pages))
+    else:
+        asyncio.run(relay(args.batch_size))
@@ -1,8 +1,11 @@
 import json
 from typing import Optional
 from modules.puller import Puller, ResponseDict
-from modules.processor import DataProcessor
+from modules.processor import AsyncDataProcessor, DataProcessor
+from modules.pipeline import IngestPipeline
 from modules.DatabaseManager import DatabaseManager
+from modules.metrics import REGISTRY
+import argparse
 import logging
 import asyncio
 
@@ -20,28 +23,97 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 logger.info("Application started")
 
-async def main():
+async def main(pages: int = 0, concurrency: int = 8, rps: Optional[float] = None, full: bool = False, async_db: bool = False):
     # Initialize database manager
-    db_manager = DatabaseManager()
+    db_manager = DatabaseManager(async_=async_db, profile="ingest")
     
-    # Create tables if they don't exist
-    db_manager.create_tables()
-    
-    # Initialize data processor
-    processor = DataProcessor(db_manager)
+    # Create tables if they don't exist and initialize data processor
+    if async_db:
+        await db_manager.create_tables_async()
+        processor = AsyncDataProcessor(db_manager)
+    else:
+        db_manager.create_tables()
+        processor = DataProcessor(db_manager)
     
     # Get data from puller
-    puller = Puller()
-    res_dict: Optional[ResponseDict] = await puller.get_response()
+    max_pages = pages if pages > 0 else None
+    received = 0
+    failed_writes = 0
     
-    if res_dict:
-        logger.info("Response received, processing data...")
-        # Process and save data to database
-        stats = processor.process_response(res_dict)
-        logger.info(f"Data processing completed: {stats}")
-    else:
+    async with Puller(requests_per_second=rps) as puller:
+        query_key = puller.query_key()
+        if full:
+            watermark = None
+        elif async_db:
+            watermark = await processor.get_watermark(query_key)
+        else:
+            watermark = processor.get_watermark(query_key)
+        logger.info(f"Crawling {query_key} since {watermark}")
+        newest = watermark
+        
+        if watermark is None:
+            # Full crawl: stream ads into batched writes while pages are still downloading
+            pipeline = IngestPipeline(puller, processor)
+            stats = await pipeline.run(max_pages=max_pages, concurrency=concurrency)
+            logger.info(f"Data processing completed: {stats}")
+            received = stats["pages"]
+            failed_writes = stats.get("errors", 0)
+            newest = pipeline.newest
+        else:
+            async for res_dict in puller.iter_new_pages(watermark, max_pages=max_pages, concurrency=concurrency):
+                received += 1
+                logger.info("Response received, processing data...")
+                # Process and save data to database
+                try:
+                    if async_db:
+                        stats = await processor.process_response(res_dict)
+                    else:
+                        stats = await asyncio.to_thread(processor.process_response, res_dict)
+                except Exception as e:
+                    logger.error(f"Database unavailable, stopping the crawl: {e}")
+                    failed_writes += len(res_dict.get("ads", []))
+                    break
+                logger.info(f"Data processing completed: {stats}")
+                failed_writes += stats.get("errors", 0)
+                newest = Puller.newest(res_dict.get("ads", []), newest)
+        failed_pages = puller.failed_pages
+    
+    if not received:
         logger.warning("No response received from puller")
+    elif failed_pages or failed_writes:
+        # The listing is crawled newest first, so the watermark means "everything newer
+        # is stored": a failed page or ad anywhere in the run keeps the old one and the
+        # next run crawls the gap again
+        logger.warning(f"Keeping watermark {watermark}: {failed_pages} pages failed to download, {failed_writes} ads failed to save")
+    elif newest is not None:
+        # Advance only after every page of the run has been written
+        if async_db:
+            await processor.save_watermark(query_key, newest)
+        else:
+            processor.save_watermark(query_key, newest)
+    
+    if async_db:
+        await db_manager.engine.dispose()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Download ads from chotot and save them to the database")
+    parser.add_argument("--pages", type=int, default=0, help="maximum number of pages to fetch, 0 for no limit")
+    parser.add_argument("--full", action="store_true", help="ignore the stored watermark and crawl the whole listing")
+    parser.add_argument("--concurrency", type=int, default=8, help="maximum number of requests in flight")
+    parser.add_argument("--rps", type=float, default=None, help="maximum requests per second, unlimited by default")
+    parser.add_argument("--async-db", action="store_true", help="write through the async engine (asyncpg/aiosqlite)")
+    parser.add_argument("--metrics-file", default=None, help="write Prometheus metrics to this file when the run ends")
+    parser.add_argument("--metrics-port", type=int, default=None, help="serve Prometheus metrics on this port while running")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.metrics_port:
+        REGISTRY.serve(args.metrics_port)
+    try:
+        asyncio.run(main(args.pages, args.concurrency, args.rps, args.full, args.async_db))
+    finally:
+        if args.metrics_file:
+            REGISTRY.write_textfile(args.metrics_file)
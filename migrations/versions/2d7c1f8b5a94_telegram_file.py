@@ -0,0 +1,35 @@
+"""telegram file
+
+Revision ID: 2d7c1f8b5a94
+Revises: e9a4b6f2c318
+Create Date: 2026-10-18 19:04:31.852216
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d7c1f8b5a94'
+down_revision: Union[str, Sequence[str], None] = 'e9a4b6f2c318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('telegram_file',
+    sa.Column('content_hash', sa.String(length=32), nullable=False),
+    sa.Column('file_id', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('content_hash')
+    )
+    op.add_column('ad_image', sa.Column('content_hash', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ad_image', 'content_hash')
+    op.drop_table('telegram_file')
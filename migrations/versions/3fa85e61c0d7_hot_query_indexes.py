@@ -0,0 +1,46 @@
+"""hot query indexes
+
+Revision ID: 3fa85e61c0d7
+Revises: d41b7c9e2a63
+Create Date: 2026-10-18 11:26:09.340175
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3fa85e61c0d7'
+down_revision: Union[str, Sequence[str], None] = 'd41b7c9e2a63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_ad_image_ad_id_fk', 'ad_image', ['ad_id_fk'])
+    op.create_index('ix_ad_parameter_ad_id_fk', 'ad_parameter', ['ad_id_fk'])
+    op.create_index('ix_ad_created_at', 'ad', ['created_at'])
+    op.create_index('ix_ad_list_time', 'ad', ['list_time'])
+    op.create_index(
+        'ix_ad_untranslated', 'ad', ['created_at'],
+        postgresql_where=sa.text('translated IS NOT true'),
+        sqlite_where=sa.text('translated IS NOT 1'),
+    )
+    op.create_index(
+        'ix_ad_unposted', 'ad', ['created_at'],
+        postgresql_where=sa.text('posted IS NULL'),
+        sqlite_where=sa.text('posted IS NULL'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ad_unposted', table_name='ad')
+    op.drop_index('ix_ad_untranslated', table_name='ad')
+    op.drop_index('ix_ad_list_time', table_name='ad')
+    op.drop_index('ix_ad_created_at', table_name='ad')
+    op.drop_index('ix_ad_parameter_ad_id_fk', table_name='ad_parameter')
+    op.drop_index('ix_ad_image_ad_id_fk', table_name='ad_image')
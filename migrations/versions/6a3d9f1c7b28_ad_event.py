@@ -0,0 +1,41 @@
+"""ad event
+
+Revision ID: 6a3d9f1c7b28
+Revises: 2d7c1f8b5a94
+Create Date: 2026-10-18 20:12:47.305518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a3d9f1c7b28'
+down_revision: Union[str, Sequence[str], None] = '2d7c1f8b5a94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ad_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ad_id_fk', sa.Integer(), nullable=True),
+    sa.Column('ad_id', sa.BigInteger(), nullable=True),
+    sa.Column('kind', sa.String(length=16), nullable=True),
+    sa.Column('data', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['ad_id_fk'], ['ad.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_ad_event_ad_id_fk', 'ad_event', ['ad_id_fk'])
+    op.add_column('ad', sa.Column('text_hash', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ad', 'text_hash')
+    op.drop_index('ix_ad_event_ad_id_fk', table_name='ad_event')
+    op.drop_table('ad_event')
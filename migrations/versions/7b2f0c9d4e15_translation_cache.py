@@ -0,0 +1,37 @@
+"""translation cache
+
+Revision ID: 7b2f0c9d4e15
+Revises: 3fa85e61c0d7
+Create Date: 2026-10-18 13:41:52.208114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b2f0c9d4e15'
+down_revision: Union[str, Sequence[str], None] = '3fa85e61c0d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('translation_cache',
+    sa.Column('key', sa.String(length=32), nullable=False),
+    sa.Column('target_language', sa.String(length=8), nullable=True),
+    sa.Column('prompt_version', sa.Integer(), nullable=True),
+    sa.Column('subject', sa.Text(), nullable=True),
+    sa.Column('body', sa.Text(), nullable=True),
+    sa.Column('hits', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('key')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('translation_cache')
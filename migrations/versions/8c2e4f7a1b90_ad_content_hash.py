@@ -0,0 +1,28 @@
+"""ad content hash
+
+Revision ID: 8c2e4f7a1b90
+Revises: 5b6d3e5eeb21
+Create Date: 2026-10-18 09:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2e4f7a1b90'
+down_revision: Union[str, Sequence[str], None] = '5b6d3e5eeb21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ad', sa.Column('content_hash', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ad', 'content_hash')
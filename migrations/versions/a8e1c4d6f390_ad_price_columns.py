@@ -0,0 +1,39 @@
+"""ad price columns
+
+Revision ID: a8e1c4d6f390
+Revises: 6a3d9f1c7b28
+Create Date: 2026-10-18 21:03:15.627904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8e1c4d6f390'
+down_revision: Union[str, Sequence[str], None] = '6a3d9f1c7b28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ad', sa.Column('price', sa.BigInteger(), nullable=True))
+    op.add_column('ad', sa.Column('price_unit', sa.String(length=8), nullable=True))
+    op.add_column('ad', sa.Column('price_per_m2', sa.Float(), nullable=True))
+    op.create_index('ix_ad_price', 'ad', ['price_unit', 'price'])
+    op.create_index('ix_ad_price_per_m2', 'ad', ['price_unit', 'price_per_m2'])
+    op.create_index('ix_ad_size', 'ad', ['size'])
+    # Existing rows are filled by `python backfill.py prices`
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ad_size', table_name='ad')
+    op.drop_index('ix_ad_price_per_m2', table_name='ad')
+    op.drop_index('ix_ad_price', table_name='ad')
+    op.drop_column('ad', 'price_per_m2')
+    op.drop_column('ad', 'price_unit')
+    op.drop_column('ad', 'price')
@@ -0,0 +1,30 @@
+"""translation claims
+
+Revision ID: c5e8a3d17f02
+Revises: 7b2f0c9d4e15
+Create Date: 2026-10-18 15:12:06.734590
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e8a3d17f02'
+down_revision: Union[str, Sequence[str], None] = '7b2f0c9d4e15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ad', sa.Column('translation_claim', sa.String(length=32), nullable=True))
+    op.add_column('ad', sa.Column('translation_claimed_until', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ad', 'translation_claimed_until')
+    op.drop_column('ad', 'translation_claim')
@@ -0,0 +1,36 @@
+"""crawl state
+
+Revision ID: d41b7c9e2a63
+Revises: 8c2e4f7a1b90
+Create Date: 2026-10-18 10:03:17.581932
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41b7c9e2a63'
+down_revision: Union[str, Sequence[str], None] = '8c2e4f7a1b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('crawl_state',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('query_key', sa.String(), nullable=True),
+    sa.Column('max_list_time', sa.BigInteger(), nullable=True),
+    sa.Column('max_ad_id', sa.BigInteger(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('query_key')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('crawl_state')
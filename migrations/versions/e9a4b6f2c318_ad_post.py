@@ -0,0 +1,37 @@
+"""ad post
+
+Revision ID: e9a4b6f2c318
+Revises: c5e8a3d17f02
+Create Date: 2026-10-18 17:26:44.391027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9a4b6f2c318'
+down_revision: Union[str, Sequence[str], None] = 'c5e8a3d17f02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ad_post',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ad_id_fk', sa.Integer(), nullable=True),
+    sa.Column('chat_id', sa.String(), nullable=True),
+    sa.Column('message_id', sa.BigInteger(), nullable=True),
+    sa.Column('posted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['ad_id_fk'], ['ad.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('ad_id_fk', 'chat_id', name='uq_ad_post_ad_chat')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ad_post')
@@ -0,0 +1,31 @@
+"""ad geo cell
+
+Revision ID: f47b2e9d0c15
+Revises: a8e1c4d6f390
+Create Date: 2026-10-18 21:48:52.194630
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f47b2e9d0c15'
+down_revision: Union[str, Sequence[str], None] = 'a8e1c4d6f390'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ad', sa.Column('geo_cell', sa.BigInteger(), nullable=True))
+    op.create_index('ix_ad_geo_cell', 'ad', ['geo_cell'])
+    # Existing rows are filled by `python backfill.py geo`
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ad_geo_cell', table_name='ad')
+    op.drop_column('ad', 'geo_cell')
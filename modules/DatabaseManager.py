@@ -1,4 +1,7 @@
-from sqlalchemy import create_engine
+from typing import Any, Dict, TypedDict
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from modules.models import Base
 from dotenv import load_dotenv
@@ -8,15 +11,134 @@ import os
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+
+class EngineProfile(TypedDict, total=False):
+    pool_size: int
+    max_overflow: int
+    pool_timeout: int
+    pool_recycle: int
+    pool_pre_ping: bool
+    statement_timeout_ms: int  # PostgreSQL statement_timeout, SQLite busy_timeout
+    insertmanyvalues_page_size: int
+
+
+# Engine tuning per workload, selected with DatabaseManager(profile=...) or the DB_PROFILE env var
+ENGINE_PROFILES: Dict[str, EngineProfile] = {
+    # Library defaults plus connection health checks
+    "default": {
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+    },
+    # Few long bulk transactions: small pool, large executemany pages, generous timeout
+    "ingest": {
+        "pool_size": 4,
+        "max_overflow": 4,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+        "statement_timeout_ms": 120_000,
+        "insertmanyvalues_page_size": 2000,
+    },
+    # Many short concurrent reads (bot, dashboards): wide pool, short timeout
+    "reader": {
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pool_timeout": 10,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+        "statement_timeout_ms": 15_000,
+    },
+    # Queue workers (translation, posting): a couple of connections each
+    "worker": {
+        "pool_size": 2,
+        "max_overflow": 2,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+        "statement_timeout_ms": 30_000,
+    },
+}
+
+# Applied to every SQLite connection: WAL lets readers run alongside the writer
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # KiB
+    "temp_store": "MEMORY",
+}
+
 class DatabaseManager:
-    def __init__(self, database_url: str = None):
+    def __init__(self, database_url: str = None, async_: bool = False, profile: str = None):
+        """
+        Args:
+            database_url (str): SQLAlchemy URL, taken from the environment when omitted
+            async_ (bool): Build an AsyncEngine (asyncpg/aiosqlite); get_session() then
+                returns an AsyncSession and tables are created with create_tables_async()
+            profile (str): Name in ENGINE_PROFILES used when DB_PROFILE is not set,
+                "default" if neither is given
+        """
+        self.async_ = async_
         if database_url is None:
-            database_url = self._get_database_url()
+            database_url = self._get_database_url(async_)
+        
+        self.profile = os.getenv("DB_PROFILE") or profile or "default"
+        if self.profile not in ENGINE_PROFILES:
+            raise ValueError(f"Unknown engine profile {self.profile!r}, expected one of {sorted(ENGINE_PROFILES)}")
+        engine_kwargs = self._engine_kwargs(database_url, ENGINE_PROFILES[self.profile])
+        logger.info(f"Using engine profile {self.profile}")
+        
+        if async_:
+            self.engine = create_async_engine(database_url, **engine_kwargs)
+            sync_engine = self.engine.sync_engine
+            self.SessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=self.engine)
+        else:
+            self.engine = create_engine(database_url, **engine_kwargs)
+            sync_engine = self.engine
+            self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        
+        if sync_engine.dialect.name == "sqlite":
+            busy_timeout = ENGINE_PROFILES[self.profile].get("statement_timeout_ms", 30_000)
+            event.listen(sync_engine, "connect", self._sqlite_pragmas(busy_timeout))
+    
+    def _engine_kwargs(self, database_url: str, profile: EngineProfile) -> Dict[str, Any]:
+        """Translate a profile into create_engine() arguments for the URL's dialect and driver."""
+        url = make_url(database_url)
+        kwargs: Dict[str, Any] = {}
+        for key in ("pool_recycle", "pool_pre_ping"):
+            if key in profile:
+                kwargs[key] = profile[key]
+        
+        if url.get_backend_name() != "postgresql":
+            return kwargs
+        
+        for key in ("pool_size", "max_overflow", "pool_timeout", "insertmanyvalues_page_size"):
+            if key in profile:
+                kwargs[key] = profile[key]
         
-        self.engine = create_engine(database_url)
-        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        driver = url.get_driver_name()
+        if driver == "psycopg2":
+            # execute_batch for executemany UPDATE/DELETE, INSERTs already use multi-row VALUES
+            kwargs["executemany_mode"] = "values_plus_batch"
+        timeout = profile.get("statement_timeout_ms")
+        if timeout:
+            if driver == "asyncpg":
+                kwargs["connect_args"] = {"server_settings": {"statement_timeout": str(timeout)}}
+            else:
+                kwargs["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+        return kwargs
     
-    def _get_database_url(self) -> str:
+    @staticmethod
+    def _sqlite_pragmas(busy_timeout: int):
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+                for name, value in SQLITE_PRAGMAS.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+            finally:
+                cursor.close()
+        return set_pragmas
+    
+    def _get_database_url(self, async_: bool = False) -> str:
         """Get database URL from environment variables, fallback to SQLite"""
         db_user = os.getenv("DB_USER")
         db_password = os.getenv("DB_PASSWORD")
@@ -24,15 +146,16 @@ class DatabaseManager:
         db_host = os.getenv("DB_HOST", 'localhost')
         
         if all([db_user, db_password, db_name, db_host]):
-            url = f"postgresql+psycopg2://{db_user}:{db_password}@{db_host}/{db_name}"
+            driver = "asyncpg" if async_ else "psycopg2"
+            url = f"postgresql+{driver}://{db_user}:{db_password}@{db_host}/{db_name}"
             logger.info(f"Using PostgreSQL database: {db_host}/{db_name}")
             return url
         else:
             logger.warning("PostgreSQL environment variables not found, falling back to SQLite")
-            return "sqlite:///reeltor.db"
+            return "sqlite+aiosqlite:///reeltor.db" if async_ else "sqlite:///reeltor.db"
         
     def get_session(self):
-        """Get database session"""
+        """Get database session, an AsyncSession in async mode"""
         return self.SessionLocal()
     
     def create_tables(self):
@@ -42,4 +165,14 @@ class DatabaseManager:
             logger.info("Database tables created successfully")
         except Exception as e:
             logger.error(f"Error creating database tables: {e}")
-            raise
\ No newline at end of file
+            raise
+    
+    async def create_tables_async(self):
+        """Create all database tables through the AsyncEngine"""
+        try:
+            async with self.engine.begin() as connection:
+                await connection.run_sync(Base.metadata.create_all)
+            logger.info("Database tables created successfully")
+        except Exception as e:
+            logger.error(f"Error creating database tables: {e}")
+            raise
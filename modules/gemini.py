@@ -1,10 +1,22 @@
-from typing import List
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence
+from collections import deque
 from google import genai
 from google.genai.types import Tool, GenerateContentConfig, GoogleSearch, Candidate, Schema
+from pydantic import BaseModel, TypeAdapter
 from dotenv import load_dotenv
 from os import getenv
+from modules.metrics import REGISTRY
 
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
 import logging
+import random
+import re
+import time
+import unicodedata
 
 load_dotenv()
 
@@ -12,13 +24,251 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Bump when TRANSLATION_PROMPT or translation_config changes, so cached translations are not reused
+PROMPT_VERSION = 1
+TARGET_LANGUAGE = "en"
+
+TRANSLATION_PROMPT = """Translate the subject and body of every annonce below into English.
+Return one item per annonce with the same id. Keep prices, numbers, phone numbers and addresses unchanged.
+
+{ads}"""
+
+
+# Statuses of quota exhaustion and overload, retried after shrinking concurrency
+THROTTLE_CODES = {429, 503}
+
+QUEUE_DEPTH = REGISTRY.gauge("gemini_queue_depth", "Gemini requests waiting for a slot")
+CONCURRENCY_LIMIT = REGISTRY.gauge("gemini_concurrency_limit", "Current adaptive limit of Gemini requests in flight")
+REQUESTS = REGISTRY.counter("gemini_requests_total", "Gemini requests by outcome", ["outcome"])
+TOKENS = REGISTRY.counter("gemini_tokens_total", "Gemini tokens spent", ["kind"])
+
+
+class AdResponse(BaseModel):
+    id: int
+    subject: str
+    body: str
+
+
+_AD_LIST = TypeAdapter(List[AdResponse])
+
+
+def _normalize(text: str) -> str:
+    """Unicode-normalized, case-folded text with collapsed whitespace."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text).casefold()).strip()
+
+
+def translation_key(subject: str, body: str, target_language: str = TARGET_LANGUAGE, prompt_version: int = PROMPT_VERSION) -> str:
+    """
+    Translation cache key of an ad text.
+
+    Reposts differing only in case, whitespace or Unicode composition share a key.
+    """
+    source = "\x1f".join((_normalize(subject), _normalize(body), target_language, str(prompt_version)))
+    return hashlib.blake2b(source.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class GeminiScheduler:
+    """
+    Quota-aware admission of Gemini requests.
+
+    Requests wait in a priority queue (lowest priority value first) and are let
+    through while the sliding one-minute window stays under `requests_per_minute`
+    and `tokens_per_minute` and fewer than `limit` requests are in flight. The limit
+    adapts AIMD-style: +1/limit per successful request, multiplied by 0.9 when a
+    response is slower than `latency_target` and halved on a 429/503, which also
+    pauses all admissions for a jittered backoff before the request is retried.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 15,
+        tokens_per_minute: int = 1_000_000,
+        initial_concurrency: int = 4,
+        max_concurrency: int = 32,
+        latency_target: float = 30.0,
+        max_retries: int = 5,
+    ):
+        """
+        Args:
+            requests_per_minute (int): Request quota of the model.
+            tokens_per_minute (int): Input token quota of the model.
+            initial_concurrency (int): Starting limit of requests in flight.
+            max_concurrency (int): Upper bound of the adaptive limit.
+            latency_target (float): Seconds above which a response shrinks the limit.
+            max_retries (int): Retries of a throttled request.
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+        self.limit = float(min(initial_concurrency, max_concurrency))
+        self.in_flight = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self._waiting: List[list] = []  # heap of [priority, seq, future, tokens]
+        self._seq = itertools.count()
+        self._window: Deque[list] = deque()  # [admitted_at, tokens] of the last minute
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        CONCURRENCY_LIMIT.set(self.limit)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth, concurrency and token spend so far."""
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "concurrency_limit": round(self.limit, 2),
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+    async def submit(self, call: Callable[[], Awaitable[Any]], priority: float = 0.0, tokens: int = 0) -> Any:
+        """
+        Run `call` once the quota allows it, retrying throttled attempts.
+
+        Args:
+            call (Callable[[], Awaitable[Any]]): Makes one generate_content request.
+            priority (float): Lower values are admitted first.
+            tokens (int): Estimated input tokens of the request.
+
+        Returns:
+            Any: Response of the call, the last error is raised after `max_retries`
+        """
+        for attempt in range(self.max_retries + 1):
+            slot = await self._acquire(priority, tokens)
+            started = time.monotonic()
+            try:
+                response = await call()
+            except Exception as e:
+                if getattr(e, "code", None) not in THROTTLE_CODES or attempt == self.max_retries:
+                    REQUESTS.inc(outcome="error")
+                    raise
+                self._throttled(attempt)
+                logger.warning(f"Gemini throttled ({e}), concurrency limit now {self.limit:.1f}")
+                continue
+            finally:
+                # Also on cancellation, a BaseException the handler above does not see
+                self._release()
+            self._succeeded(time.monotonic() - started, slot, getattr(response, "usage_metadata", None))
+            return response
+
+    async def _acquire(self, priority: float, tokens: int) -> list:
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._seq), future, tokens]
+        heapq.heappush(self._waiting, entry)
+        QUEUE_DEPTH.set(self.queue_depth)
+        self._dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            elif entry in self._waiting:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                QUEUE_DEPTH.set(self.queue_depth)
+            raise
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit waiting requests in priority order while quota and concurrency allow."""
+        now = time.monotonic()
+        while self._window and self._window[0][0] <= now - 60:
+            self._window.popleft()
+
+        while self._waiting and self.in_flight < max(1, int(self.limit)):
+            _, _, future, tokens = self._waiting[0]
+            if future.done() or future.get_loop().is_closed():
+                heapq.heappop(self._waiting)
+                continue
+            delay = self._delay(now, tokens)
+            if delay > 0:
+                if self._timer:
+                    self._timer.cancel()
+                self._timer = future.get_loop().call_later(delay, self._dispatch)
+                break
+            heapq.heappop(self._waiting)
+            slot = [now, tokens]
+            self._window.append(slot)
+            self.in_flight += 1
+            future.set_result(slot)
+        QUEUE_DEPTH.set(self.queue_depth)
+
+    def _delay(self, now: float, tokens: int) -> float:
+        """Seconds until a request of `tokens` fits the pause, RPM and TPM constraints."""
+        delay = self._paused_until - now
+        if len(self._window) >= self.requests_per_minute:
+            delay = max(delay, self._window[-self.requests_per_minute][0] + 60 - now)
+        used = sum(slot[1] for slot in self._window)
+        for admitted_at, spent in self._window:
+            if used + tokens <= self.tokens_per_minute:
+                break
+            used -= spent
+            delay = max(delay, admitted_at + 60 - now)
+        return delay
+
+    def _succeeded(self, latency: float, slot: list, usage) -> None:
+        REQUESTS.inc(outcome="ok")
+        if usage is not None:
+            prompt_tokens = usage.prompt_token_count or 0
+            output_tokens = usage.candidates_token_count or 0
+            slot[1] = prompt_tokens  # replace the estimate in the TPM window
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+            TOKENS.inc(prompt_tokens, kind="prompt")
+            TOKENS.inc(output_tokens, kind="output")
+        if latency > self.latency_target:
+            self.limit = max(1.0, self.limit * 0.9)
+        else:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+        CONCURRENCY_LIMIT.set(self.limit)
+        self._dispatch()
+
+    def _throttled(self, attempt: int) -> None:
+        REQUESTS.inc(outcome="throttled")
+        self.limit = max(1.0, self.limit / 2)
+        CONCURRENCY_LIMIT.set(self.limit)
+        backoff = random.uniform(0, min(60.0, 2.0 ** (attempt + 1)))
+        self._paused_until = max(self._paused_until, time.monotonic() + backoff)
+
+
+def _estimate_tokens(contents) -> int:
+    """Rough input token count, about 3 characters per token for Vietnamese text."""
+    if isinstance(contents, str):
+        return len(contents) // 3 + 1
+    return sum(len(str(part)) for part in contents) // 3 + 1
+
+
 class Gemini:
-    def __init__(self):
+    def __init__(self, concurrency: int = 4):
+        """
+        Args:
+            concurrency (int): Initial number of requests in flight, adapted by the scheduler.
+        """
         self.client = genai.Client(api_key=getenv("GEMINI_API_KEY", ""))
         self.model_id = "gemini-2.0-flash"
         self.google_search_tool = Tool(
             google_search=GoogleSearch()
         )
+        self.scheduler = GeminiScheduler(
+            requests_per_minute=int(getenv("GEMINI_RPM", "15")),
+            tokens_per_minute=int(getenv("GEMINI_TPM", "1000000")),
+            initial_concurrency=concurrency,
+        )
+        self.translation_config = GenerateContentConfig(
+            temperature=0.8,
+            max_output_tokens=8192,
+            response_schema=list[AdResponse],
+            response_mime_type="application/json",
+        )
         
     def generate(self, query: str, config=GenerateContentConfig(
                 temperature=1,
@@ -34,6 +284,15 @@ class Gemini:
         )
         return response.candidates[0].content.parts[0].text
     
+    async def generate_async(self, query: str, config=GenerateContentConfig(
+                temperature=1,
+                max_output_tokens=4096,
+            ), priority: float = 0.0) -> str:
+        """
+        generate() through the scheduler, for callers running an event loop
+        """
+        response = await self.generate_content(query, config, priority)
+        return response.candidates[0].content.parts[0].text
     
     def chat(self, messages: List[str]) -> str:
         """
@@ -42,35 +301,137 @@ class Gemini:
         response = self.client.models.generate_content(
             model=self.model_id,
             contents=messages,
-            config=GenerateContentConfig(
-                temperature=1,
-                max_output_tokens=4096,
-            )
+            config=self._chat_config(),
         )
         return response.candidates[0].content.parts[0].text
 
+    async def chat_async(self, messages: List[str], priority: float = 0.0) -> str:
+        """
+        chat() through the scheduler, for callers running an event loop
+        """
+        response = await self.generate_content(messages, self._chat_config(), priority)
+        return response.candidates[0].content.parts[0].text
+
+    @staticmethod
+    def _chat_config() -> GenerateContentConfig:
+        return GenerateContentConfig(
+            temperature=1,
+            max_output_tokens=4096,
+        )
+
+    async def generate_content(self, contents, config: GenerateContentConfig, priority: float = 0.0):
+        """
+        generate_content through the scheduler: waits for quota and retries 429s.
+
+        Args:
+            contents: Prompt or messages.
+            config (GenerateContentConfig): Generation config.
+            priority (float): Lower values are sent first.
+        """
+        return await self.scheduler.submit(
+            lambda: self.client.aio.models.generate_content(model=self.model_id, contents=contents, config=config),
+            priority=priority,
+            tokens=_estimate_tokens(contents),
+        )
+
+    async def translate_ads(
+        self,
+        ads: Sequence[AdResponse],
+        batch_size: int = 10,
+        max_retries: int = 2,
+        priorities: Optional[Dict[int, float]] = None,
+    ) -> Dict[int, AdResponse]:
+        """
+        Translate ads into English, many ads per request.
+
+        Ads are packed into structured-output requests of `batch_size` items and sent
+        through the scheduler, most urgent batches first. Ads missing from a response,
+        or belonging to a failed request, are retried one ad per request up to
+        `max_retries` times.
+
+        Args:
+            ads (Sequence[AdResponse]): Source subjects and bodies, `id` identifies the ad.
+            batch_size (int): Number of ads per request.
+            max_retries (int): Retries of the ads that were not translated.
+            priorities (Optional[Dict[int, float]]): Priority by id, lower is sent first.
+
+        Returns:
+            Dict[int, AdResponse]: Translations by id, untranslatable ads are missing
+        """
+        priorities = priorities or {}
+        ads = sorted(ads, key=lambda ad: priorities.get(ad.id, 0.0))
+        batches = [ads[i:i + batch_size] for i in range(0, len(ads), batch_size)]
+        translations: Dict[int, AdResponse] = {}
+
+        for attempt in range(max_retries + 1):
+            results = await asyncio.gather(*(
+                self._translate_batch(batch, min(priorities.get(ad.id, 0.0) for ad in batch))
+                for batch in batches
+            ))
+            for items in results:
+                for item in items:
+                    translations[item.id] = item
+            pending = [ad for ad in ads if ad.id not in translations]
+            if not pending:
+                break
+            if attempt < max_retries:
+                logger.warning(f"{len(pending)} ads not translated, retrying one by one (attempt {attempt + 1})")
+            batches = [[ad] for ad in pending]
+
+        return translations
+
+    async def _translate_batch(self, batch: Sequence[AdResponse], priority: float) -> List[AdResponse]:
+        """Translate one batch, returns only the complete items of the asked ids."""
+        prompt = TRANSLATION_PROMPT.format(ads=json.dumps([ad.model_dump() for ad in batch], ensure_ascii=False))
+        try:
+            response = await self.generate_content(prompt, self.translation_config, priority)
+            items = response.parsed
+            if not isinstance(items, list):
+                items = _AD_LIST.validate_json(response.text or "[]")
+        except Exception as e:
+            logger.error(f"Error translating batch of {len(batch)} ads: {e}")
+            return []
+
+        wanted = {ad.id for ad in batch}
+        return [item for item in items if item.id in wanted and item.subject and item.body]
 
     def find_videos(self, car_model: str) -> dict[str, str]:
         """
         gets car_model and generates and searches for videos about the car on Doug Demuro's YouTube channel
         Returns dict with text and chunks contains title(domain source) and uri of the videos
         """
-        prompt = f'''I need video about the most recent model of {car_model} car.
-        Make sure not to include video that reviews list of similar cars.
-        '''
         response = self.client.models.generate_content(
             model=self.model_id,
-            contents=prompt,
-            config=GenerateContentConfig(
-                tools=[self.google_search_tool],
-                system_instruction="""You are the search assistant that helps to find videos about the asked car on YouTube platform.
-                Find trending and interesting videos about cars, including reviews, test drives, modifications, and industry news. 
-                Prioritize recent and engaging videos that match the interests of car enthusiasts.""",
-                temperature=1,
-                max_output_tokens=1024,
-            )
+            contents=self._video_prompt(car_model),
+            config=self._video_config(),
+        )
+        return self._video_results(response)
+
+    async def find_videos_async(self, car_model: str, priority: float = 0.0) -> dict[str, str]:
+        """
+        find_videos() through the scheduler, for callers running an event loop
+        """
+        response = await self.generate_content(self._video_prompt(car_model), self._video_config(), priority)
+        return self._video_results(response)
+
+    @staticmethod
+    def _video_prompt(car_model: str) -> str:
+        return f'''I need video about the most recent model of {car_model} car.
+        Make sure not to include video that reviews list of similar cars.
+        '''
+
+    def _video_config(self) -> GenerateContentConfig:
+        return GenerateContentConfig(
+            tools=[self.google_search_tool],
+            system_instruction="""You are the search assistant that helps to find videos about the asked car on YouTube platform.
+            Find trending and interesting videos about cars, including reviews, test drives, modifications, and industry news. 
+            Prioritize recent and engaging videos that match the interests of car enthusiasts.""",
+            temperature=1,
+            max_output_tokens=1024,
         )
 
+    @staticmethod
+    def _video_results(response) -> dict[str, str]:
         grounding_chunks = []
         text = []
         for each in response.candidates:
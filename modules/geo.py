@@ -0,0 +1,141 @@
+from typing import List, Optional, Sequence, Tuple
+import math
+import numpy as np
+
+# Ad.geo_cell is the geohash of the ad as an integer: 45 bits, the 9 base32 characters
+# of a geohash, cells of about 5 x 5 m. A geohash prefix is a range of these integers,
+# so cell lookups are plain integer ranges on one B-tree index, on any database.
+CELL_BITS = 45
+
+# Upper bound on the cells a search is split into, larger areas use coarser cells
+MAX_COVER_CELLS = 32
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Bits are interleaved starting with longitude. Computing the grid indices directly
+# gives the same bits as halving the intervals one bit at a time.
+
+
+def _bits(bits: int) -> Tuple[int, int]:
+    """Longitude and latitude bits of a cell of `bits` bits."""
+    return (bits + 1) // 2, bits // 2
+
+
+def _grid_index(value: float, low: float, span: float, bits: int) -> int:
+    return min(max(math.floor((value - low) / span * (1 << bits)), 0), (1 << bits) - 1)
+
+
+def _interleave(lon_index: int, lat_index: int, bits: int) -> int:
+    lon_bits, lat_bits = _bits(bits)
+    code = 0
+    for bit in range(bits):
+        if bit % 2 == 0:
+            code = (code << 1) | ((lon_index >> (lon_bits - 1 - bit // 2)) & 1)
+        else:
+            code = (code << 1) | ((lat_index >> (lat_bits - 1 - bit // 2)) & 1)
+    return code
+
+
+def encode(latitude: Optional[float], longitude: Optional[float]) -> Optional[int]:
+    """
+    Cell of a point.
+
+    Args:
+        latitude (Optional[float]): Degrees north
+        longitude (Optional[float]): Degrees east
+
+    Returns:
+        Optional[int]: Ad.geo_cell value, None without coordinates
+    """
+    if latitude is None or longitude is None:
+        return None
+    lon_bits, lat_bits = _bits(CELL_BITS)
+    return _interleave(
+        _grid_index(longitude, -180.0, 360.0, lon_bits),
+        _grid_index(latitude, -90.0, 180.0, lat_bits),
+        CELL_BITS,
+    )
+
+
+def encode_many(latitudes: Sequence[Optional[float]], longitudes: Sequence[Optional[float]]) -> List[Optional[int]]:
+    """
+    Cells of many points at once, same result as encode() per point.
+
+    Args:
+        latitudes (Sequence[Optional[float]]): Degrees north, None for unknown
+        longitudes (Sequence[Optional[float]]): Degrees east, None for unknown
+
+    Returns:
+        List[Optional[int]]: Cell per point, None where a coordinate is missing
+    """
+    lat = np.array(latitudes, dtype=np.float64)
+    lon = np.array(longitudes, dtype=np.float64)
+    known = ~(np.isnan(lat) | np.isnan(lon))
+    lon_bits, lat_bits = _bits(CELL_BITS)
+    lon_index = np.clip(np.floor((np.nan_to_num(lon) + 180.0) / 360.0 * (1 << lon_bits)), 0, (1 << lon_bits) - 1).astype(np.int64)
+    lat_index = np.clip(np.floor((np.nan_to_num(lat) + 90.0) / 180.0 * (1 << lat_bits)), 0, (1 << lat_bits) - 1).astype(np.int64)
+
+    code = np.zeros(len(lat), dtype=np.int64)
+    for bit in range(CELL_BITS):
+        if bit % 2 == 0:
+            code = (code << 1) | ((lon_index >> (lon_bits - 1 - bit // 2)) & 1)
+        else:
+            code = (code << 1) | ((lat_index >> (lat_bits - 1 - bit // 2)) & 1)
+    return [cell if ok else None for cell, ok in zip(code.tolist(), known.tolist())]
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """
+    Box around a circle.
+
+    Returns:
+        Tuple[float, float, float, float]: min_lat, min_lon, max_lat, max_lon
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    # Degrees of longitude shrink towards the poles
+    lon_delta = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+    return (
+        max(latitude - lat_delta, -90.0), max(longitude - lon_delta, -180.0),
+        min(latitude + lat_delta, 90.0), min(longitude + lon_delta, 180.0),
+    )
+
+
+def cover(min_lat: float, min_lon: float, max_lat: float, max_lon: float, max_cells: int = MAX_COVER_CELLS) -> List[Tuple[int, int]]:
+    """
+    Ranges of Ad.geo_cell whose cells together contain a box.
+
+    The finest cells (the longest geohash prefixes) that need at most `max_cells`
+    cells are used, so a search reads few index ranges and little outside the box.
+    Neighbouring cells that are consecutive on the curve are merged into one range.
+
+    Returns:
+        List[Tuple[int, int]]: Half-open [low, high) ranges of cell values
+    """
+    for precision in range(CELL_BITS // 5, 0, -1):
+        bits = 5 * precision
+        lon_bits, lat_bits = _bits(bits)
+        lon_range = range(_grid_index(min_lon, -180.0, 360.0, lon_bits), _grid_index(max_lon, -180.0, 360.0, lon_bits) + 1)
+        lat_range = range(_grid_index(min_lat, -90.0, 180.0, lat_bits), _grid_index(max_lat, -90.0, 180.0, lat_bits) + 1)
+        if len(lon_range) * len(lat_range) <= max_cells or precision == 1:
+            break
+
+    shift = CELL_BITS - bits
+    ranges: List[Tuple[int, int]] = []
+    for prefix in sorted(_interleave(lon, lat, bits) for lon in lon_range for lat in lat_range):
+        low, high = prefix << shift, (prefix + 1) << shift
+        if ranges and ranges[-1][1] == low:
+            ranges[-1] = (ranges[-1][0], high)
+        else:
+            ranges.append((low, high))
+    return ranges
+
+
+def haversine_km(latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Great-circle distances in km from one point to arrays of points."""
+    lat1 = math.radians(latitude)
+    lat2 = np.radians(latitudes)
+    dlat = lat2 - lat1
+    dlon = np.radians(longitudes) - math.radians(longitude)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
@@ -0,0 +1,129 @@
+from typing import Dict, Iterable, Optional
+from modules.metrics import REGISTRY
+import aiohttp
+import asyncio
+import hashlib
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CACHE_DIR = "image_cache"
+
+DOWNLOADS = REGISTRY.counter("image_cache_downloads_total", "Image downloads by outcome", ["outcome"])
+LOOKUPS = REGISTRY.counter("image_cache_lookups_total", "Image cache lookups by result", ["result"])
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ImageCache:
+    """
+    Content-addressed on-disk cache of ad images.
+
+    Images are stored under the hash of their bytes, so the same picture reached
+    through different URLs (reposts, CDN variants) is stored once. A small per-URL
+    index maps each downloaded URL to its content hash, which lets later runs skip
+    the download altogether.
+    """
+
+    def __init__(self, directory: str = IMAGE_CACHE_DIR, concurrency: int = 8, timeout: float = 30):
+        """
+        Args:
+            directory (str): Root directory of the cache.
+            concurrency (int): Maximum number of downloads in flight.
+            timeout (float): Total timeout of one download in seconds.
+        """
+        self.directory = directory
+        self.concurrency = concurrency
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+    def path(self, content_hash: str) -> str:
+        """Location of an image in the cache."""
+        return os.path.join(self.directory, content_hash[:2], content_hash)
+
+    def read(self, content_hash: str) -> Optional[bytes]:
+        """Bytes of a cached image, None if it is not cached."""
+        try:
+            with open(self.path(content_hash), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    async def prefetch(self, urls: Iterable[str]) -> Dict[str, str]:
+        """
+        Make sure images are cached, downloading the missing ones concurrently.
+
+        Args:
+            urls (Iterable[str]): Image URLs.
+
+        Returns:
+            Dict[str, str]: Content hash by URL, images that failed to download are missing
+        """
+        hashes: Dict[str, str] = {}
+        missing = []
+        for url in dict.fromkeys(urls):
+            content_hash = self._lookup(url)
+            if content_hash:
+                hashes[url] = content_hash
+            else:
+                missing.append(url)
+        LOOKUPS.inc(len(hashes), result="hit")
+        LOOKUPS.inc(len(missing), result="miss")
+        if not missing:
+            return hashes
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        async with aiohttp.ClientSession(timeout=self.timeout) as session:
+            results = await asyncio.gather(*(self._download(session, semaphore, url) for url in missing))
+        for url, content_hash in zip(missing, results):
+            if content_hash:
+                hashes[url] = content_hash
+        return hashes
+
+    async def _download(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, url: str) -> Optional[str]:
+        async with semaphore:
+            try:
+                async with session.get(url) as response:
+                    response.raise_for_status()
+                    data = await response.read()
+            except Exception as e:
+                logger.warning(f"Error downloading image {url}: {e}")
+                DOWNLOADS.inc(outcome="failed")
+                return None
+
+        content_hash = _digest(data)
+        try:
+            await asyncio.to_thread(self._store, url, content_hash, data)
+        except OSError as e:
+            logger.error(f"Error caching image {url}: {e}")
+            return None
+        DOWNLOADS.inc(outcome="ok")
+        return content_hash
+
+    def _index_path(self, url: str) -> str:
+        return os.path.join(self.directory, "urls", _digest(url.encode("utf-8")))
+
+    def _lookup(self, url: str) -> Optional[str]:
+        try:
+            with open(self._index_path(url), encoding="utf-8") as f:
+                content_hash = f.read().strip()
+        except OSError:
+            return None
+        return content_hash if os.path.exists(self.path(content_hash)) else None
+
+    def _store(self, url: str, content_hash: str, data: bytes) -> None:
+        path = self.path(content_hash)
+        if not os.path.exists(path):
+            self._write_atomic(path, data)
+        self._write_atomic(self._index_path(url), content_hash.encode("utf-8"))
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, BigInteger, Float, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, BigInteger, Float, DateTime, Text, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship, declarative_base, Mapped
 from datetime import datetime
 
@@ -66,6 +66,19 @@ class Ad(Base):
     size_unit_string: Mapped[str] = Column(String, nullable=True)
     contain_videos: Mapped[int] = Column(Integer, nullable=True)
     
+    # Hash of the mutable fields, images and parameters, used to skip unchanged ads on ingest
+    content_hash: Mapped[str] = Column(String(32), nullable=True)
+    # Geohash of latitude/longitude as an integer, see geo.encode()
+    geo_cell: Mapped[int] = Column(BigInteger, nullable=True)
+    
+    # Parsed from price_string on ingest, see prices.price_columns()
+    price: Mapped[int] = Column(BigInteger, nullable=True)  # VND, monthly for rentals
+    price_unit: Mapped[str] = Column(String(8), nullable=True)  # sale, rent
+    price_per_m2: Mapped[float] = Column(Float, nullable=True)
+    
+    # Hash of the source subject and body, translations overwrite the text but not the hash
+    text_hash: Mapped[str] = Column(String(32), nullable=True)
+    
     # Foreign key
     account_id_fk: Mapped[int] = Column(Integer, ForeignKey('account.id'))
     
@@ -81,14 +94,41 @@ class Ad(Base):
     # Statuses:
     posted: Mapped[datetime] = Column(DateTime, default=None, nullable=True)
     translated: Mapped[bool] = Column((Boolean), default=False)
+    
+    # Translation queue lease, see DataProcessor.claim_untranslated_ads()
+    translation_claim: Mapped[str] = Column(String(32), nullable=True)
+    translation_claimed_until: Mapped[datetime] = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index('ix_ad_created_at', 'created_at'),
+        Index('ix_ad_list_time', 'list_time'),
+        # Price and size range filters, see processor.ad_range_query()
+        Index('ix_ad_price', 'price_unit', 'price'),
+        Index('ix_ad_price_per_m2', 'price_unit', 'price_per_m2'),
+        Index('ix_ad_size', 'size'),
+        # Location searches, see DataProcessor.find_ads_near()
+        Index('ix_ad_geo_cell', 'geo_cell'),
+        # Work queues: only rows still waiting are indexed
+        Index(
+            'ix_ad_untranslated', 'created_at',
+            postgresql_where=translated.is_not(True),
+            sqlite_where=translated.is_not(True),
+        ),
+        Index(
+            'ix_ad_unposted', 'created_at',
+            postgresql_where=posted.is_(None),
+            sqlite_where=posted.is_(None),
+        ),
+    )
 
 class AdImage(Base):
     __tablename__ = 'ad_image'
     id: Mapped[int] = Column(Integer, primary_key=True)
-    ad_id_fk: Mapped[int] = Column(Integer, ForeignKey('ad.id'))
+    ad_id_fk: Mapped[int] = Column(Integer, ForeignKey('ad.id'), index=True)
     image_url: Mapped[str] = Column(String)
     thumbnail_url: Mapped[str] = Column(String, nullable=True)
     image_type: Mapped[str] = Column(String, default='regular')  # regular, thumbnail, webp
+    content_hash: Mapped[str] = Column(String(32), nullable=True)  # key in the local image cache and telegram_file
     
     # Relationship
     ad = relationship("Ad", back_populates="images")
@@ -96,7 +136,7 @@ class AdImage(Base):
 class AdParameter(Base):
     __tablename__ = 'ad_parameter'
     id: Mapped[int] = Column(Integer, primary_key=True)
-    ad_id_fk: Mapped[int] = Column(Integer, ForeignKey('ad.id'))
+    ad_id_fk: Mapped[int] = Column(Integer, ForeignKey('ad.id'), index=True)
     param_id: Mapped[str] = Column(String)
     value: Mapped[str] = Column(String)
     label: Mapped[str] = Column(String)
@@ -104,3 +144,54 @@ class AdParameter(Base):
     # Relationship
     ad = relationship("Ad", back_populates="parameters")
 
+
+class AdPost(Base):
+    __tablename__ = 'ad_post'
+    id: Mapped[int] = Column(Integer, primary_key=True)
+    ad_id_fk: Mapped[int] = Column(Integer, ForeignKey('ad.id'))
+    chat_id: Mapped[str] = Column(String)
+    message_id: Mapped[int] = Column(BigInteger, nullable=True)
+    posted_at: Mapped[datetime] = Column(DateTime, default=datetime.utcnow)
+    
+    # One post per ad and chat, also serves lookups by ad
+    __table_args__ = (
+        UniqueConstraint('ad_id_fk', 'chat_id', name='uq_ad_post_ad_chat'),
+    )
+
+
+class AdEvent(Base):
+    """Change of an ad detected on ingest, kept until relayed to the events exchange."""
+    __tablename__ = 'ad_event'
+    id: Mapped[int] = Column(Integer, primary_key=True)
+    ad_id_fk: Mapped[int] = Column(Integer, ForeignKey('ad.id'), index=True)
+    ad_id: Mapped[int] = Column(BigInteger)
+    kind: Mapped[str] = Column(String(16))  # new, price_changed, status_changed, body_changed, removed
+    data: Mapped[str] = Column(Text, nullable=True)  # JSON with old and new values, if any
+    created_at: Mapped[datetime] = Column(DateTime, default=datetime.utcnow)
+
+
+class TelegramFile(Base):
+    __tablename__ = 'telegram_file'
+    content_hash: Mapped[str] = Column(String(32), primary_key=True)  # see images.ImageCache
+    file_id: Mapped[str] = Column(String)
+    created_at: Mapped[datetime] = Column(DateTime, default=datetime.utcnow)
+
+
+class CrawlState(Base):
+    __tablename__ = 'crawl_state'
+    id: Mapped[int] = Column(Integer, primary_key=True)
+    query_key: Mapped[str] = Column(String, unique=True)  # listing query params without paging, see Puller.query_key()
+    max_list_time: Mapped[int] = Column(BigInteger, nullable=True)
+    max_ad_id: Mapped[int] = Column(BigInteger, nullable=True)
+    updated_at: Mapped[datetime] = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class TranslationCache(Base):
+    __tablename__ = 'translation_cache'
+    key: Mapped[str] = Column(String(32), primary_key=True)  # see gemini.translation_key()
+    target_language: Mapped[str] = Column(String(8))
+    prompt_version: Mapped[int] = Column(Integer)
+    subject: Mapped[str] = Column(Text)
+    body: Mapped[str] = Column(Text)
+    hits: Mapped[int] = Column(Integer, default=0)
+    created_at: Mapped[datetime] = Column(DateTime, default=datetime.utcnow)
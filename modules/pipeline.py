@@ -0,0 +1,112 @@
+from typing import Any, Dict, List, Optional, Union
+from modules.processor import AsyncDataProcessor, DataProcessor, EMPTY_STATS
+from modules.puller import Puller, Watermark
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of the stream in the queue
+_DONE = object()
+
+
+class IngestPipeline:
+    """
+    Streaming ingest from Puller to DataProcessor.
+
+    Puller parses ads out of response bodies as they arrive and puts them into a
+    bounded asyncio queue. A consumer drains the queue into micro-batches, flushed
+    when `batch_size` ads are collected or `flush_interval` seconds passed since the
+    first ad of the batch, and writes each batch with process_ads(), awaited
+    directly for an AsyncDataProcessor or in a worker thread otherwise. Fetching,
+    parsing and database writes overlap, and the bounded queue keeps memory flat
+    on large backfills.
+    """
+
+    def __init__(
+        self,
+        puller: Puller,
+        processor: Union[DataProcessor, AsyncDataProcessor],
+        batch_size: int = 500,
+        flush_interval: float = 2.0,
+        queue_size: int = 2000,
+    ):
+        """
+        Args:
+            puller (Puller): Source of ads.
+            processor (Union[DataProcessor, AsyncDataProcessor]): Destination of ads.
+            batch_size (int): Maximum number of ads per database write.
+            flush_interval (float): Maximum seconds an ad waits in a partial batch.
+            queue_size (int): Maximum number of parsed ads waiting to be written.
+        """
+        self.puller = puller
+        self.processor = processor
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self.newest: Optional[Watermark] = None
+
+    async def run(self, max_pages: Optional[int] = None, concurrency: int = 8) -> Dict[str, int]:
+        """
+        Crawl the listing and ingest every ad.
+
+        Args:
+            max_pages (Optional[int]): Upper bound on the number of pages to fetch.
+            concurrency (int): Maximum number of requests in flight.
+
+        Returns:
+            Dict[str, int]: Summed statistics of all written batches, plus "pages"
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        consumer = asyncio.create_task(self._consume(queue))
+        pages = 0
+        try:
+            pages = await self.puller.stream_ads(queue, max_pages=max_pages, concurrency=concurrency)
+        finally:
+            await queue.put(_DONE)
+            stats = await consumer
+        stats["pages"] = pages
+        return stats
+
+    async def _consume(self, queue: asyncio.Queue) -> Dict[str, int]:
+        stats = dict(EMPTY_STATS)
+        batch: List[Dict[str, Any]] = []
+        deadline = None
+        done = False
+
+        while not done:
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                item = None
+
+            if item is _DONE:
+                done = True
+            elif item is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(item)
+
+            if batch and (done or item is None or len(batch) >= self.batch_size):
+                await self._flush(batch, stats)
+                batch = []
+                deadline = None
+
+        return stats
+
+    async def _flush(self, batch: List[Dict[str, Any]], stats: Dict[str, int]) -> None:
+        try:
+            if isinstance(self.processor, AsyncDataProcessor):
+                batch_stats = await self.processor.process_ads(batch)
+            else:
+                batch_stats = await asyncio.to_thread(self.processor.process_ads, batch)
+        except Exception as e:
+            logger.error(f"Error writing batch of {len(batch)} ads: {e}")
+            stats["errors"] = stats.get("errors", 0) + len(batch)
+            return
+        for key, value in batch_stats.items():
+            stats[key] = stats.get(key, 0) + value
+        self.newest = Puller.newest(batch, self.newest)
+        logger.info(f"Wrote batch of {len(batch)} ads: {batch_stats}")
@@ -0,0 +1,232 @@
+from typing import Dict, List, Optional, Sequence
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
+from modules.images import ImageCache
+from modules.metrics import REGISTRY
+from modules.read_models import AdCard, ImageView
+from modules.processor import DataProcessor
+from modules.ratelimit import TokenBucket
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Telegram limits: about 30 messages per second per bot, 20 per minute per group
+GLOBAL_MESSAGES_PER_SECOND = 30.0
+CHAT_MESSAGES_PER_SECOND = 20 / 60
+# Photos per media group, Telegram accepts up to 10
+MAX_IMAGES = 7
+MAX_CAPTION_LENGTH = 950
+
+POSTS = REGISTRY.counter("poster_posts_total", "Telegram posts by outcome", ["outcome"])
+THROTTLED = REGISTRY.counter("poster_throttled_total", "Telegram 429 responses by chat", ["chat"])
+
+
+def formatted_message(ad: AdCard) -> str:
+    message = f"""
+{ad.subject}\n{ad.body}\n
+"""
+    if len(message) > MAX_CAPTION_LENGTH:
+        message = message[:MAX_CAPTION_LENGTH-3] + "..."
+    return message
+
+
+def _images(ad: AdCard) -> List[ImageView]:
+    """Images of the ad with distinct URLs, in payload order."""
+    images: Dict[str, ImageView] = {}
+    for image in ad.images:
+        if image.image_url and image.image_url not in images:
+            images[image.image_url] = image
+    return list(images.values())[:MAX_IMAGES]
+
+
+class Poster:
+    """
+    Posts unposted ads to Telegram chats.
+
+    Each chat is served by its own task, so chats are posted to concurrently while
+    the ads of one chat keep their order. Every send takes one token per message
+    (photo) from the chat's bucket and from a bucket shared by all chats; a 429
+    pauses the chat's bucket for Telegram's `retry_after` and the send is retried.
+    Each post is recorded as soon as Telegram accepts it and Ad.posted is set once
+    every chat has the ad, so a restarted run continues where the last one stopped.
+
+    Photos are uploaded once: images without a known Telegram file_id are downloaded
+    into the local image cache before a batch is posted and uploaded from there, and
+    the file_id Telegram returns is stored under the image's content hash so every
+    later post of the same picture, in any chat or repost, reuses it.
+    """
+
+    def __init__(
+        self,
+        bot: AsyncTeleBot,
+        processor: DataProcessor,
+        chat_ids: Sequence[str],
+        global_rate: float = GLOBAL_MESSAGES_PER_SECOND,
+        chat_rate: float = CHAT_MESSAGES_PER_SECOND,
+        max_retries: int = 5,
+        image_cache: Optional[ImageCache] = None,
+    ):
+        """
+        Args:
+            bot (AsyncTeleBot): Bot used to send the posts.
+            processor (DataProcessor): Source of ads and store of posts.
+            chat_ids (Sequence[str]): Chats every ad is posted to.
+            global_rate (float): Messages per second over all chats.
+            chat_rate (float): Messages per second per chat.
+            max_retries (int): Retries of a throttled or failed send.
+            image_cache (Optional[ImageCache]): Local copy of the images to upload.
+        """
+        self.bot = bot
+        self.processor = processor
+        self.chat_ids = [str(chat) for chat in chat_ids]
+        self.max_retries = max_retries
+        # A media group takes up to MAX_IMAGES tokens at once, the buckets must hold them
+        self.global_bucket = TokenBucket(global_rate, capacity=max(global_rate, MAX_IMAGES))
+        self.chat_buckets = {chat: TokenBucket(chat_rate, capacity=MAX_IMAGES) for chat in self.chat_ids}
+        self.image_cache = image_cache or ImageCache()
+        self._hashes: Dict[str, str] = {}  # image URL -> content hash
+        self._file_ids: Dict[str, str] = {}  # content hash -> Telegram file_id
+
+    async def run(self, limit: Optional[int] = None, batch_size: int = 50) -> Dict[str, int]:
+        """
+        Post unposted ads until none are left, `limit` ads were handled or a batch
+        makes no progress (nothing was sent or marked posted).
+
+        Args:
+            limit (Optional[int]): Maximum number of ads to handle.
+            batch_size (int): Ads selected from the database at a time.
+
+        Returns:
+            Dict[str, int]: Number of "posts" sent, "ads" completed and "failed" ads
+        """
+        stats = {"posts": 0, "ads": 0, "failed": 0}
+        failed: List[int] = []
+        handled = 0
+
+        while limit is None or handled < limit:
+            size = batch_size if limit is None else min(batch_size, limit - handled)
+            ads = await asyncio.to_thread(self.processor.get_unposted_ads, size, failed)
+            if not ads:
+                break
+            handled += len(ads)
+            posted = await asyncio.to_thread(self.processor.get_posted_chats, [ad.id for ad in ads])
+
+            # Ads already in every chat, e.g. after a crash right before Ad.posted was set
+            complete = [ad.id for ad in ads if set(self.chat_ids) <= posted.get(ad.id, set())]
+            marked = await asyncio.to_thread(self.processor.mark_posted, complete)
+            if marked < len(complete):
+                # Nothing is left to send for them, selecting them again would loop
+                logger.warning(f"Could not mark {len(complete) - marked} of {len(complete)} fully posted ads as posted")
+                failed.extend(complete)
+                stats["failed"] += len(complete) - marked
+
+            await self._prepare_images(ads)
+            pending = {chat: [ad for ad in ads if chat not in posted.get(ad.id, set())] for chat in self.chat_ids}
+            results = await asyncio.gather(*(self._post_chat(chat, chat_ads) for chat, chat_ads in pending.items()))
+            batch_failed = {ad_pk for chat_failed in results for ad_pk in chat_failed}
+            failed.extend(batch_failed)
+            sent = sum(len(chat_ads) for chat_ads in pending.values()) - sum(len(chat_failed) for chat_failed in results)
+            stats["failed"] += len(batch_failed)
+            stats["ads"] += len(ads) - len(batch_failed) - (len(complete) - marked)
+            stats["posts"] += sent
+            if not sent and not marked:
+                logger.warning(f"No ad of the last {len(ads)} could be posted, stopping")
+                break
+
+        return stats
+
+    async def _prepare_images(self, ads: List[AdCard]) -> None:
+        """Resolve file_ids of the batch's images and cache the ones that have to be uploaded."""
+        images = [image for ad in ads for image in _images(ad)]
+        for image in images:
+            if image.content_hash:
+                self._hashes[image.image_url] = image.content_hash
+        known = set(self._hashes.values()) - self._file_ids.keys()
+        self._file_ids.update(await asyncio.to_thread(self.processor.get_telegram_files, list(known)))
+
+        to_fetch = [image.image_url for image in images if self._hashes.get(image.image_url) not in self._file_ids]
+        fetched = await self.image_cache.prefetch(to_fetch)
+        self._hashes.update(fetched)
+        await asyncio.to_thread(self.processor.save_image_hashes, {
+            image.id: fetched[image.image_url]
+            for image in images if image.image_url in fetched and image.content_hash != fetched[image.image_url]
+        })
+        # The same picture may already be uploaded under another URL
+        fresh = set(fetched.values()) - self._file_ids.keys()
+        self._file_ids.update(await asyncio.to_thread(self.processor.get_telegram_files, list(fresh)))
+
+    def _media(self, urls: List[str], caption: str) -> list:
+        """Media group items: known file_ids, cached bytes to upload, or the URL as a fallback."""
+        media = []
+        for url in urls:
+            content_hash = self._hashes.get(url)
+            if content_hash in self._file_ids:
+                media.append(types.InputMediaPhoto(self._file_ids[content_hash]))
+                continue
+            data = self.image_cache.read(content_hash) if content_hash else None
+            media.append(types.InputMediaPhoto(data if data is not None else url))
+        media[0].caption = caption
+        return media
+
+    async def _remember_files(self, urls: List[str], messages: list) -> None:
+        """Store the file_ids of freshly uploaded photos."""
+        files = {}
+        for url, message in zip(urls, messages):
+            content_hash = self._hashes.get(url)
+            if content_hash and content_hash not in self._file_ids and getattr(message, "photo", None):
+                files[content_hash] = message.photo[-1].file_id
+        if files:
+            self._file_ids.update(files)
+            await asyncio.to_thread(self.processor.save_telegram_files, files)
+
+    async def _post_chat(self, chat: str, ads: List[AdCard]) -> List[int]:
+        """Post ads to one chat in order, returns Ad.id of the ads that failed."""
+        failed = []
+        for ad in ads:
+            message_id = await self._send(chat, ad)
+            if message_id is None:
+                POSTS.inc(outcome="failed")
+                failed.append(ad.id)
+                continue
+            POSTS.inc(outcome="ok")
+            if not await asyncio.to_thread(self.processor.record_post, ad.id, chat, message_id, self.chat_ids):
+                failed.append(ad.id)
+        return failed
+
+    async def _send(self, chat: str, ad: AdCard) -> Optional[int]:
+        """Send one ad, as a media group when it has images. Returns the first message id."""
+        caption = formatted_message(ad)
+        urls = [image.image_url for image in _images(ad)]
+        tokens = max(len(urls), 1)
+
+        for attempt in range(self.max_retries + 1):
+            await self.chat_buckets[chat].acquire(tokens)
+            await self.global_bucket.acquire(tokens)
+            try:
+                if not urls:
+                    message = await self.bot.send_message(chat, caption)
+                    return message.message_id
+                media = await asyncio.to_thread(self._media, urls, caption)
+                messages = await self.bot.send_media_group(chat, media=media)
+            except Exception as e:
+                error_code = getattr(e, "error_code", None)
+                if error_code == 429:
+                    retry_after = (getattr(e, "result_json", None) or {}).get("parameters", {}).get("retry_after", 1)
+                    THROTTLED.inc(chat=chat)
+                    logger.warning(f"Telegram throttled chat {chat}, retrying ad {ad.id} in {retry_after}s")
+                    self.chat_buckets[chat].pause(retry_after)
+                elif error_code is not None and error_code < 500:
+                    # Rejected request, e.g. an image Telegram cannot fetch: retrying will not help
+                    logger.error(f"Telegram rejected ad {ad.id} for {chat}: {e}")
+                    return None
+                else:
+                    logger.error(f"Error posting ad {ad.id} to {chat} (attempt {attempt + 1}): {e}")
+                    if attempt < self.max_retries:
+                        await asyncio.sleep(2 ** attempt)
+                continue
+            # Outside the try: the post is sent, a failure here must not trigger a resend
+            await self._remember_files(urls, messages)
+            return messages[0].message_id
+
+        return None
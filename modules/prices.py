@@ -0,0 +1,137 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import math
+import re
+
+import numpy as np
+
+# Listing kinds, see Ad.price_unit
+SALE = "sale"
+RENT = "rent"
+
+# Word multipliers of chotot price strings: "2,5 tỷ", "850 triệu", "500 nghìn/tháng", "0 đ/tháng"
+MULTIPLIERS = {
+    "tỷ": 1_000_000_000,
+    "triệu": 1_000_000,
+    "nghìn": 1_000,
+    "ngàn": 1_000,
+    "đ": 1,
+    "vnđ": 1,
+    "vnd": 1,
+}
+
+# A number and the word right after it, a bare number is an amount in VND
+_AMOUNT = re.compile(r"(\d[\d.,]*)\s*([^\d\s/.,]*)")
+_PER_M2 = re.compile(r"/\s*m(?:²|2)", re.IGNORECASE)
+_PER_MONTH = re.compile(r"/\s*tháng", re.IGNORECASE)
+_PER_YEAR = re.compile(r"/\s*năm", re.IGNORECASE)
+
+
+def _number(text: str) -> float:
+    """Vietnamese number: "." groups thousands and "," is the decimal mark, "2.5" is read as a decimal."""
+    text = text.rstrip(".,")
+    if "," in text:
+        return float(text.replace(".", "").replace(",", "."))
+    groups = text.split(".")
+    if len(groups) > 1 and all(len(group) == 3 for group in groups[1:]):
+        return float("".join(groups))
+    return float(text)
+
+
+@lru_cache(maxsize=65536)
+def parse_price_string(price_string: str) -> Tuple[Optional[float], bool, Optional[str]]:
+    """
+    Parse a chotot price string.
+
+    Amounts of several words add up ("2 tỷ 500 triệu"). Yearly rents are converted
+    to monthly ones. A number followed by a word that is not a known unit ("25 tr")
+    makes the amount unknown rather than guessed. Results are cached, listings share
+    a small set of strings.
+
+    Args:
+        price_string (str): Ad.price_string
+
+    Returns:
+        Tuple[Optional[float], bool, Optional[str]]: Amount in VND (None if missing or 0),
+        whether it is per m², and RENT for "/tháng" or "/năm" prices, otherwise None
+    """
+    text = price_string.strip().lower()
+    per_m2 = bool(_PER_M2.search(text))
+    unit = RENT if _PER_YEAR.search(text) or _PER_MONTH.search(text) else None
+    amount = 0.0
+    # "/m2" would read as an amount of 2
+    for number, word in _AMOUNT.findall(_PER_M2.sub("", text)):
+        if word and word not in MULTIPLIERS:
+            return None, per_m2, unit
+        try:
+            amount += _number(number) * MULTIPLIERS.get(word, 1)
+        except ValueError:
+            continue
+
+    if _PER_YEAR.search(text):
+        amount /= 12
+    return (amount or None), per_m2, unit
+
+
+def price_columns(price_string: Optional[str], size: Optional[float], ad_type: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Numeric price columns of an ad.
+
+    Args:
+        price_string (Optional[str]): Ad.price_string
+        size (Optional[float]): Ad.size in m²
+        ad_type (Optional[str]): Ad.type, "u" is a rental when the string has no period
+
+    Returns:
+        Dict[str, Any]: Values of Ad.price (VND, monthly for rentals), Ad.price_unit and Ad.price_per_m2
+    """
+    unit = RENT if ad_type == "u" else SALE
+    if not price_string:
+        return {"price": None, "price_unit": unit, "price_per_m2": None}
+
+    amount, per_m2, period_unit = parse_price_string(price_string)
+    unit = period_unit or unit
+    if amount is None:
+        return {"price": None, "price_unit": unit, "price_per_m2": None}
+    if per_m2:
+        price = round(amount * size) if size else None
+        return {"price": price, "price_unit": unit, "price_per_m2": amount}
+    return {"price": round(amount), "price_unit": unit, "price_per_m2": amount / size if size else None}
+
+
+def price_columns_many(
+    price_strings: Sequence[Optional[str]], sizes: Sequence[Optional[float]], ad_types: Sequence[Optional[str]]
+) -> List[Dict[str, Any]]:
+    """
+    Numeric price columns of many ads at once, same result as price_columns() per ad.
+
+    Each distinct price string is parsed once, prices and prices per m² of the whole
+    batch are computed as arrays.
+
+    Args:
+        price_strings (Sequence[Optional[str]]): Ad.price_string per ad
+        sizes (Sequence[Optional[float]]): Ad.size in m² per ad
+        ad_types (Sequence[Optional[str]]): Ad.type per ad
+
+    Returns:
+        List[Dict[str, Any]]: Values of Ad.price, Ad.price_unit and Ad.price_per_m2 per ad
+    """
+    parsed = {text: parse_price_string(text) for text in set(price_strings) if text}
+    empty = (None, False, None)
+    rows = [parsed.get(text, empty) if text else empty for text in price_strings]
+    amount = np.array([row[0] for row in rows], dtype=np.float64)
+    per_m2 = np.array([row[1] for row in rows], dtype=bool)
+    # A size of 0 is as unknown as a missing one
+    size = np.array([value or None for value in sizes], dtype=np.float64)
+
+    with np.errstate(invalid="ignore"):
+        price = np.round(np.where(per_m2, amount * size, amount))
+        price_per_m2 = np.where(per_m2, amount, amount / size)
+    return [
+        {
+            "price": None if math.isnan(total) else int(total),
+            "price_unit": row[2] or (RENT if ad_type == "u" else SALE),
+            "price_per_m2": None if math.isnan(per_area) else per_area,
+        }
+        for row, ad_type, total, per_area in zip(rows, ad_types, price.tolist(), price_per_m2.tolist())
+    ]
@@ -1,13 +1,261 @@
-from typing import Optional, Dict, Any, List
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy.exc import IntegrityError
-from modules.models import Account, Ad, AdImage, AdParameter
+from typing import Optional, Dict, Any, List, Iterator, Sequence, Set, Tuple
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from sqlalchemy import and_, bindparam, case, delete, event, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from modules.models import Account, Ad, AdEvent, AdImage, AdParameter, AdPost, CrawlState, TelegramFile, TranslationCache
 from modules.DatabaseManager import DatabaseManager
-from modules.puller import ResponseDict
+from modules.geo import bounding_box, cover, encode, encode_many, haversine_km
+from modules.metrics import REGISTRY
+from modules.puller import ResponseDict, Watermark
+from modules.prices import price_columns, price_columns_many
+from modules.read_models import AdCard, AdListing, AdText, ChangeEvent, ImageView
+import hashlib
+import json
 import logging
+import operator
+import time
+import uuid
+
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+# Dialects with INSERT ... ON CONFLICT ... RETURNING support
+UPSERT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+# Keys per IN (...) list, keeps bind parameters under SQLite/PostgreSQL limits
+UPSERT_CHUNK_SIZE = 500
+
+# Ad columns copied verbatim from the chotot payload
+AD_FIELDS = (
+    "ad_id", "list_id", "list_time", "state", "type", "region", "category",
+    "subject", "body", "image", "status", "commercial_type", "size", "area",
+    "longitude", "latitude", "property_legal_document", "region_v2", "area_v2",
+    "ward", "furnishing_sell", "street_name", "location_id", "unique_street_id",
+    "is_main_street", "location", "date", "category_name", "area_name",
+    "region_name", "price_string", "webp_image", "number_of_images", "ward_name",
+    "pty_map", "pty_map_modifier", "thumbnail_image", "size_unit_string",
+    "contain_videos",
+)
+
+# Ad columns refreshed when an already stored ad is seen again
+AD_MUTABLE_FIELDS = (
+    "list_time", "state", "status", "subject", "body", "image", "webp_image",
+    "thumbnail_image", "number_of_images", "contain_videos", "price_string",
+    "latitude", "longitude", "size",
+)
+
+# Ad columns compared with the payload to derive change events
+DELTA_FIELDS = ("state", "status", "price_string", "text_hash")
+
+# Columns identifying a child row of an ad, used to diff stored rows against the payload
+IMAGE_KEY = ("image_url", "thumbnail_url", "image_type")
+PARAMETER_KEY = ("param_id", "value", "label")
+
+EMPTY_STATS = {
+    "accounts": 0,
+    "ads": 0,
+    "ads_updated": 0,
+    "ads_unchanged": 0,
+    "images": 0,
+    "images_removed": 0,
+    "parameters": 0,
+    "parameters_removed": 0,
+    "events": 0,
+    "errors": 0,
+}
+
+# _process_ad() outcome -> stats key
+AD_OUTCOME_STATS = {
+    "new": "ads",
+    "updated": "ads_updated",
+    "unchanged": "ads_unchanged",
+}
+
+# state and status of a listing that is online, an ad leaving them is removed
+LIVE_STATE = "accepted"
+LIVE_STATUS = "active"
+
+
+STAGE_SECONDS = REGISTRY.histogram("processor_stage_seconds", "Time spent in each stage of a batch write", ["stage"])
+DB_QUERY_SECONDS = REGISTRY.histogram("db_query_seconds", "Time spent in the database per statement")
+ROWS = REGISTRY.counter("processor_rows_total", "Rows written or skipped by the processor", ["table", "op"])
+TRANSLATION_CACHE = REGISTRY.counter("translation_cache_lookups_total", "Translation cache lookups by result", ["result"])
+BATCH_FAILURES = REGISTRY.counter("processor_batch_failures_total", "Batches that fell back to the per-ad path")
+
+# stats key -> (table, op) of processor_rows_total
+ROW_METRICS = {
+    "accounts": ("account", "inserted"),
+    "ads": ("ad", "inserted"),
+    "ads_updated": ("ad", "updated"),
+    "ads_unchanged": ("ad", "skipped"),
+    "images": ("ad_image", "inserted"),
+    "images_removed": ("ad_image", "deleted"),
+    "parameters": ("ad_parameter", "inserted"),
+    "parameters_removed": ("ad_parameter", "deleted"),
+    "events": ("ad_event", "inserted"),
+    "errors": ("ad", "failed"),
+}
+
+
+@contextmanager
+def _timed(timings: Dict[str, int], stage: str) -> Iterator[None]:
+    """Time a stage into processor_stage_seconds and milliseconds into timings[stage]."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        timings[stage] = timings.get(stage, 0) + round(elapsed * 1000)
+
+
+def _record_rows(stats: Dict[str, int]) -> None:
+    for key, (table, op) in ROW_METRICS.items():
+        if stats.get(key):
+            ROWS.inc(stats[key], table=table, op=op)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    elapsed = time.perf_counter() - started
+    DB_QUERY_SECONDS.observe(elapsed)
+    conn.info["db_seconds"] = conn.info.get("db_seconds", 0.0) + elapsed
+
+
+def _instrument_engine(engine) -> None:
+    """Measure every statement of the engine into db_query_seconds, once per engine."""
+    engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def recent_ads_query(limit: int):
+    """Newest ads first, served by ix_ad_created_at."""
+    return select(Ad).order_by(Ad.created_at.desc()).limit(limit)
+
+
+def untranslated_ads_query(limit: int):
+    """Newest ads still waiting for translation, served by the partial ix_ad_untranslated."""
+    return select(Ad).where(Ad.translated.is_not(True)).order_by(Ad.created_at.desc()).limit(limit)
+
+
+def unposted_ads_query(limit: int):
+    """Newest ads not posted yet, served by the partial ix_ad_unposted."""
+    return select(Ad).where(Ad.posted.is_(None)).order_by(Ad.created_at.desc()).limit(limit)
+
+
+# Columns of AdListing, in field order
+LISTING_COLUMNS = (
+    Ad.id, Ad.ad_id, Ad.subject, Ad.price_string, Ad.price, Ad.price_unit,
+    Ad.price_per_m2, Ad.size, Ad.latitude, Ad.longitude, Ad.list_time,
+)
+
+# Filters of ad_range_query(): name -> (column, comparison)
+RANGE_FILTERS = {
+    "min_price": (Ad.price, operator.ge),
+    "max_price": (Ad.price, operator.le),
+    "min_price_per_m2": (Ad.price_per_m2, operator.ge),
+    "max_price_per_m2": (Ad.price_per_m2, operator.le),
+    "min_size": (Ad.size, operator.ge),
+    "max_size": (Ad.size, operator.le),
+}
+
+# Sort keys of ad_range_query()
+RANGE_ORDERS = {
+    "price": Ad.price,
+    "price_per_m2": Ad.price_per_m2,
+    "size": Ad.size,
+    "list_time": Ad.list_time,
+}
+
+
+def range_conditions(filters: Dict[str, Any]) -> List[Any]:
+    """
+    WHERE conditions of price and size filters.
+    
+    Args:
+        filters (Dict[str, Any]): "price_unit" ("sale" or "rent") and any of RANGE_FILTERS, None values are ignored
+        
+    Returns:
+        List[Any]: Conditions on Ad
+    """
+    conditions = []
+    for name, value in filters.items():
+        if value is None:
+            continue
+        if name == "price_unit":
+            conditions.append(Ad.price_unit == value)
+        elif name in RANGE_FILTERS:
+            column, compare = RANGE_FILTERS[name]
+            conditions.append(compare(column, value))
+        else:
+            raise ValueError(f"Unknown ad filter {name}")
+    return conditions
+
+
+def ad_range_query(filters: Dict[str, Any], order_by: str = "price", descending: bool = False, limit: int = 50):
+    """
+    Ads matching price and size ranges, sorted by one of RANGE_ORDERS.
+    
+    With a price_unit, price ranges and price sorts are served by ix_ad_price and
+    ix_ad_price_per_m2 (price_unit first), size ranges by ix_ad_size. Ads without
+    a value for the sort column are left out.
+    """
+    column = RANGE_ORDERS[order_by]
+    return (
+        select(*LISTING_COLUMNS)
+        .where(*range_conditions(filters), column.is_not(None))
+        .order_by(column.desc() if descending else column)
+        .limit(limit)
+    )
+
+
+def matches_filters(listing: Any, filters: Dict[str, Any]) -> bool:
+    """In-memory counterpart of range_conditions() for rows with the LISTING_COLUMNS."""
+    for name, value in filters.items():
+        if value is None:
+            continue
+        if name == "price_unit":
+            if listing.price_unit != value:
+                return False
+        elif name in RANGE_FILTERS:
+            column, compare = RANGE_FILTERS[name]
+            stored = getattr(listing, column.key)
+            if stored is None or not compare(stored, value):
+                return False
+        else:
+            raise ValueError(f"Unknown ad filter {name}")
+    return True
+
+
+def cell_query(ranges: Sequence[Tuple[int, int]]):
+    """
+    Ads in the given geo_cell ranges, see geo.cover(), served by ix_ad_geo_cell.
+    
+    Price and size filters are applied to the rows of the cells with matches_filters():
+    as SQL conditions they lead planners to ix_ad_price, which does not narrow a location.
+    """
+    cells = or_(*(and_(Ad.geo_cell >= low, Ad.geo_cell < high) for low, high in ranges))
+    return select(*LISTING_COLUMNS).where(cells)
+
+
+def _chunks(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
 class DataProcessor:
     def __init__(self, database_manager: DatabaseManager):
         """
@@ -17,65 +265,421 @@ class DataProcessor:
             database_manager (DatabaseManager): Database manager instance
         """
         self.db_manager = database_manager
+        _instrument_engine(database_manager.engine)
     
-    def process_response(self, response_data: ResponseDict) -> Dict[str, int]:
+    def process_response(self, response_data: ResponseDict, bulk: bool = True) -> Dict[str, int]:
         """
         Process the Puller response and save all data to the database.
         
         Args:
             response_data (ResponseDict): Response from Puller.get_response()
+            bulk (bool): Use the set-based upsert path when the dialect supports it
             
         Returns:
             Dict[str, int]: Statistics about processed data
         """
         if not response_data or 'ads' not in response_data:
             logger.warning("No ads data found in response")
-            return {"accounts": 0, "ads": 0, "images": 0, "parameters": 0}
+            return dict(EMPTY_STATS)
+        
+        if bulk:
+            return self.process_ads(response_data['ads'])
+        return self._process_ads_one_by_one(response_data['ads'])
+    
+    def process_ads(self, ads_data: List[Dict[str, Any]], timings: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """
+        Save a batch of ads with a handful of set-based statements.
+        
+        Accounts and ads are written with dialect-aware INSERT ... ON CONFLICT DO UPDATE,
+        their ids come back through RETURNING and are used to write the children.
+        Falls back to the per-ad path on dialects without upsert support or if the
+        batch fails as a whole.
+        
+        Args:
+            ads_data (List[Dict[str, Any]]): Ads as returned by the chotot API
+            timings (Optional[Dict[str, int]]): Receives milliseconds per stage of a bulk write
+                (prefetch, hash, accounts, ads, children, events, commit) and inside
+                database statements (db), added to the values already present
+            
+        Returns:
+            Dict[str, int]: Statistics about processed data, "errors" counts ads that failed to save
+            
+        Raises:
+            OperationalError: The database is unavailable (connection lost, timeout, lock),
+            nothing was written and the batch should be retried later
+        """
+        if not ads_data:
+            return dict(EMPTY_STATS)
+        
+        if self.db_manager.engine.dialect.name not in UPSERT_INSERTS:
+            return self._process_ads_one_by_one(ads_data)
+        
+        timings = {} if timings is None else timings
+        session = self.db_manager.get_session()
+        try:
+            logger.info(f"Processing {len(ads_data)} ads in bulk")
+            stats = self._write_batch(session, ads_data, timings)
+            with _timed(timings, "commit"):
+                session.commit()
+            _record_rows(stats)
+            logger.info(f"Successfully processed data: {stats}, ms per stage: {timings}")
+            return stats
+        except OperationalError as e:
+            # Ad by ad would fail the same way
+            logger.error(f"Error processing batch, database unavailable: {e}")
+            BATCH_FAILURES.inc()
+            session.rollback()
+            raise
+        except Exception as e:
+            logger.error(f"Error processing batch, retrying ad by ad: {e}")
+            BATCH_FAILURES.inc()
+            session.rollback()
+        finally:
+            session.close()
+        
+        return self._process_ads_one_by_one(ads_data)
+    
+    def _write_batch(self, session: Session, ads_data: List[Dict[str, Any]], timings: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """Write a batch of ads and their children inside the caller's transaction, stage times go to `timings`."""
+        stats = dict(EMPTY_STATS)
+        timings = {} if timings is None else timings
+        insert_ = UPSERT_INSERTS[session.get_bind().dialect.name]
+        connection = session.connection()
+        db_seconds = connection.info.get("db_seconds", 0.0)
+        
+        # The same ad can appear twice across pages, ON CONFLICT refuses to touch a row twice
+        ads_by_id = {ad['ad_id']: ad for ad in ads_data if ad.get('ad_id')}
+        if not ads_by_id:
+            return stats
+        
+        # Skip ads whose content did not change since the last time they were seen,
+        # the other stored columns are the "before" side of the change events
+        with _timed(timings, "prefetch"):
+            stored_hashes: Dict[int, Optional[str]] = {}
+            before: Dict[int, Dict[str, Any]] = {}
+            for chunk in _chunks(list(ads_by_id), UPSERT_CHUNK_SIZE):
+                query = select(Ad.ad_id, Ad.content_hash, *(getattr(Ad, name) for name in DELTA_FIELDS)).where(Ad.ad_id.in_(chunk))
+                for ad_id, content_hash, *values in session.execute(query):
+                    stored_hashes[ad_id] = content_hash
+                    before[ad_id] = dict(zip(DELTA_FIELDS, values))
+        
+        with _timed(timings, "hash"):
+            hashes = {ad_id: self._content_hash(ad_data) for ad_id, ad_data in ads_by_id.items()}
+            changed = {
+                ad_id: ad_data for ad_id, ad_data in ads_by_id.items()
+                if ad_id not in stored_hashes or stored_hashes[ad_id] != hashes[ad_id]
+            }
+        stats["ads_unchanged"] = len(ads_by_id) - len(changed)
+        
+        if changed:
+            with _timed(timings, "accounts"):
+                account_ids = self._upsert_accounts(session, insert_, changed.values(), stats)
+            
+            with _timed(timings, "ads"):
+                ad_pks = self._upsert_ads(session, insert_, changed, hashes, account_ids)
+            stats["ads"] = len(changed.keys() - stored_hashes.keys())
+            stats["ads_updated"] = len(changed.keys() & stored_hashes.keys())
+            
+            with _timed(timings, "children"):
+                children = {ad_pks[ad_id]: ad_data for ad_id, ad_data in changed.items() if ad_id in ad_pks}
+                self._sync_children(session, children, stats)
+            
+            with _timed(timings, "events"):
+                events = [
+                    row
+                    for ad_id, ad_data in changed.items() if ad_id in ad_pks
+                    for row in self._ad_events(ad_pks[ad_id], ad_data, before.get(ad_id))
+                ]
+                stats["events"] = self._add_events(session, events)
+        
+        timings["db"] = timings.get("db", 0) + round((connection.info.get("db_seconds", 0.0) - db_seconds) * 1000)
+        return stats
+    
+    def _upsert_ads(self, session: Session, insert_, changed: Dict[int, Dict[str, Any]], hashes: Dict[int, str], account_ids: Dict[int, int]) -> Dict[int, int]:
+        """Upsert new and changed ads, returns ad_id -> ad.id."""
+        now = datetime.utcnow()
+        rows = []
+        for ad_id, ad_data in changed.items():
+            row = self._ad_values(ad_data, account_ids.get(ad_data.get('account_id')), hashes[ad_id])
+            row["created_at"] = now
+            row["updated_at"] = now
+            rows.append(row)
+        
+        # Statement without inline VALUES: compiled once and cached, rows are sent through
+        # SQLAlchemy's batched "insertmanyvalues" executemany with RETURNING
+        stmt = insert_(Ad)
+        update_cols = {name: stmt.excluded[name] for name in AD_MUTABLE_FIELDS}
+        update_cols["account_id_fk"] = func.coalesce(stmt.excluded.account_id_fk, Ad.account_id_fk)
+        update_cols["content_hash"] = stmt.excluded.content_hash
+        update_cols["updated_at"] = stmt.excluded.updated_at
+        # Keep translated text unless the source text changed, then queue it for translation again
+        same_text = Ad.text_hash == stmt.excluded.text_hash
+        update_cols["subject"] = case((same_text, Ad.subject), else_=stmt.excluded.subject)
+        update_cols["body"] = case((same_text, Ad.body), else_=stmt.excluded.body)
+        update_cols["translated"] = case((same_text, Ad.translated), else_=False)
+        # A claimed translation of the old text must not be saved over the new one
+        update_cols["translation_claim"] = case((same_text, Ad.translation_claim), else_=None)
+        update_cols["translation_claimed_until"] = case((same_text, Ad.translation_claimed_until), else_=None)
+        update_cols["text_hash"] = stmt.excluded.text_hash
+        for name in ("price", "price_unit", "price_per_m2"):
+            update_cols[name] = stmt.excluded[name]
+        # Follows the coordinates, also fills cells of rows stored before Ad.geo_cell existed
+        update_cols["geo_cell"] = stmt.excluded.geo_cell
+        stmt = stmt.on_conflict_do_update(index_elements=[Ad.ad_id], set_=update_cols)
+        stmt = stmt.returning(Ad.id, Ad.ad_id).execution_options(render_nulls=True)
+        ad_pks: Dict[int, int] = {}
+        for pk, ad_id in session.execute(stmt, rows):
+            ad_pks[ad_id] = pk
+        return ad_pks
+    
+    def _upsert_accounts(self, session: Session, insert_, ads_data, stats: Dict[str, int]) -> Dict[int, int]:
+        """Upsert the accounts of a batch, returns account_id -> account.id."""
+        accounts = {}
+        for ad_data in ads_data:
+            account_id = ad_data.get('account_id')
+            if account_id:
+                accounts[account_id] = {
+                    "account_id": account_id,
+                    "account_oid": ad_data.get('account_oid', ''),
+                    "account_name": ad_data.get('account_name', ''),
+                    "full_name": ad_data.get('full_name', ''),
+                    "avatar": ad_data.get('avatar'),
+                    "live_ads": ad_data.get('seller_info', {}).get('live_ads'),
+                }
+        if not accounts:
+            return {}
+        
+        existing = set(session.scalars(select(Account.account_id).where(Account.account_id.in_(list(accounts)))))
+        stats["accounts"] = len(accounts.keys() - existing)
+        
+        stmt = insert_(Account)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Account.account_id],
+            set_={
+                "account_oid": stmt.excluded.account_oid,
+                "account_name": stmt.excluded.account_name,
+                "full_name": stmt.excluded.full_name,
+                "avatar": stmt.excluded.avatar,
+                "live_ads": func.coalesce(stmt.excluded.live_ads, Account.live_ads),
+            },
+        )
+        stmt = stmt.returning(Account.id, Account.account_id).execution_options(render_nulls=True)
+        account_pks = {}
+        for pk, account_id in session.execute(stmt, list(accounts.values())):
+            account_pks[account_id] = pk
+        return account_pks
+    
+    def _sync_children(self, session: Session, ads_by_pk: Dict[int, Dict[str, Any]], stats: Dict[str, int]) -> None:
+        """Bring images and parameters of a batch of ads in line with the payload."""
+        if not ads_by_pk:
+            return
+        added, removed = self._sync_rows(
+            session, AdImage, IMAGE_KEY,
+            {pk: self._image_rows(ad_data) for pk, ad_data in ads_by_pk.items()},
+        )
+        stats["images"] += added
+        stats["images_removed"] += removed
+        
+        added, removed = self._sync_rows(
+            session, AdParameter, PARAMETER_KEY,
+            {pk: self._parameter_rows(ad_data) for pk, ad_data in ads_by_pk.items()},
+        )
+        stats["parameters"] += added
+        stats["parameters_removed"] += removed
+    
+    def _sync_rows(self, session, model, key_columns: Tuple[str, ...], desired: Dict[int, List[Dict[str, Any]]]) -> Tuple[int, int]:
+        """
+        Diff child rows of the given ads against the stored ones and write only the difference.
+        
+        Stored rows are fetched in one query per chunk of ads. Rows present in both are left
+        untouched, missing rows are inserted with one executemany and stale rows are deleted by id.
+        
+        Returns:
+            Tuple[int, int]: Number of inserted and deleted rows
+        """
+        key_attrs = [getattr(model, name) for name in key_columns]
+        stored: Dict[tuple, List[int]] = defaultdict(list)
+        for chunk in _chunks(list(desired), UPSERT_CHUNK_SIZE):
+            query = select(model.id, model.ad_id_fk, *key_attrs).where(model.ad_id_fk.in_(chunk))
+            for row_id, ad_pk, *key in session.execute(query):
+                stored[(ad_pk, *key)].append(row_id)
+        
+        to_insert = []
+        for ad_pk, rows in desired.items():
+            for row in rows:
+                ids = stored.get((ad_pk, *(row[name] for name in key_columns)))
+                if ids:
+                    ids.pop()
+                else:
+                    to_insert.append({"ad_id_fk": ad_pk, **row})
         
+        stale = [row_id for ids in stored.values() for row_id in ids]
+        for chunk in _chunks(stale, UPSERT_CHUNK_SIZE):
+            session.execute(delete(model).where(model.id.in_(chunk)))
+        if to_insert:
+            # render_nulls keeps rows with and without NULLs in one executemany
+            session.execute(insert(model).execution_options(render_nulls=True), to_insert)
+        return len(to_insert), len(stale)
+    
+    def _process_ads_one_by_one(self, ads_data: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Save ads one at a time, isolating failures of individual ads."""
         session = self.db_manager.get_session()
-        stats = {"accounts": 0, "ads": 0, "images": 0, "parameters": 0}
+        try:
+            return self._write_one_by_one(session, ads_data)
+        finally:
+            session.close()
+    
+    def _write_one_by_one(self, session: Session, ads_data: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Per-ad write path, commits its own transaction."""
+        stats = dict(EMPTY_STATS)
         
         try:
-            ads_data = response_data['ads']
             logger.info(f"Processing {len(ads_data)} ads from response")
             
             for ad_data in ads_data:
+                ad_stats = dict.fromkeys(EMPTY_STATS, 0)
                 try:
-                    # Process account first
-                    account = self._process_account(session, ad_data)
-                    if account:
-                        stats["accounts"] += 1
-                    
-                    # Process ad
-                    ad = self._process_ad(session, ad_data, account)
-                    if ad:
-                        stats["ads"] += 1
-                        
-                        # Process images
-                        images_count = self._process_ad_images(session, ad_data, ad)
-                        stats["images"] += images_count
+                    # A savepoint per ad, a failing ad leaves the others in the transaction
+                    with session.begin_nested():
+                        # Process account first
+                        account = self._process_account(session, ad_data)
+                        if account:
+                            ad_stats["accounts"] += 1
                         
-                        # Process parameters
-                        params_count = self._process_ad_parameters(session, ad_data, ad)
-                        stats["parameters"] += params_count
+                        # Process ad
+                        ad, outcome = self._process_ad(session, ad_data, account)
+                        if outcome in AD_OUTCOME_STATS:
+                            ad_stats[AD_OUTCOME_STATS[outcome]] += 1
+                        if ad:
+                            # Process images and parameters, of new and updated ads alike:
+                            # the stored content hash already covers them
+                            self._sync_children(session, {ad.id: ad_data}, ad_stats)
                 
+                except OperationalError:
+                    raise
                 except Exception as e:
                     logger.error(f"Error processing ad {ad_data.get('ad_id', 'unknown')}: {e}")
-                    session.rollback()
+                    stats["errors"] += 1
                     continue
+                
+                for name, count in ad_stats.items():
+                    stats[name] += count
             
             session.commit()
+            _record_rows(stats)
             logger.info(f"Successfully processed data: {stats}")
             
         except Exception as e:
             logger.error(f"Error processing response: {e}")
             session.rollback()
-            
-        finally:
-            session.close()
+            if isinstance(e, OperationalError):
+                raise
+            # Nothing of the batch was stored
+            stats = dict(EMPTY_STATS, errors=len(ads_data))
+            _record_rows(stats)
             
         return stats
     
+    def _ad_values(self, ad_data: Dict[str, Any], account_pk: Optional[int], content_hash: Optional[str] = None) -> Dict[str, Any]:
+        """Column values of an Ad row built from the chotot payload."""
+        values = {name: ad_data.get(name) for name in AD_FIELDS}
+        values["account_id_fk"] = account_pk
+        values["content_hash"] = content_hash or self._content_hash(ad_data)
+        values["text_hash"] = self._text_hash(ad_data)
+        values.update(price_columns(ad_data.get('price_string'), ad_data.get('size'), ad_data.get('type')))
+        values["geo_cell"] = encode(ad_data.get('latitude'), ad_data.get('longitude'))
+        return values
+    
+    def _text_hash(self, ad_data: Dict[str, Any]) -> str:
+        """Hash of the source subject and body."""
+        encoded = json.dumps([ad_data.get('subject'), ad_data.get('body')], ensure_ascii=False)
+        return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _ad_events(self, ad_pk: int, ad_data: Dict[str, Any], before: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Change events of an ad, as AdEvent rows.
+        
+        Args:
+            ad_pk (int): Ad.id
+            ad_data (Dict[str, Any]): Ad as returned by the chotot API
+            before (Optional[Dict[str, Any]]): Stored DELTA_FIELDS of the ad, None for a new ad
+            
+        Returns:
+            List[Dict[str, Any]]: AdEvent column values
+        """
+        def change(kind: str, old: Any = None, new: Any = None) -> Dict[str, Any]:
+            data = json.dumps({"old": old, "new": new}, ensure_ascii=False) if old is not None or new is not None else None
+            return {"ad_id_fk": ad_pk, "ad_id": ad_data['ad_id'], "kind": kind, "data": data, "created_at": now}
+        
+        now = datetime.utcnow()
+        if before is None:
+            return [change("new")]
+        
+        events = []
+        old_status = {"state": before["state"], "status": before["status"]}
+        new_status = {"state": ad_data.get('state'), "status": ad_data.get('status')}
+        if old_status != new_status:
+            was_live = old_status == {"state": LIVE_STATE, "status": LIVE_STATUS}
+            is_live = new_status == {"state": LIVE_STATE, "status": LIVE_STATUS}
+            events.append(change("removed" if was_live and not is_live else "status_changed", old_status, new_status))
+        if before["price_string"] != ad_data.get('price_string'):
+            events.append(change("price_changed", before["price_string"], ad_data.get('price_string')))
+        # Ads stored before text_hash existed have no "before" text to compare with
+        if before["text_hash"] is not None and before["text_hash"] != self._text_hash(ad_data):
+            events.append(change("body_changed"))
+        return events
+    
+    def _add_events(self, session: Session, events: List[Dict[str, Any]]) -> int:
+        """Write change events to the outbox inside the caller's transaction."""
+        if events:
+            session.execute(insert(AdEvent), events)
+        return len(events)
+    
+    def _content_hash(self, ad_data: Dict[str, Any]) -> str:
+        """Hash of everything an ingest pass may rewrite: mutable ad fields, images and parameters."""
+        content = {
+            "fields": {name: ad_data.get(name) for name in AD_MUTABLE_FIELDS},
+            "images": self._image_rows(ad_data),
+            "params": self._parameter_rows(ad_data),
+        }
+        encoded = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def _image_rows(self, ad_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """AdImage column values (without the ad foreign key) built from the chotot payload."""
+        rows = []
+        
+        # Main images
+        for image_url in ad_data.get('images', []):
+            rows.append({"image_url": image_url, "thumbnail_url": None, "image_type": 'regular'})
+        
+        # Thumbnail images, saved as full size image with its thumbnail
+        for img_thumb in ad_data.get('image_thumbnails', []):
+            if isinstance(img_thumb, dict) and img_thumb.get('image'):
+                rows.append({
+                    "image_url": img_thumb['image'],
+                    "thumbnail_url": img_thumb.get('thumbnail'),
+                    "image_type": 'regular',
+                })
+        
+        # Webp image
+        if ad_data.get('webp_image'):
+            rows.append({"image_url": ad_data['webp_image'], "thumbnail_url": None, "image_type": 'webp'})
+        
+        return rows
+    
+    def _parameter_rows(self, ad_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """AdParameter column values (without the ad foreign key) built from the chotot payload."""
+        return [
+            {
+                "param_id": param.get('id', ''),
+                "value": param.get('value', ''),
+                "label": param.get('label', ''),
+            }
+            for param in ad_data.get('params', [])
+            if isinstance(param, dict)
+        ]
+    
     def _process_account(self, session: Session, ad_data: Dict[str, Any]) -> Optional[Account]:
         """Process and save account data."""
         try:
@@ -113,94 +717,72 @@ class DataProcessor:
             session.flush()  # Get the ID
             return account
             
-        except IntegrityError as e:
-            logger.warning(f"Account {account_id} already exists: {e}")
-            session.rollback()
-            return session.query(Account).filter_by(account_id=account_id).first()
         except Exception as e:
             logger.error(f"Error processing account {ad_data.get('account_id')}: {e}")
-            return None
+            raise
     
-    def _process_ad(self, session: Session, ad_data: Dict[str, Any], account: Account) -> Optional[Ad]:
-        """Process and save ad data."""
+    def _process_ad(self, session: Session, ad_data: Dict[str, Any], account: Account) -> Tuple[Optional[Ad], str]:
+        """
+        Process and save ad data.
+        
+        Returns:
+            Tuple[Optional[Ad], str]: The ad whose children must be synced, if any, and
+            the outcome: "new", "updated", "unchanged" or "skipped"
+        """
         try:
             ad_id = ad_data.get('ad_id')
             if not ad_id:
-                return None
+                return None, "skipped"
             
             # Check if ad already exists
             existing_ad = session.query(Ad).filter_by(ad_id=ad_id).first()
+            content_hash = self._content_hash(ad_data)
             if existing_ad:
-                # Update existing ad with new data
-                self._update_ad_fields(existing_ad, ad_data, account)
-                return None
+                # Update existing ad with new data, unless nothing changed
+                if existing_ad.content_hash != content_hash:
+                    before = {name: getattr(existing_ad, name) for name in DELTA_FIELDS}
+                    self._update_ad_fields(existing_ad, ad_data, account, session)
+                    existing_ad.content_hash = content_hash
+                    self._add_events(session, self._ad_events(existing_ad.id, ad_data, before))
+                    return existing_ad, "updated"
+                return None, "unchanged"
             
             # Create new ad
-            ad = Ad(
-                ad_id=ad_id,
-                list_id=ad_data.get('list_id'),
-                list_time=ad_data.get('list_time'),
-                state=ad_data.get('state'),
-                type=ad_data.get('type'),
-                region=ad_data.get('region'),
-                category=ad_data.get('category'),
-                subject=ad_data.get('subject'),
-                body=ad_data.get('body'),
-                image=ad_data.get('image'),
-                status=ad_data.get('status'),
-                commercial_type=ad_data.get('commercial_type'),
-                size=ad_data.get('size'),
-                area=ad_data.get('area'),
-                longitude=ad_data.get('longitude'),
-                latitude=ad_data.get('latitude'),
-                property_legal_document=ad_data.get('property_legal_document'),
-                region_v2=ad_data.get('region_v2'),
-                area_v2=ad_data.get('area_v2'),
-                ward=ad_data.get('ward'),
-                furnishing_sell=ad_data.get('furnishing_sell'),
-                street_name=ad_data.get('street_name'),
-                location_id=ad_data.get('location_id'),
-                unique_street_id=ad_data.get('unique_street_id'),
-                is_main_street=ad_data.get('is_main_street'),
-                location=ad_data.get('location'),
-                date=ad_data.get('date'),
-                category_name=ad_data.get('category_name'),
-                area_name=ad_data.get('area_name'),
-                region_name=ad_data.get('region_name'),
-                price_string=ad_data.get('price_string'),
-                webp_image=ad_data.get('webp_image'),
-                number_of_images=ad_data.get('number_of_images'),
-                ward_name=ad_data.get('ward_name'),
-                pty_map=ad_data.get('pty_map'),
-                pty_map_modifier=ad_data.get('pty_map_modifier'),
-                thumbnail_image=ad_data.get('thumbnail_image'),
-                size_unit_string=ad_data.get('size_unit_string'),
-                contain_videos=ad_data.get('contain_videos'),
-                account_id_fk=account.id if account else None
-            )
+            ad = Ad(**self._ad_values(ad_data, account.id if account else None, content_hash))
             
             session.add(ad)
             session.flush()  # Get the ID
-            return ad
+            self._add_events(session, self._ad_events(ad.id, ad_data, None))
+            return ad, "new"
             
-        except IntegrityError as e:
-            logger.warning(f"Ad {ad_id} already exists: {e}")
-            session.rollback()
-            return session.query(Ad).filter_by(ad_id=ad_id).first()
         except Exception as e:
             logger.error(f"Error processing ad {ad_data.get('ad_id')}: {e}")
-            return None
+            raise
     
-    def _update_ad_fields(self, ad: Ad, ad_data: Dict[str, Any], account: Account) -> None:
-        """Update existing ad with new data."""
-        session = self.db_manager.get_session()
+    def _update_ad_fields(self, ad: Ad, ad_data: Dict[str, Any], account: Account, session: Optional[Session] = None) -> None:
+        """
+        Update existing ad with new data.
+        
+        With a session the ad is updated inside the caller's transaction, otherwise
+        the change is merged and committed in a session of its own.
+        """
+        own_session = session is None
+        if own_session:
+            session = self.db_manager.get_session()
         try:
             # Update fields that might change
             ad.list_time = ad_data.get('list_time', ad.list_time)
             ad.state = ad_data.get('state', ad.state)
             ad.status = ad_data.get('status', ad.status)
-            ad.subject = ad_data.get('subject', ad.subject)
-            ad.body = ad_data.get('body', ad.body)
+            # Translated text is kept until the source text changes
+            text_hash = self._text_hash(ad_data)
+            if ad.text_hash != text_hash:
+                ad.subject = ad_data.get('subject', ad.subject)
+                ad.body = ad_data.get('body', ad.body)
+                ad.text_hash = text_hash
+                ad.translated = False
+                ad.translation_claim = None
+                ad.translation_claimed_until = None
             ad.translated = ad_data.get("translated", ad.translated)
             ad.image = ad_data.get('image', ad.image)
             ad.webp_image = ad_data.get('webp_image', ad.webp_image)
@@ -208,121 +790,108 @@ class DataProcessor:
             ad.number_of_images = ad_data.get('number_of_images', ad.number_of_images)
             ad.contain_videos = ad_data.get('contain_videos', ad.contain_videos)
             ad.price_string = ad_data.get('price_string', ad.price_string)
+            ad.size = ad_data.get('size', ad.size)
+            for name, value in price_columns(ad.price_string, ad.size, ad.type).items():
+                setattr(ad, name, value)
+            ad.latitude = ad_data.get('latitude', ad.latitude)
+            ad.longitude = ad_data.get('longitude', ad.longitude)
+            ad.geo_cell = encode(ad.latitude, ad.longitude)
             if account:
                 ad.account_id_fk = account.id
-            session.merge(ad)
-            session.commit()
+            if own_session:
+                session.merge(ad)
+                session.commit()
         except Exception as e:
             logger.error(f"Error updating ad {ad.ad_id}: {e}")
+            if not own_session:
+                raise
             session.rollback()
         finally:
-            session.close()
-            
+            if own_session:
+                session.close()
     
-    def _process_ad_images(self, session: Session, ad_data: Dict[str, Any], ad: Ad) -> int:
-        """Process and save ad images."""
-        if not ad:
-            return 0
-        
-        count = 0
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Get current database statistics.
         
+        Returns:
+            Dict[str, int]: Current counts of records in database
+        """
+        session = self.db_manager.get_session()
         try:
-            # Clear existing images for this ad
-            session.query(AdImage).filter_by(ad_id_fk=ad.id).delete()
-            
-            # Process main images
-            images = ad_data.get('images', [])
-            for image_url in images:
-                ad_image = AdImage(
-                    ad_id_fk=ad.id,
-                    image_url=image_url,
-                    image_type='regular'
-                )
-                session.add(ad_image)
-                count += 1
-            
-            # Process thumbnail images
-            image_thumbnails = ad_data.get('image_thumbnails', [])
-            for img_thumb in image_thumbnails:
-                if isinstance(img_thumb, dict):
-                    # Add full size image
-                    if img_thumb.get('image'):
-                        ad_image = AdImage(
-                            ad_id_fk=ad.id,
-                            image_url=img_thumb['image'],
-                            thumbnail_url=img_thumb.get('thumbnail'),
-                            image_type='regular'
-                        )
-                        session.add(ad_image)
-                        count += 1
-            
-            # Process webp image
-            if ad_data.get('webp_image'):
-                ad_image = AdImage(
-                    ad_id_fk=ad.id,
-                    image_url=ad_data['webp_image'],
-                    image_type='webp'
-                )
-                session.add(ad_image)
-                count += 1
-            
+            return self._count_rows(session)
         except Exception as e:
-            logger.error(f"Error processing images for ad {ad.ad_id}: {e}")
-        
-        return count
+            logger.error(f"Error getting database stats: {e}")
+            return {"accounts": 0, "ads": 0, "images": 0, "parameters": 0}
+        finally:
+            session.close()
     
-    def _process_ad_parameters(self, session: Session, ad_data: Dict[str, Any], ad: Ad) -> int:
-        """Process and save ad parameters."""
-        if not ad:
-            return 0
-        
-        count = 0
+    def _count_rows(self, session: Session) -> Dict[str, int]:
+        return {
+            "accounts": session.query(Account).count(),
+            "ads": session.query(Ad).count(),
+            "images": session.query(AdImage).count(),
+            "parameters": session.query(AdParameter).count()
+        }
+    
+    def get_watermark(self, query_key: str) -> Optional[Watermark]:
+        """
+        Get the newest (list_time, ad_id) ingested for a listing query.
         
-        try:
-            # Clear existing parameters for this ad
-            session.query(AdParameter).filter_by(ad_id_fk=ad.id).delete()
-            
-            # Process parameters
-            params = ad_data.get('params', [])
-            for param in params:
-                if isinstance(param, dict):
-                    ad_param = AdParameter(
-                        ad_id_fk=ad.id,
-                        param_id=param.get('id', ''),
-                        value=param.get('value', ''),
-                        label=param.get('label', '')
-                    )
-                    session.add(ad_param)
-                    count += 1
+        Args:
+            query_key (str): Query identifier, see Puller.query_key()
             
+        Returns:
+            Optional[Watermark]: Stored watermark, None if the query was never crawled
+        """
+        session = self.db_manager.get_session()
+        try:
+            return self._read_watermark(session, query_key)
         except Exception as e:
-            logger.error(f"Error processing parameters for ad {ad.ad_id}: {e}")
-        
-        return count
-
-    def get_stats(self) -> Dict[str, int]:
+            logger.error(f"Error getting crawl state for {query_key}: {e}")
+            return None
+        finally:
+            session.close()
+    
+    def save_watermark(self, query_key: str, watermark: Watermark) -> bool:
         """
-        Get current database statistics.
+        Advance the watermark of a listing query, never moving it backwards.
         
+        Args:
+            query_key (str): Query identifier, see Puller.query_key()
+            watermark (Watermark): Newest (list_time, ad_id) ingested by the run
+            
         Returns:
-            Dict[str, int]: Current counts of records in database
+            bool: True if successful, False otherwise
         """
         session = self.db_manager.get_session()
         try:
-            stats = {
-                "accounts": session.query(Account).count(),
-                "ads": session.query(Ad).count(),
-                "images": session.query(AdImage).count(),
-                "parameters": session.query(AdParameter).count()
-            }
-            return stats
+            self._write_watermark(session, query_key, watermark)
+            session.commit()
+            return True
         except Exception as e:
-            logger.error(f"Error getting database stats: {e}")
-            return {"accounts": 0, "ads": 0, "images": 0, "parameters": 0}
+            logger.error(f"Error saving crawl state for {query_key}: {e}")
+            session.rollback()
+            return False
         finally:
             session.close()
     
-    def get_recent_ads(self, limit: int = 10) -> List[Ad]:
+    def _read_watermark(self, session: Session, query_key: str) -> Optional[Watermark]:
+        state = session.query(CrawlState).filter_by(query_key=query_key).first()
+        if state is None or state.max_list_time is None:
+            return None
+        return (state.max_list_time, state.max_ad_id or 0)
+    
+    def _write_watermark(self, session: Session, query_key: str, watermark: Watermark) -> None:
+        state = session.query(CrawlState).filter_by(query_key=query_key).with_for_update().first()
+        if state is None:
+            state = CrawlState(query_key=query_key)
+            session.add(state)
+        stored = (state.max_list_time, state.max_ad_id or 0) if state.max_list_time is not None else None
+        if stored is None or watermark > stored:
+            state.max_list_time, state.max_ad_id = watermark
+    
+    def get_recent_ads(self, limit: int = 10) -> List[AdCard]:
         """
         Get most recently created ads.
         
@@ -330,39 +899,835 @@ class DataProcessor:
             limit (int): Maximum number of ads to return
             
         Returns:
-            List[Ad]: List of recent Ad objects
+            List[AdCard]: Recent ads with their regular images
         """
         session = self.db_manager.get_session()
         try:
-            ads = session.query(Ad).options(joinedload(Ad.images)).order_by(Ad.created_at.desc()).limit(limit).all()
-            return ads
+            return self._load_cards(session, recent_ads_query(limit))
         except Exception as e:
             logger.error(f"Error getting recent ads: {e}")
             return []
         finally:
             session.close()
     
-    def clear_all_data(self) -> bool:
+    def get_unposted_ads(self, limit: int = 50, exclude: Sequence[int] = ()) -> List[AdCard]:
         """
-        Clear all data from database tables.
-        WARNING: This will delete all data!
+        Get newest ads not posted to every chat yet, with their images.
+        
+        Args:
+            limit (int): Maximum number of ads to return
+            exclude (Sequence[int]): Ad.id of ads to skip, e.g. ones that failed to post
+            
+        Returns:
+            List[AdCard]: Unposted ads with their regular images
+        """
+        session = self.db_manager.get_session()
+        try:
+            query = unposted_ads_query(limit)
+            if exclude:
+                query = query.where(Ad.id.not_in(exclude))
+            return self._load_cards(session, query)
+        except Exception as e:
+            logger.error(f"Error getting unposted ads: {e}")
+            return []
+        finally:
+            session.close()
+    
+    def _load_cards(self, session: Session, query) -> List[AdCard]:
+        """Project an ad query onto AdCard, loading the images of all ads in one query per chunk."""
+        rows = session.execute(query.with_only_columns(Ad.id, Ad.ad_id, Ad.subject, Ad.body, Ad.list_time))
+        cards = [AdCard(*row) for row in rows]
+        by_pk = {card.id: card for card in cards}
+        for chunk in _chunks(list(by_pk), UPSERT_CHUNK_SIZE):
+            images = (
+                select(AdImage.ad_id_fk, AdImage.id, AdImage.image_url, AdImage.content_hash)
+                .where(AdImage.ad_id_fk.in_(chunk), AdImage.image_type == 'regular')
+                .order_by(AdImage.id)
+            )
+            for ad_pk, *image in session.execute(images):
+                by_pk[ad_pk].images.append(ImageView(*image))
+        return cards
+    
+    def get_posted_chats(self, ad_pks: Sequence[int]) -> Dict[int, Set[str]]:
+        """
+        Get the chats each ad was already posted to.
+        
+        Args:
+            ad_pks (Sequence[int]): Ad.id of the ads
+            
+        Returns:
+            Dict[int, Set[str]]: Chat ids by Ad.id, ads never posted are missing
+        """
+        posted: Dict[int, Set[str]] = defaultdict(set)
+        session = self.db_manager.get_session()
+        try:
+            for chunk in _chunks(list(ad_pks), UPSERT_CHUNK_SIZE):
+                query = select(AdPost.ad_id_fk, AdPost.chat_id).where(AdPost.ad_id_fk.in_(chunk))
+                for ad_pk, chat_id in session.execute(query):
+                    posted[ad_pk].add(chat_id)
+        except Exception as e:
+            logger.error(f"Error getting posted chats: {e}")
+        finally:
+            session.close()
+        return dict(posted)
+    
+    def record_post(self, ad_pk: int, chat_id: str, message_id: Optional[int], chat_ids: Sequence[str]) -> bool:
+        """
+        Record that an ad was posted to a chat, and mark the ad posted once every chat has it.
         
+        The ad row is locked first, so posts of the same ad to different chats recorded
+        at the same time see each other and exactly one of them sets Ad.posted.
+        
+        Args:
+            ad_pk (int): Ad.id of the posted ad
+            chat_id (str): Chat the ad was posted to
+            message_id (Optional[int]): Telegram message id of the post
+            chat_ids (Sequence[str]): All chats the ad has to be posted to
+            
         Returns:
             bool: True if successful, False otherwise
         """
+        now = datetime.utcnow()
         session = self.db_manager.get_session()
         try:
-            # Delete in order to avoid foreign key constraints
-            session.query(AdParameter).delete()
-            session.query(AdImage).delete()
-            session.query(Ad).delete()
-            session.query(Account).delete()
+            session.execute(select(Ad.id).where(Ad.id == ad_pk).with_for_update())
+            session.add(AdPost(ad_id_fk=ad_pk, chat_id=str(chat_id), message_id=message_id, posted_at=now))
+            session.flush()
+            posted = set(session.scalars(select(AdPost.chat_id).where(AdPost.ad_id_fk == ad_pk)))
+            if {str(chat) for chat in chat_ids} <= posted:
+                session.execute(update(Ad).where(Ad.id == ad_pk).values(posted=now))
             session.commit()
-            logger.info("All data cleared from database")
             return True
         except Exception as e:
-            logger.error(f"Error clearing database: {e}")
+            logger.error(f"Error recording post of ad {ad_pk} to {chat_id}: {e}")
             session.rollback()
             return False
         finally:
             session.close()
+    
+    def mark_posted(self, ad_pks: Sequence[int]) -> int:
+        """
+        Mark ads as posted, e.g. ads whose every chat post is already recorded.
+        
+        Args:
+            ad_pks (Sequence[int]): Ad.id of the ads
+            
+        Returns:
+            int: Number of ads marked
+        """
+        if not ad_pks:
+            return 0
+        
+        session = self.db_manager.get_session()
+        try:
+            result = session.execute(
+                update(Ad)
+                .where(Ad.id.in_(ad_pks), Ad.posted.is_(None))
+                .values(posted=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+            return result.rowcount
+        except Exception as e:
+            logger.error(f"Error marking {len(ad_pks)} ads posted: {e}")
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+    
+    def save_image_hashes(self, hashes: Dict[int, str]) -> int:
+        """
+        Store the image cache key of ad images.
+        
+        Args:
+            hashes (Dict[int, str]): Content hash by AdImage.id
+            
+        Returns:
+            int: Number of images updated
+        """
+        if not hashes:
+            return 0
+        
+        session = self.db_manager.get_session()
+        try:
+            session.execute(update(AdImage), [{"id": image_pk, "content_hash": content_hash} for image_pk, content_hash in hashes.items()])
+            session.commit()
+            return len(hashes)
+        except Exception as e:
+            logger.error(f"Error saving {len(hashes)} image hashes: {e}")
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+    
+    def get_telegram_files(self, content_hashes: Sequence[str]) -> Dict[str, str]:
+        """
+        Get Telegram file_ids of already uploaded images.
+        
+        Args:
+            content_hashes (Sequence[str]): Image cache keys
+            
+        Returns:
+            Dict[str, str]: file_id by content hash, images never uploaded are missing
+        """
+        files: Dict[str, str] = {}
+        session = self.db_manager.get_session()
+        try:
+            for chunk in _chunks(list(content_hashes), UPSERT_CHUNK_SIZE):
+                query = select(TelegramFile.content_hash, TelegramFile.file_id).where(TelegramFile.content_hash.in_(chunk))
+                for content_hash, file_id in session.execute(query):
+                    files[content_hash] = file_id
+        except Exception as e:
+            logger.error(f"Error getting telegram files: {e}")
+        finally:
+            session.close()
+        return files
+    
+    def save_telegram_files(self, files: Dict[str, str]) -> int:
+        """
+        Store Telegram file_ids of uploaded images, keeping ones already stored.
+        
+        Args:
+            files (Dict[str, str]): file_id by content hash
+            
+        Returns:
+            int: Number of file_ids sent to the database
+        """
+        if not files:
+            return 0
+        
+        now = datetime.utcnow()
+        rows = [{"content_hash": content_hash, "file_id": file_id, "created_at": now} for content_hash, file_id in files.items()]
+        session = self.db_manager.get_session()
+        try:
+            insert_ = UPSERT_INSERTS.get(session.get_bind().dialect.name)
+            if insert_ is None:
+                existing = set(session.scalars(select(TelegramFile.content_hash).where(TelegramFile.content_hash.in_(list(files)))))
+                session.add_all(TelegramFile(**row) for row in rows if row["content_hash"] not in existing)
+            else:
+                session.execute(insert_(TelegramFile).on_conflict_do_nothing(index_elements=[TelegramFile.content_hash]), rows)
+            session.commit()
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error saving {len(rows)} telegram files: {e}")
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+    
+    def find_ads(self, filters: Optional[Dict[str, Any]] = None, order_by: str = "price", descending: bool = False, limit: int = 50) -> List[AdListing]:
+        """
+        Search ads by price and size ranges.
+        
+        Args:
+            filters (Optional[Dict[str, Any]]): price_unit, min_price, max_price, min_price_per_m2,
+                max_price_per_m2, min_size, max_size; prices in VND, monthly for rentals
+            order_by (str): price, price_per_m2, size or list_time
+            descending (bool): Sort from the highest value
+            limit (int): Maximum number of ads to return
+            
+        Returns:
+            List[AdListing]: Matching ads in sort order
+        """
+        session = self.db_manager.get_session()
+        try:
+            query = ad_range_query(filters or {}, order_by=order_by, descending=descending, limit=limit)
+            return [AdListing(*row) for row in session.execute(query)]
+        except Exception as e:
+            logger.error(f"Error searching ads by {filters}: {e}")
+            return []
+        finally:
+            session.close()
+    
+    def find_ads_near(self, latitude: float, longitude: float, radius_km: float, filters: Optional[Dict[str, Any]] = None, limit: int = 50) -> List[AdListing]:
+        """
+        Search ads within a distance of a point, nearest first.
+        
+        The circle's bounding box is covered with at most geo.MAX_COVER_CELLS geohash
+        cells, which become integer ranges on ix_ad_geo_cell. Only the ads of those
+        cells are read. Their exact distances are computed in one vectorized haversine.
+        
+        Args:
+            latitude (float): Degrees north
+            longitude (float): Degrees east
+            radius_km (float): Search radius in km
+            filters (Optional[Dict[str, Any]]): Price and size filters, see find_ads()
+            limit (int): Maximum number of ads to return
+            
+        Returns:
+            List[AdListing]: Ads within the radius with distance_km set, nearest first
+        """
+        session = self.db_manager.get_session()
+        try:
+            ranges = cover(*bounding_box(latitude, longitude, radius_km))
+            rows = [row for row in session.execute(cell_query(ranges)) if matches_filters(row, filters or {})]
+            if not rows:
+                return []
+            latitudes = np.fromiter((row.latitude for row in rows), dtype=np.float64, count=len(rows))
+            longitudes = np.fromiter((row.longitude for row in rows), dtype=np.float64, count=len(rows))
+            distances = haversine_km(latitude, longitude, latitudes, longitudes)
+            inside = np.flatnonzero(distances <= radius_km)
+            nearest = inside[np.argsort(distances[inside], kind="stable")][:limit]
+            return [AdListing(*rows[i], distance_km=float(distances[i])) for i in nearest.tolist()]
+        except Exception as e:
+            logger.error(f"Error searching ads within {radius_km} km of {latitude}, {longitude}: {e}")
+            return []
+        finally:
+            session.close()
+    
+    def find_ads_in_box(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, filters: Optional[Dict[str, Any]] = None, limit: int = 50) -> List[AdListing]:
+        """
+        Search ads inside a latitude/longitude box, newest first.
+        
+        Only the ads of the geo cells covering the box are read, see find_ads_near().
+        
+        Args:
+            min_lat (float): Southern edge in degrees
+            min_lon (float): Western edge in degrees
+            max_lat (float): Northern edge in degrees
+            max_lon (float): Eastern edge in degrees
+            filters (Optional[Dict[str, Any]]): Price and size filters, see find_ads()
+            limit (int): Maximum number of ads to return
+            
+        Returns:
+            List[AdListing]: Ads inside the box
+        """
+        session = self.db_manager.get_session()
+        try:
+            query = (
+                cell_query(cover(min_lat, min_lon, max_lat, max_lon))
+                .where(Ad.latitude.between(min_lat, max_lat), Ad.longitude.between(min_lon, max_lon))
+            )
+            # Sorted here: with ORDER BY ... LIMIT planners tend to walk ix_ad_list_time instead of the cells
+            listings = [AdListing(*row) for row in session.execute(query) if matches_filters(row, filters or {})]
+            listings.sort(key=lambda listing: listing.list_time or 0, reverse=True)
+            return listings[:limit]
+        except Exception as e:
+            logger.error(f"Error searching ads in box {min_lat}, {min_lon}, {max_lat}, {max_lon}: {e}")
+            return []
+        finally:
+            session.close()
+    
+    def backfill_geo_cells(self, batch_size: int = 5000) -> int:
+        """
+        Fill Ad.geo_cell of stored ads from their coordinates.
+        
+        Ads are read in primary key order, the cells of a batch are computed at once
+        with geo.encode_many() and written back with one executemany UPDATE per batch.
+        
+        Args:
+            batch_size (int): Ads per transaction
+            
+        Returns:
+            int: Number of ads updated
+        """
+        session = self.db_manager.get_session()
+        updated = 0
+        last_pk = 0
+        try:
+            while True:
+                query = (
+                    select(Ad.id, Ad.latitude, Ad.longitude)
+                    .where(Ad.id > last_pk, Ad.latitude.is_not(None), Ad.longitude.is_not(None))
+                    .order_by(Ad.id)
+                    .limit(batch_size)
+                )
+                rows = session.execute(query).all()
+                if not rows:
+                    break
+                last_pk = rows[-1][0]
+                cells = encode_many([row.latitude for row in rows], [row.longitude for row in rows])
+                session.execute(update(Ad), [{"id": row.id, "geo_cell": cell} for row, cell in zip(rows, cells)])
+                session.commit()
+                updated += len(rows)
+                logger.info(f"Backfilled geo cells of {updated} ads")
+            return updated
+        except Exception as e:
+            logger.error(f"Error backfilling geo cells after ad {last_pk}: {e}")
+            session.rollback()
+            return updated
+        finally:
+            session.close()
+    
+    def backfill_prices(self, batch_size: int = 5000) -> int:
+        """
+        Fill the numeric price columns of stored ads from their price_string.
+        
+        Ads are read in primary key order, the columns of a batch are computed at once
+        with prices.price_columns_many(), which parses each distinct price string once,
+        and written back with one executemany UPDATE per batch. Safe to rerun.
+        
+        Args:
+            batch_size (int): Ads per transaction
+            
+        Returns:
+            int: Number of ads updated
+        """
+        session = self.db_manager.get_session()
+        updated = 0
+        last_pk = 0
+        try:
+            while True:
+                query = (
+                    select(Ad.id, Ad.price_string, Ad.size, Ad.type)
+                    .where(Ad.id > last_pk)
+                    .order_by(Ad.id)
+                    .limit(batch_size)
+                )
+                rows = session.execute(query).all()
+                if not rows:
+                    break
+                last_pk = rows[-1][0]
+                columns = price_columns_many(
+                    [row.price_string for row in rows], [row.size for row in rows], [row.type for row in rows]
+                )
+                session.execute(update(Ad), [{"id": row.id, **values} for row, values in zip(rows, columns)])
+                session.commit()
+                updated += len(rows)
+                logger.info(f"Backfilled prices of {updated} ads")
+            return updated
+        except Exception as e:
+            logger.error(f"Error backfilling prices after ad {last_pk}: {e}")
+            session.rollback()
+            return updated
+        finally:
+            session.close()
+    
+    def get_untranslated_ads(self, limit: int = 100) -> List[AdText]:
+        """
+        Get newest ads that are not translated yet.
+        
+        Args:
+            limit (int): Maximum number of ads to return
+            
+        Returns:
+            List[AdText]: Texts of untranslated ads
+        """
+        session = self.db_manager.get_session()
+        try:
+            query = untranslated_ads_query(limit).with_only_columns(Ad.id, Ad.subject, Ad.body, Ad.list_time)
+            return [AdText(*row) for row in session.execute(query)]
+        except Exception as e:
+            logger.error(f"Error getting untranslated ads: {e}")
+            return []
+        finally:
+            session.close()
+    
+    def claim_untranslated_ads(self, limit: int = 50, lease_seconds: int = 600) -> List[AdText]:
+        """
+        Claim newest untranslated ads for one translation worker.
+        
+        Claimed ads are leased for `lease_seconds`: other workers skip them until the
+        lease expires, so ads of a crashed worker return to the queue on their own.
+        On PostgreSQL candidates are picked with FOR UPDATE SKIP LOCKED and concurrent
+        workers never wait for each other's rows. SQLite has no row locks, there the
+        conditional lease UPDATE alone keeps two workers from claiming the same ad.
+        
+        Args:
+            limit (int): Maximum number of ads to claim
+            lease_seconds (int): Time the worker has to save or release the ads
+            
+        Returns:
+            List[AdText]: Texts of the claimed ads with their claim token, pass it to
+            save_translations() and, with the failed ones, to release_claims()
+        """
+        now = datetime.utcnow()
+        claim = uuid.uuid4().hex
+        available = or_(Ad.translation_claimed_until.is_(None), Ad.translation_claimed_until < now)
+        session = self.db_manager.get_session()
+        try:
+            candidates = (
+                untranslated_ads_query(limit)
+                .where(available)
+                .with_only_columns(Ad.id)
+                .with_for_update(skip_locked=True)
+            )
+            ad_pks = session.scalars(candidates).all()
+            if not ad_pks:
+                return []
+            session.execute(
+                update(Ad)
+                .where(Ad.id.in_(ad_pks), available)
+                .values(translation_claim=claim, translation_claimed_until=now + timedelta(seconds=lease_seconds))
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+            claimed = select(Ad.id, Ad.subject, Ad.body, Ad.list_time).where(Ad.id.in_(ad_pks), Ad.translation_claim == claim)
+            return [AdText(*row, claim=claim) for row in session.execute(claimed)]
+        except Exception as e:
+            logger.error(f"Error claiming untranslated ads: {e}")
+            session.rollback()
+            return []
+        finally:
+            session.close()
+    
+    def release_claims(self, ad_pks: Sequence[int], claim: str) -> int:
+        """
+        Return claimed ads to the translation queue before their lease expires.
+        
+        Ads whose lease expired and was taken over by another worker are left alone.
+        
+        Args:
+            ad_pks (Sequence[int]): Ad.id of the ads that could not be translated
+            claim (str): AdText.claim of the ads
+            
+        Returns:
+            int: Number of ads released
+        """
+        if not ad_pks:
+            return 0
+        
+        session = self.db_manager.get_session()
+        try:
+            result = session.execute(
+                update(Ad)
+                .where(Ad.id.in_(ad_pks), Ad.translation_claim == claim)
+                .values(translation_claim=None, translation_claimed_until=None)
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+            return result.rowcount
+        except Exception as e:
+            logger.error(f"Error releasing {len(ad_pks)} claimed ads: {e}")
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+    
+    def save_translations(self, translations: Dict[int, Dict[str, str]], claim: str) -> int:
+        """
+        Store translated subjects and bodies and mark the ads as translated.
+        
+        Only ads still claimed with `claim` are written: after an expired lease another
+        worker owns the ad, and a re-ingest that replaces the source text drops the claim.
+        
+        Args:
+            translations (Dict[int, Dict[str, str]]): "subject" and "body" by Ad.id
+            claim (str): AdText.claim of the ads
+            
+        Returns:
+            int: Number of ads updated
+        """
+        if not translations:
+            return 0
+        
+        session = self.db_manager.get_session()
+        try:
+            owned = session.scalars(
+                select(Ad.id)
+                .where(Ad.id.in_(list(translations)), Ad.translation_claim == claim)
+                .with_for_update()
+            ).all()
+            if not owned:
+                return 0
+            rows = [
+                {"ad_pk": ad_pk, "new_subject": translations[ad_pk]["subject"], "new_body": translations[ad_pk]["body"]}
+                for ad_pk in owned
+            ]
+            # One executemany; the claim is checked again by the UPDATE itself
+            stmt = (
+                update(Ad)
+                .where(Ad.id == bindparam("ad_pk"), Ad.translation_claim == claim)
+                .values(
+                    subject=bindparam("new_subject"), body=bindparam("new_body"), translated=True,
+                    translation_claim=None, translation_claimed_until=None,
+                )
+            )
+            result = session.connection().execute(stmt, rows)
+            session.commit()
+            if not result.supports_sane_multi_rowcount():
+                # psycopg2 batches report no total, the rows are locked FOR UPDATE and all written
+                return len(rows)
+            return result.rowcount
+        except Exception as e:
+            logger.error(f"Error saving {len(translations)} translations: {e}")
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+    
+    def get_cached_translations(self, keys: Sequence[str]) -> Dict[str, Dict[str, str]]:
+        """
+        Look up translations by cache key and count the hits.
+        
+        Args:
+            keys (Sequence[str]): Distinct keys, see gemini.translation_key()
+            
+        Returns:
+            Dict[str, Dict[str, str]]: "subject" and "body" by key, misses are missing
+        """
+        cached: Dict[str, Dict[str, str]] = {}
+        session = self.db_manager.get_session()
+        try:
+            for chunk in _chunks(list(keys), UPSERT_CHUNK_SIZE):
+                query = select(TranslationCache.key, TranslationCache.subject, TranslationCache.body).where(TranslationCache.key.in_(chunk))
+                for key, subject, body in session.execute(query):
+                    cached[key] = {"subject": subject, "body": body}
+                hits = [key for key in chunk if key in cached]
+                if hits:
+                    session.execute(
+                        update(TranslationCache)
+                        .where(TranslationCache.key.in_(hits))
+                        .values(hits=func.coalesce(TranslationCache.hits, 0) + 1)
+                    )
+            session.commit()
+        except Exception as e:
+            logger.error(f"Error reading translation cache: {e}")
+            session.rollback()
+        finally:
+            session.close()
+        
+        TRANSLATION_CACHE.inc(len(cached), result="hit")
+        TRANSLATION_CACHE.inc(len(keys) - len(cached), result="miss")
+        return cached
+    
+    def cache_translations(self, translations: Dict[str, Dict[str, str]], target_language: str, prompt_version: int) -> int:
+        """
+        Store fresh translations in the cache, keeping entries that already exist.
+        
+        Args:
+            translations (Dict[str, Dict[str, str]]): "subject" and "body" by cache key
+            target_language (str): Language the texts were translated to
+            prompt_version (int): Version of the translation prompt
+            
+        Returns:
+            int: Number of entries sent to the cache
+        """
+        if not translations:
+            return 0
+        
+        now = datetime.utcnow()
+        rows = [
+            {
+                "key": key, "target_language": target_language, "prompt_version": prompt_version,
+                "subject": item["subject"], "body": item["body"], "hits": 0, "created_at": now,
+            }
+            for key, item in translations.items()
+        ]
+        session = self.db_manager.get_session()
+        try:
+            insert_ = UPSERT_INSERTS.get(session.get_bind().dialect.name)
+            if insert_ is None:
+                existing = set(session.scalars(select(TranslationCache.key).where(TranslationCache.key.in_(list(translations)))))
+                session.add_all(TranslationCache(**row) for row in rows if row["key"] not in existing)
+            else:
+                session.execute(insert_(TranslationCache).on_conflict_do_nothing(index_elements=[TranslationCache.key]), rows)
+            session.commit()
+            return len(rows)
+        except Exception as e:
+            logger.error(f"Error caching {len(rows)} translations: {e}")
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+    
+    def get_pending_events(self, limit: int = 500) -> List[ChangeEvent]:
+        """
+        Oldest change events not relayed yet.
+        
+        Args:
+            limit (int): Maximum number of events
+            
+        Returns:
+            List[ChangeEvent]: Events in the order they were detected
+        """
+        session = self.db_manager.get_session()
+        try:
+            query = (
+                select(AdEvent.id, AdEvent.ad_id_fk, AdEvent.ad_id, AdEvent.kind, AdEvent.data, AdEvent.created_at)
+                .order_by(AdEvent.id)
+                .limit(limit)
+            )
+            return [
+                ChangeEvent(id, ad_pk, ad_id, kind, json.loads(data) if data else None, created_at)
+                for id, ad_pk, ad_id, kind, data, created_at in session.execute(query)
+            ]
+        except Exception as e:
+            logger.error(f"Error getting pending events: {e}")
+            return []
+        finally:
+            session.close()
+    
+    def delete_events(self, event_ids: Sequence[int]) -> int:
+        """
+        Remove relayed events from the outbox.
+        
+        Args:
+            event_ids (Sequence[int]): AdEvent.id of the published events
+            
+        Returns:
+            int: Number of events deleted
+        """
+        if not event_ids:
+            return 0
+        
+        session = self.db_manager.get_session()
+        try:
+            deleted = 0
+            for chunk in _chunks(list(event_ids), UPSERT_CHUNK_SIZE):
+                deleted += session.execute(delete(AdEvent).where(AdEvent.id.in_(chunk))).rowcount
+            session.commit()
+            return deleted
+        except Exception as e:
+            logger.error(f"Error deleting {len(event_ids)} events: {e}")
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+    
+    def clear_all_data(self) -> bool:
+        """
+        Clear all data from database tables.
+        WARNING: This will delete all data!
+        
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        session = self.db_manager.get_session()
+        try:
+            # Delete in order to avoid foreign key constraints
+            session.query(AdParameter).delete()
+            session.query(AdImage).delete()
+            session.query(AdPost).delete()
+            session.query(AdEvent).delete()
+            session.query(Ad).delete()
+            session.query(Account).delete()
+            session.commit()
+            logger.info("All data cleared from database")
+            return True
+        except Exception as e:
+            logger.error(f"Error clearing database: {e}")
+            session.rollback()
+            return False
+        finally:
+            session.close()
+
+
+
+class AsyncDataProcessor:
+    """
+    Coroutine counterpart of DataProcessor for a DatabaseManager created with async_=True.
+    
+    The write paths are the same as DataProcessor's: they run on the AsyncSession's
+    connection through AsyncSession.run_sync(), so the event loop keeps serving
+    network I/O while the database driver waits. Only the methods below are
+    available, DataProcessor's own methods open sync sessions.
+    """
+    
+    def __init__(self, database_manager: DatabaseManager):
+        """
+        Args:
+            database_manager (DatabaseManager): Database manager created with async_=True
+        """
+        self.db_manager = database_manager
+        # Provides the session-level write paths passed to run_sync()
+        self._processor = DataProcessor(database_manager)
+    
+    async def process_response(self, response_data: ResponseDict, bulk: bool = True) -> Dict[str, int]:
+        """
+        Process the Puller response and save all data to the database.
+        
+        Args:
+            response_data (ResponseDict): Response from Puller.get_response()
+            bulk (bool): Use the set-based upsert path when the dialect supports it
+            
+        Returns:
+            Dict[str, int]: Statistics about processed data
+        """
+        if not response_data or 'ads' not in response_data:
+            logger.warning("No ads data found in response")
+            return dict(EMPTY_STATS)
+        
+        if bulk:
+            return await self.process_ads(response_data['ads'])
+        async with self.db_manager.get_session() as session:
+            return await session.run_sync(self._processor._write_one_by_one, response_data['ads'])
+    
+    async def process_ads(self, ads_data: List[Dict[str, Any]], timings: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """
+        Save a batch of ads with a handful of set-based statements, see DataProcessor.process_ads().
+        
+        Args:
+            ads_data (List[Dict[str, Any]]): Ads as returned by the chotot API
+            timings (Optional[Dict[str, int]]): Receives milliseconds per stage, see DataProcessor.process_ads()
+            
+        Returns:
+            Dict[str, int]: Statistics about processed data
+        """
+        if not ads_data:
+            return dict(EMPTY_STATS)
+        
+        timings = {} if timings is None else timings
+        async with self.db_manager.get_session() as session:
+            if self.db_manager.engine.dialect.name in UPSERT_INSERTS:
+                try:
+                    logger.info(f"Processing {len(ads_data)} ads in bulk")
+                    stats = await session.run_sync(self._processor._write_batch, ads_data, timings)
+                    with _timed(timings, "commit"):
+                        await session.commit()
+                    _record_rows(stats)
+                    logger.info(f"Successfully processed data: {stats}, ms per stage: {timings}")
+                    return stats
+                except OperationalError as e:
+                    logger.error(f"Error processing batch, database unavailable: {e}")
+                    BATCH_FAILURES.inc()
+                    await session.rollback()
+                    raise
+                except Exception as e:
+                    logger.error(f"Error processing batch, retrying ad by ad: {e}")
+                    BATCH_FAILURES.inc()
+                    await session.rollback()
+            
+            return await session.run_sync(self._processor._write_one_by_one, ads_data)
+    
+    async def get_stats(self) -> Dict[str, int]:
+        """
+        Get current database statistics.
+        
+        Returns:
+            Dict[str, int]: Current counts of records in database
+        """
+        try:
+            async with self.db_manager.get_session() as session:
+                return await session.run_sync(self._processor._count_rows)
+        except Exception as e:
+            logger.error(f"Error getting database stats: {e}")
+            return {"accounts": 0, "ads": 0, "images": 0, "parameters": 0}
+    
+    async def get_watermark(self, query_key: str) -> Optional[Watermark]:
+        """
+        Get the newest (list_time, ad_id) ingested for a listing query.
+        
+        Args:
+            query_key (str): Query identifier, see Puller.query_key()
+            
+        Returns:
+            Optional[Watermark]: Stored watermark, None if the query was never crawled
+        """
+        try:
+            async with self.db_manager.get_session() as session:
+                return await session.run_sync(self._processor._read_watermark, query_key)
+        except Exception as e:
+            logger.error(f"Error getting crawl state for {query_key}: {e}")
+            return None
+    
+    async def save_watermark(self, query_key: str, watermark: Watermark) -> bool:
+        """
+        Advance the watermark of a listing query, never moving it backwards.
+        
+        Args:
+            query_key (str): Query identifier, see Puller.query_key()
+            watermark (Watermark): Newest (list_time, ad_id) ingested by the run
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        async with self.db_manager.get_session() as session:
+            try:
+                await session.run_sync(self._processor._write_watermark, query_key, watermark)
+                await session.commit()
+                return True
+            except Exception as e:
+                logger.error(f"Error saving crawl state for {query_key}: {e}")
+                await session.rollback()
+                return False
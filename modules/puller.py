@@ -1,20 +1,172 @@
-from typing import Optional, TypedDict
+from typing import AsyncIterator, Iterable, List, Optional, Set, Tuple, TypedDict
 
 import aiohttp.typedefs
+from modules.metrics import REGISTRY
 from modules.models import Ad, AdImage, AdParameter
+from modules.ratelimit import TokenBucket
+import codecs
+import itertools
 import json
+import math
+import random
 import aiohttp
 import asyncio
 import logging
+import time
 
 
 logger = logging.getLogger(__name__)
 
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+REQUEST_SECONDS = REGISTRY.histogram("puller_request_seconds", "Duration of listing requests including the body", ["status"])
+REQUESTS = REGISTRY.counter("puller_requests_total", "Listing requests by HTTP status", ["status"])
+RESPONSE_BYTES = REGISTRY.counter("puller_response_bytes_total", "Bytes of listing API response bodies after decompression")
+RETRIES = REGISTRY.counter("puller_retries_total", "Retried listing requests by reason", ["reason"])
+PAGES = REGISTRY.counter("puller_pages_total", "Listing pages by outcome", ["outcome"])
+
+# Params that select a page rather than the listing itself, excluded from Puller.query_key()
+PAGING_PARAMS = {"page", "limit", "fingerprint"}
+
+# (list_time, ad_id) of the newest ad ingested for a query
+Watermark = Tuple[int, int]
+
+# Bytes read from the socket at a time when a response body is streamed
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _accept_encoding() -> str:
+    """Advertise brotli only when aiohttp is able to decode it."""
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+            return "gzip, deflate, br"
+        except ImportError:
+            continue
+    return "gzip, deflate"
+
+
 class ResponseDict(TypedDict):
     total: int
     ads: list
 
 
+class AdStreamParser:
+    """
+    Incremental parser of a listing response body.
+
+    Text is fed in arbitrary chunks and every object of the top-level "ads" array is
+    returned as soon as it is complete, so a page never has to be held in memory as a
+    whole. Other top-level values (e.g. "total") are collected in `meta`.
+    """
+
+    def __init__(self):
+        self.meta: dict = {}
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._key: Optional[str] = None
+        self._closed = False
+
+    def feed(self, text: str) -> List[dict]:
+        """Add a chunk of the body, returns the ads completed by it."""
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        ads: List[dict] = []
+        while self._step(ads):
+            pass
+        return ads
+
+    def close(self) -> List[dict]:
+        """Signal the end of the body, returns the remaining ads."""
+        self._closed = True
+        ads = self.feed("")
+        if self._state != "done":
+            raise ValueError(f"truncated listing response (state {self._state})")
+        return ads
+
+    def _skip(self, separators: str = "") -> Optional[str]:
+        """Skip whitespace and separators, returns the next character or None if more data is needed."""
+        while self._pos < len(self._buffer):
+            char = self._buffer[self._pos]
+            if not char.isspace() and char not in separators:
+                return char
+            self._pos += 1
+        return None
+
+    def _decode(self):
+        """Decode the value at the current position, returns (value, ok)."""
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if self._closed:
+                raise
+            return None, False
+        # A number touching the end of the buffer may continue in the next chunk
+        if end >= len(self._buffer) and not self._closed:
+            return None, False
+        self._pos = end
+        return value, True
+
+    def _step(self, ads: List[dict]) -> bool:
+        if self._state == "done":
+            return False
+        if self._state == "start":
+            char = self._skip()
+            if char is None:
+                return False
+            if char != "{":
+                raise ValueError(f"listing response is not an object: {char!r}")
+            self._pos += 1
+            self._state = "key"
+            return True
+        if self._state == "key":
+            char = self._skip(",")
+            if char is None:
+                return False
+            if char == "}":
+                self._pos += 1
+                self._state = "done"
+                return True
+            key, ok = self._decode()
+            if not ok:
+                return False
+            self._key = key
+            self._state = "colon"
+            return True
+        if self._state == "colon":
+            char = self._skip(":")
+            if char is None:
+                return False
+            if self._key == "ads" and char == "[":
+                self._pos += 1
+                self._state = "ads"
+            else:
+                self._state = "value"
+            return True
+        if self._state == "value":
+            value, ok = self._decode()
+            if not ok:
+                return False
+            self.meta[self._key] = value
+            self._state = "key"
+            return True
+        # Inside the ads array
+        char = self._skip(",")
+        if char is None:
+            return False
+        if char == "]":
+            self._pos += 1
+            self._state = "key"
+            return True
+        ad, ok = self._decode()
+        if not ok:
+            return False
+        ads.append(ad)
+        return True
+
+
 class Puller:
     url = "https://gateway.chotot.com/v1/public/ad-listing"
     params = {
@@ -42,14 +194,36 @@ class Puller:
         "referer": "https://www.nhatot.com/"
     }
     
-    def __init__(self, url: Optional[str]=None, params: Optional[dict]=None, headers: Optional[dict]=None):
+    def __init__(
+        self,
+        url: Optional[str]=None,
+        params: Optional[dict]=None,
+        headers: Optional[dict]=None,
+        requests_per_second: Optional[float]=None,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        connection_limit: int = 32,
+        timeout: float = 30.0,
+    ):
         """
         Initialize the Puller instance with optional URL, parameters, and headers.
 
+        The Puller owns one long-lived aiohttp session with a pooled keep-alive
+        connector. Use it as an async context manager, or call open() before the
+        first request and close() when done; requests on a Puller that is not open
+        raise RuntimeError.
+
         Args:
             url (Optional[str]): The URL to be used for requests. If provided, sets the instance's url attribute.
             params (Optional[dict]): Query parameters to be included in requests. If provided, sets the instance's params attribute.
             headers (Optional[dict]): HTTP headers to be included in requests. If provided, sets the instance's headers attribute.
+            requests_per_second (Optional[float]): Token bucket rate shared by all requests. None disables rate limiting.
+            max_retries (int): Retries on 429/5xx and connection errors before giving up on a page.
+            backoff_base (float): Base delay in seconds of the exponential backoff.
+            backoff_max (float): Upper bound of a single backoff delay in seconds.
+            connection_limit (int): Maximum number of pooled connections.
+            timeout (float): Total timeout of a single request in seconds.
         """
         if url:
             self.url = url
@@ -57,9 +231,53 @@ class Puller:
             self.params = params
         if headers:
             self.headers = headers
+        self.headers = {**self.headers, "accept-encoding": _accept_encoding()}
+        self.rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.connection_limit = connection_limit
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Pages given up on, a crawl with failed pages must not advance its watermark
+        self.failed_pages = 0
             
     def __str__(self):
         return f"Puller class\nurl: {self.url}\nparams: {self.params}\n headers: {self.headers}"
+
+    async def __aenter__(self) -> "Puller":
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def open(self) -> aiohttp.ClientSession:
+        """Create the shared HTTP session if it is not open yet."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                ttl_dns_cache=300,
+                keepalive_timeout=60,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                auto_decompress=True,
+            )
+        return self._session
+
+    def _require_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("Puller is not open, use `async with Puller() as puller` or await open() first")
+        return self._session
+
+    async def close(self) -> None:
+        """Close the shared HTTP session and its connection pool."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
         
     async def response_to_file(self, output_file: Optional[str]):
         response = await self.get_response()
@@ -67,12 +285,249 @@ class Puller:
             with open(output_file, "w", encoding="utf-8") as f:
                 f.write(response)
                 
-    async def get_response(self) -> Optional[ResponseDict]:
+    async def get_response(self, page: Optional[int] = None) -> Optional[ResponseDict]:
+        """
+        Fetch a single listing page.
+
+        Args:
+            page (Optional[int]): Page number to fetch. Defaults to the page in self.params.
+
+        Returns:
+            Optional[ResponseDict]: Parsed response, or None on error.
+
+        Raises:
+            RuntimeError: The Puller is not open.
+        """
+        return await self._fetch_page(self._require_session(), page)
+
+    async def fetch_pages(self, pages: Iterable[int], concurrency: int = 8) -> AsyncIterator[ResponseDict]:
+        """
+        Fetch many listing pages concurrently and yield each response as soon as it arrives.
+
+        At most `concurrency` requests are in flight at any time. Responses are yielded
+        in completion order, not page order; failed pages are logged and skipped.
+
+        Args:
+            pages (Iterable[int]): Page numbers to fetch.
+            concurrency (int): Maximum number of requests in flight.
+
+        Yields:
+            ResponseDict: Parsed response of each successfully fetched page.
+        """
+        async for response in self._fetch_window(pages, concurrency):
+            yield response
+
+    async def stream_ads(self, sink: asyncio.Queue, max_pages: Optional[int] = None, concurrency: int = 8) -> int:
+        """
+        Crawl the listing and put every ad into `sink` as soon as it is parsed from the body.
+
+        Bodies are parsed incrementally with AdStreamParser, so with a bounded queue the
+        fetchers slow down to the pace of the consumer and memory stays flat.
+
+        Args:
+            sink (asyncio.Queue): Queue receiving ad dicts.
+            max_pages (Optional[int]): Upper bound on the number of pages to fetch.
+            concurrency (int): Maximum number of requests in flight.
+
+        Returns:
+            int: Number of pages fetched successfully.
+        """
+        first = await self._fetch_page(self._require_session(), 1, sink)
+        if not first:
+            return 0
+
+        last_page = self.page_count(first)
+        if max_pages is not None:
+            last_page = min(last_page, max_pages)
+        fetched = 1
+        async for _ in self._fetch_window(range(2, last_page + 1), concurrency, sink):
+            fetched += 1
+        return fetched
+
+    async def _fetch_window(self, pages: Iterable[int], concurrency: int, sink: Optional[asyncio.Queue] = None) -> AsyncIterator[ResponseDict]:
+        """Fetch pages keeping at most `concurrency` requests in flight, yields in completion order."""
+        page_iter = iter(pages)
+        session = self._require_session()
+        pending = {
+            asyncio.create_task(self._fetch_page(session, page, sink))
+            for page in itertools.islice(page_iter, max(concurrency, 1))
+        }
+        done: Set[asyncio.Task] = set()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.url, headers=self.headers, params=self.params) as response:
-                    return await response.json()
-        except Exception as e:
-            logger.error(f"puller error: {e}")
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    next_page = next(page_iter, None)
+                    if next_page is not None:
+                        pending.add(asyncio.create_task(self._fetch_page(session, next_page, sink)))
+                    result = task.result()
+                    if result:
+                        yield result
+        finally:
+            for task in pending:
+                task.cancel()
+            # Let cancelled requests release their responses; retrieves errors of pages not consumed
+            await asyncio.gather(*pending, *done, return_exceptions=True)
+
+    async def iter_pages(self, start: int = 1, max_pages: Optional[int] = None, concurrency: int = 8) -> AsyncIterator[ResponseDict]:
+        """
+        Crawl the listing from `start` page up to the last page reported by the API.
+
+        The first page is fetched alone to learn `total`, the remaining pages are
+        fetched through fetch_pages().
+
+        Args:
+            start (int): First page to fetch.
+            max_pages (Optional[int]): Upper bound on the number of pages to fetch.
+            concurrency (int): Maximum number of requests in flight.
+
+        Yields:
+            ResponseDict: Parsed response of each fetched page.
+        """
+        first = await self.get_response(start)
+        if not first:
+            return
+        yield first
+
+        last_page = start + self.page_count(first) - 1
+        if max_pages is not None:
+            last_page = min(last_page, start + max_pages - 1)
+        async for response in self.fetch_pages(range(start + 1, last_page + 1), concurrency):
+            yield response
+
+    async def iter_new_pages(self, watermark: Optional[Watermark], max_pages: Optional[int] = None, concurrency: int = 8) -> AsyncIterator[ResponseDict]:
+        """
+        Crawl the listing newest first until it reaches ads that were already ingested.
+
+        Pages are fetched one after another and pagination stops after the first page
+        that contains only ads at or below the watermark. Without a watermark this is
+        a full crawl through iter_pages().
+
+        Args:
+            watermark (Optional[Watermark]): Newest (list_time, ad_id) ingested so far.
+            max_pages (Optional[int]): Upper bound on the number of pages to fetch.
+            concurrency (int): Maximum number of requests in flight for a full crawl.
+
+        Yields:
+            ResponseDict: Parsed response of each fetched page.
+        """
+        if watermark is None:
+            async for response in self.iter_pages(max_pages=max_pages, concurrency=concurrency):
+                yield response
+            return
+
+        page = 1
+        while max_pages is None or page <= max_pages:
+            response = await self.get_response(page)
+            if not response or not response.get("ads"):
+                return
+            yield response
+            if not any(self.ad_key(ad) > watermark for ad in response["ads"]):
+                return
+            if page >= self.page_count(response):
+                return
+            page += 1
+
+    def query_key(self) -> str:
+        """Stable identifier of the listing query (category, region, ...) regardless of paging."""
+        return "&".join(f"{key}={value}" for key, value in sorted(self.params.items()) if key not in PAGING_PARAMS)
+
+    @staticmethod
+    def ad_key(ad: dict) -> Watermark:
+        """Position of an ad in the listing order, comparable to a watermark."""
+        return (ad.get("list_time") or 0, ad.get("ad_id") or 0)
+
+    @classmethod
+    def newest(cls, ads: List[dict], watermark: Optional[Watermark] = None) -> Optional[Watermark]:
+        """Highest ad_key() among `ads` and `watermark`."""
+        keys = [cls.ad_key(ad) for ad in ads]
+        if watermark is not None:
+            keys.append(watermark)
+        return max(keys) if keys else None
+
+    def page_count(self, response: ResponseDict) -> int:
+        """Number of pages the listing has for the current `limit`."""
+        limit = int(self.params.get("limit", 20))
+        return max(math.ceil(response.get("total", 0) / limit), 1)
+
+    async def _fetch_page(self, session: aiohttp.ClientSession, page: Optional[int], sink: Optional[asyncio.Queue] = None) -> Optional[ResponseDict]:
+        """
+        Fetch one page with retries. With a sink the body is streamed: ads are put into
+        the queue while parsing and the returned response carries an empty "ads" list.
+        """
+        params = dict(self.params)
+        if page is not None:
+            params["page"] = str(page)
+
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+            retry_after: Optional[float] = None
+            started = time.perf_counter()
+            status = "error"
+            try:
+                async with session.get(self.url, params=params) as response:
+                    status = str(response.status)
+                    try:
+                        if response.status in RETRY_STATUSES:
+                            retry_after = self._retry_after(response)
+                            logger.warning(f"puller got {response.status} on page {params.get('page')}, attempt {attempt + 1}")
+                        elif response.status >= 400:
+                            logger.error(f"puller error on page {params.get('page')}: HTTP {response.status}")
+                            PAGES.inc(outcome="failed")
+                            self.failed_pages += 1
+                            return None
+                        elif sink is None:
+                            result = await response.json()
+                            PAGES.inc(outcome="ok")
+                            return result
+                        else:
+                            result = await self._stream_body(response, sink)
+                            PAGES.inc(outcome="ok")
+                            return result
+                    finally:
+                        RESPONSE_BYTES.inc(response.content.total_bytes)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"puller error on page {params.get('page')}, attempt {attempt + 1}: {e}")
+            except Exception as e:
+                logger.error(f"puller error on page {params.get('page')}: {e}")
+                PAGES.inc(outcome="failed")
+                self.failed_pages += 1
+                return None
+            finally:
+                REQUESTS.inc(status=status)
+                REQUEST_SECONDS.observe(time.perf_counter() - started, status=status)
+
+            if attempt < self.max_retries:
+                RETRIES.inc(reason=status)
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+
+        logger.error(f"puller gave up on page {params.get('page')} after {self.max_retries + 1} attempts")
+        PAGES.inc(outcome="gave_up")
+        self.failed_pages += 1
         return None
 
+    async def _stream_body(self, response: aiohttp.ClientResponse, sink: asyncio.Queue) -> ResponseDict:
+        parser = AdStreamParser()
+        decoder = codecs.getincrementaldecoder(response.charset or "utf-8")()
+        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            for ad in parser.feed(decoder.decode(chunk)):
+                await sink.put(ad)
+        for ad in parser.feed(decoder.decode(b"", final=True)) + parser.close():
+            await sink.put(ad)
+        return {**parser.meta, "total": parser.meta.get("total", 0), "ads": []}
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    @staticmethod
+    def _retry_after(response: aiohttp.ClientResponse) -> Optional[float]:
+        value = response.headers.get("Retry-After")
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
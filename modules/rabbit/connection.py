@@ -0,0 +1,60 @@
+from dotenv import load_dotenv
+from os import getenv
+from urllib.parse import quote
+import aio_pika
+from aio_pika.abc import AbstractChannel, AbstractQueue, AbstractRobustConnection
+from aio_pika.exceptions import ChannelPreconditionFailed
+import logging
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RABBIT_HOST = getenv("RABBIT_HOST", "localhost")
+RABBIT_PORT = int(getenv("RABBIT_PORT", "5672"))
+
+# Work queues of the distributed crawl
+FETCH_QUEUE = "reeltor.fetch"  # page-fetch tasks published by the coordinator
+ADS_QUEUE = "reeltor.ads"  # raw listing pages published by fetch workers
+
+# Topic exchange of ad change events, routing key "ad.<kind>" (ad.new, ad.price_changed, ...)
+EVENTS_EXCHANGE = "reeltor.events"
+
+
+def rabbit_url() -> str:
+    user = quote(getenv("RABBITMQ_DEFAULT_USER", "guest"), safe="")
+    password = quote(getenv("RABBITMQ_DEFAULT_PASS", "guest"), safe="")
+    return f"amqp://{user}:{password}@{RABBIT_HOST}:{RABBIT_PORT}/"
+
+
+async def connect() -> AbstractRobustConnection:
+    """Connection that reconnects and restores its channels and consumers on its own."""
+    return await aio_pika.connect_robust(rabbit_url())
+
+
+def dead_letter_queue(name: str) -> str:
+    return f"{name}.dlq"
+
+
+async def declare_queue(channel: AbstractChannel, name: str) -> AbstractQueue:
+    """
+    Declare a durable work queue and its dead-letter queue, idempotent for every worker.
+
+    Messages rejected without requeue are routed to `<name>.dlq` through the default exchange.
+    Queue arguments cannot change once a queue exists: a queue declared without them, by
+    a version before dead-lettering, fails with PRECONDITION_FAILED (406) and closes the
+    channel. It has to be drained and deleted once, see PROCESSOR_README.md.
+    """
+    await channel.declare_queue(dead_letter_queue(name), durable=True)
+    try:
+        return await channel.declare_queue(name, durable=True, arguments={
+            "x-dead-letter-exchange": "",
+            "x-dead-letter-routing-key": dead_letter_queue(name),
+        })
+    except ChannelPreconditionFailed:
+        logger.error(
+            f"Queue {name} exists without dead-lettering, stop its workers, drain it and "
+            f"delete it once: rabbitmqctl delete_queue {name}"
+        )
+        raise
@@ -0,0 +1,170 @@
+from typing import Any, Callable, List, Optional, Tuple, Type
+from aio_pika.abc import AbstractChannel, AbstractIncomingMessage
+from modules.metrics import REGISTRY
+from modules.rabbit.connection import declare_queue
+import asyncio
+import contextlib
+import inspect
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+BatchHandler = Callable[[List[Any]], Any]
+
+# Failures of the handler's dependencies rather than of the messages
+TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (ConnectionError, OSError, asyncio.TimeoutError)
+
+CONSUMED = REGISTRY.counter("rabbit_consumed_total", "Consumed messages by outcome", ["queue", "outcome"])
+BATCH_SIZE = REGISTRY.histogram("rabbit_batch_messages", "Messages per consumed batch", ["queue"], buckets=(1, 10, 50, 100, 250, 500, 1000, 2500))
+
+
+class BatchConsumer:
+    """
+    Consumes a work queue in micro-batches.
+
+    Up to `prefetch` unacked messages are delivered to the consumer (basic_qos).
+    They are collected until `batch_size` messages arrived or `flush_interval`
+    seconds passed, then the decoded bodies are handed to `handler` in one call
+    and the whole batch is acked with a single `multiple=True` ack after the
+    handler returned, i.e. after its commit. When the handler raises, the batch is
+    retried message by message and messages that still fail, or cannot be decoded,
+    are rejected into the queue's dead-letter queue.
+
+    A `transient_errors` exception (database or connection down) is not the fault
+    of the messages: they are requeued after a backoff that grows with every
+    consecutive transient failure, and nothing is dead-lettered.
+    """
+
+    def __init__(
+        self,
+        channel: AbstractChannel,
+        queue_name: str,
+        handler: BatchHandler,
+        prefetch: int = 1000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        transient_errors: Tuple[Type[BaseException], ...] = TRANSIENT_ERRORS,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 60.0,
+    ):
+        """
+        Args:
+            channel (AbstractChannel): Channel to consume on, used by this consumer only.
+            queue_name (str): Durable work queue, declared with its dead-letter queue.
+            handler (BatchHandler): Writes a list of decoded bodies, sync or async; raises on failure.
+            prefetch (int): Maximum unacked messages, should be at least `batch_size`.
+            batch_size (int): Messages per handler call.
+            flush_interval (float): Maximum seconds a message waits for its batch.
+            transient_errors (Tuple[Type[BaseException], ...]): Handler exceptions that requeue instead of dead-lettering.
+            retry_delay (float): Backoff in seconds after the first transient failure, doubled on every further one.
+            max_retry_delay (float): Upper bound of the backoff in seconds.
+        """
+        self.channel = channel
+        self.queue_name = queue_name
+        self.handler = handler
+        self.prefetch = prefetch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.transient_errors = transient_errors
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self._transient_failures = 0
+        self._buffer: List[AbstractIncomingMessage] = []
+        self._lock = asyncio.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    async def run(self) -> None:
+        """Consume until cancelled, flushing the last partial batch on the way out."""
+        await self.channel.set_qos(prefetch_count=self.prefetch)
+        queue = await declare_queue(self.channel, self.queue_name)
+        self._flusher = asyncio.create_task(self._flush_periodically())
+        await queue.consume(self._on_message)
+        try:
+            await asyncio.Future()
+        finally:
+            self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Hand the buffered messages to the handler and settle them."""
+        async with self._lock:
+            batch, self._buffer = self._buffer, []
+            if not batch:
+                return
+            BATCH_SIZE.observe(len(batch), queue=self.queue_name)
+
+            decoded: List[Tuple[AbstractIncomingMessage, Any]] = []
+            for message in batch:
+                try:
+                    decoded.append((message, json.loads(message.body)))
+                except ValueError as e:
+                    logger.error(f"Dead-lettering undecodable message from {self.queue_name}: {e}")
+                    await self._dead_letter(message)
+            if not decoded:
+                return
+
+            try:
+                await self._handle([body for _, body in decoded])
+            except self.transient_errors as e:
+                await self._requeue(decoded, e)
+                return
+            except Exception as e:
+                logger.error(f"Batch of {len(decoded)} messages from {self.queue_name} failed, retrying one by one: {e}")
+                await self._handle_one_by_one(decoded)
+                return
+            self._transient_failures = 0
+            # Every earlier delivery of this channel is in this batch or already settled
+            await decoded[-1][0].ack(multiple=True)
+            CONSUMED.inc(len(decoded), queue=self.queue_name, outcome="acked")
+
+    async def _on_message(self, message: AbstractIncomingMessage) -> None:
+        self._buffer.append(message)
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                # Settling fails while the connection is down, the broker redelivers
+                # those messages once the channel is restored
+                logger.error(f"Error flushing {self.queue_name}: {e}")
+
+    async def _handle(self, bodies: List[Any]) -> None:
+        result = self.handler(bodies)
+        if inspect.isawaitable(result):
+            await result
+
+    async def _handle_one_by_one(self, decoded: List[Tuple[AbstractIncomingMessage, Any]]) -> None:
+        for index, (message, body) in enumerate(decoded):
+            try:
+                await self._handle([body])
+            except self.transient_errors as e:
+                await self._requeue(decoded[index:], e)
+                return
+            except Exception as e:
+                logger.error(f"Dead-lettering message from {self.queue_name}: {e}")
+                await self._dead_letter(message)
+                continue
+            self._transient_failures = 0
+            await message.ack()
+            CONSUMED.inc(queue=self.queue_name, outcome="acked")
+
+    async def _requeue(self, decoded: List[Tuple[AbstractIncomingMessage, Any]], error: BaseException) -> None:
+        """Back off, then return the messages to the queue for another attempt."""
+        delay = min(self.retry_delay * 2 ** self._transient_failures, self.max_retry_delay)
+        self._transient_failures += 1
+        logger.warning(f"Requeueing {len(decoded)} messages from {self.queue_name} in {delay:.1f}s: {error}")
+        await asyncio.sleep(delay)
+        for message, _ in decoded:
+            await message.nack(requeue=True)
+        CONSUMED.inc(len(decoded), queue=self.queue_name, outcome="requeued")
+
+    async def _dead_letter(self, message: AbstractIncomingMessage) -> None:
+        await message.reject(requeue=False)
+        CONSUMED.inc(queue=self.queue_name, outcome="dead_lettered")
@@ -0,0 +1,199 @@
+from typing import Any, Dict, List, Optional
+from aio_pika.abc import AbstractChannel, AbstractIncomingMessage
+from sqlalchemy.exc import OperationalError
+from modules.processor import DataProcessor
+from modules.puller import Puller
+from modules.rabbit.connection import ADS_QUEUE, FETCH_QUEUE, declare_queue
+from modules.rabbit.consumer import TRANSIENT_ERRORS, BatchConsumer
+from modules.rabbit.producer import Producer
+from modules.ratelimit import TokenBucket
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Coordinator:
+    """
+    Splits listing queries into page-fetch tasks.
+
+    The first page of every query is fetched here to learn the number of pages; its
+    ads go straight to the ads queue and one task per remaining page goes to the
+    fetch queue, where any number of FetchWorkers pick them up.
+    """
+
+    def __init__(self, producer: Producer, max_pages: Optional[int] = None):
+        """
+        Args:
+            producer (Producer): Open producer on the default exchange.
+            max_pages (Optional[int]): Upper bound on the number of pages per query.
+        """
+        self.producer = producer
+        self.max_pages = max_pages
+
+    async def plan(self, params: Dict[str, str]) -> int:
+        """
+        Publish the tasks of one listing query.
+
+        Args:
+            params (Dict[str, str]): Puller query parameters (category, region, ...).
+
+        Returns:
+            int: Number of pages of the query, 0 if the first page failed
+        """
+        await declare_queue(self.producer.channel, FETCH_QUEUE)
+        await declare_queue(self.producer.channel, ADS_QUEUE)
+
+        async with Puller(params=params) as puller:
+            first = await puller.get_response(1)
+            if first is None:
+                logger.error(f"Could not fetch the first page of {puller.query_key()}")
+                return 0
+            pages = puller.page_count(first)
+            query_key = puller.query_key()
+
+        if self.max_pages:
+            pages = min(pages, self.max_pages)
+        confirms = [self.producer.publish({"query_key": query_key, "page": 1, "response": first}, ADS_QUEUE)]
+        for page in range(2, pages + 1):
+            confirms.append(self.producer.publish({"params": params, "page": page}, FETCH_QUEUE))
+        await asyncio.gather(*confirms)
+        logger.info(f"Planned {pages} pages of {query_key}")
+        return pages
+
+
+class FetchWorker:
+    """
+    Fetches listing pages for tasks from the fetch queue and publishes them to the ads queue.
+
+    Up to `concurrency` tasks are in flight per worker (the channel prefetch), and
+    all requests of the worker share one token bucket. A task is acked only after
+    the broker confirmed its page, so a crashed worker's tasks are redelivered.
+    A page that cannot be fetched is put back at the end of the queue up to
+    `max_attempts` times before its task is dead-lettered, malformed tasks are
+    dead-lettered at once and tasks whose page cannot be published are requeued.
+    """
+
+    def __init__(
+        self,
+        channel: AbstractChannel,
+        producer: Producer,
+        concurrency: int = 8,
+        requests_per_second: Optional[float] = None,
+        max_attempts: int = 5,
+    ):
+        """
+        Args:
+            channel (AbstractChannel): Channel to consume on.
+            producer (Producer): Open producer on the default exchange.
+            concurrency (int): Maximum number of pages fetched at a time.
+            requests_per_second (Optional[float]): Request rate of this worker, unlimited by default.
+            max_attempts (int): Fetches of a page, each with the Puller's own retries, before its task is dead-lettered.
+        """
+        self.channel = channel
+        self.producer = producer
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.rate_limiter = TokenBucket(requests_per_second) if requests_per_second else None
+        self._pullers: Dict[str, Puller] = {}
+
+    async def run(self) -> None:
+        """Consume tasks until cancelled."""
+        await self.channel.set_qos(prefetch_count=self.concurrency)
+        await declare_queue(self.channel, ADS_QUEUE)
+        queue = await declare_queue(self.channel, FETCH_QUEUE)
+        await queue.consume(self._on_message)
+        try:
+            await asyncio.Future()
+        finally:
+            for puller in self._pullers.values():
+                await puller.close()
+
+    async def _puller(self, params: Dict[str, str]) -> Puller:
+        """One open Puller, and so one connection pool, per listing query."""
+        puller = Puller(params=params)
+        query_key = puller.query_key()
+        if query_key not in self._pullers:
+            puller.rate_limiter = self.rate_limiter
+            self._pullers[query_key] = puller
+        # Reopens a session closed by a failed request as well
+        await self._pullers[query_key].open()
+        return self._pullers[query_key]
+
+    async def _on_message(self, message: AbstractIncomingMessage) -> None:
+        try:
+            task = json.loads(message.body)
+            puller = await self._puller(task["params"])
+            page = task["page"]
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Dead-lettering malformed fetch task: {e}")
+            await message.reject(requeue=False)
+            return
+
+        try:
+            response = await puller.get_response(page)
+            if response is None:
+                await self._retry(message, task, puller.query_key())
+                return
+            await self.producer.publish({"query_key": puller.query_key(), "page": page, "response": response}, ADS_QUEUE)
+        except Exception as e:
+            logger.error(f"Requeueing task {puller.query_key()} page {page}: {e}")
+            await message.nack(requeue=True)
+            return
+        await message.ack()
+
+    async def _retry(self, message: AbstractIncomingMessage, task: Dict[str, Any], query_key: str) -> None:
+        """Republish a task whose page could not be fetched, or dead-letter it after `max_attempts`."""
+        attempts = task.get("attempts", 1)
+        if attempts >= self.max_attempts:
+            logger.error(f"Dead-lettering task {query_key} page {task['page']} after {attempts} attempts")
+            await message.reject(requeue=False)
+            return
+        logger.warning(f"Retrying task {query_key} page {task['page']} later, attempt {attempts} failed")
+        # At the end of the queue, so a flaky page does not hold up the others
+        await self.producer.publish({**task, "attempts": attempts + 1}, FETCH_QUEUE)
+        await message.ack()
+
+
+class IngestWorker:
+    """
+    Writes listing pages from the ads queue with DataProcessor.
+
+    Pages are consumed in micro-batches by a BatchConsumer and the ads of a batch
+    are written with one process_ads() call, so a worker commits once per
+    `batch_pages` pages instead of once per page. Pages are requeued while the
+    database is unavailable and dead-lettered when one of their ads fails to save.
+    """
+
+    def __init__(self, channel: AbstractChannel, processor: DataProcessor, prefetch: int = 100, batch_pages: int = 25, flush_interval: float = 1.0):
+        """
+        Args:
+            channel (AbstractChannel): Channel to consume on.
+            processor (DataProcessor): Destination of the ads.
+            prefetch (int): Pages delivered to this worker ahead of the write.
+            batch_pages (int): Pages written per transaction.
+            flush_interval (float): Maximum seconds a page waits for its batch.
+        """
+        self.processor = processor
+        self.consumer = BatchConsumer(
+            channel,
+            ADS_QUEUE,
+            self._write,
+            prefetch=prefetch,
+            batch_size=batch_pages,
+            flush_interval=flush_interval,
+            transient_errors=TRANSIENT_ERRORS + (OperationalError,),
+        )
+
+    async def run(self) -> None:
+        """Consume pages until cancelled."""
+        await self.consumer.run()
+
+    async def _write(self, pages: List[Dict[str, Any]]) -> None:
+        ads = [ad for page in pages for ad in page["response"].get("ads", [])]
+        stats = await asyncio.to_thread(self.processor.process_ads, ads)
+        if stats.get("errors"):
+            # The consumer retries page by page and dead-letters the pages that still fail
+            raise ValueError(f"{stats['errors']} of {len(ads)} ads failed to save")
+        logger.info(f"Ingested {len(pages)} pages, {len(ads)} ads: {stats}")
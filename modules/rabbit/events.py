@@ -0,0 +1,58 @@
+from dataclasses import asdict
+from modules.processor import DataProcessor
+from modules.rabbit.producer import Producer
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class EventRelay:
+    """
+    Publishes change events from the ad_event outbox to the events exchange.
+
+    DataProcessor writes the events in the transaction of the ingest batch that
+    detected them. The relay publishes them in batches with routing key
+    "ad.<kind>" and deletes them once the broker confirmed the whole batch, so an
+    event is published at least once; consumers deduplicate by the event id.
+    Run a single relay to keep the events in order.
+    """
+
+    def __init__(self, processor: DataProcessor, producer: Producer, batch_size: int = 500, interval: float = 1.0):
+        """
+        Args:
+            processor (DataProcessor): Owner of the outbox.
+            producer (Producer): Open producer on the events exchange.
+            batch_size (int): Events published per round.
+            interval (float): Seconds to wait when the outbox is drained.
+        """
+        self.processor = processor
+        self.producer = producer
+        self.batch_size = batch_size
+        self.interval = interval
+
+    async def run(self) -> None:
+        """Relay events until cancelled."""
+        while True:
+            try:
+                relayed = await self.relay_once()
+            except Exception as e:
+                logger.error(f"Error relaying events: {e}")
+                relayed = 0
+            if relayed < self.batch_size:
+                await asyncio.sleep(self.interval)
+
+    async def relay_once(self) -> int:
+        """
+        Publish one batch of pending events.
+
+        Returns:
+            int: Number of events published and removed from the outbox
+        """
+        events = await asyncio.to_thread(self.processor.get_pending_events, self.batch_size)
+        if not events:
+            return 0
+        await asyncio.gather(*(self.producer.publish(asdict(event), f"ad.{event.kind}") for event in events))
+        deleted = await asyncio.to_thread(self.processor.delete_events, [event.id for event in events])
+        logger.info(f"Relayed {len(events)} events")
+        return deleted
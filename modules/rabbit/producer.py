@@ -1,28 +1,201 @@
-import pika
-import json
-import random
-import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from aio_pika import DeliveryMode, ExchangeType, Message
+from aio_pika.abc import AbstractChannel, AbstractExchange, AbstractRobustConnection
 from dotenv import load_dotenv
 from os import getenv
+from modules.metrics import REGISTRY
+from modules.rabbit.connection import connect
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import time
 
 
 load_dotenv()
 
-exchange_name = getenv("RABBIT_MAIN_EXCHANGE_NAME", '')
-connection = pika.BlockingConnection(pika.ConnectionParameters(
-    host="localhost",
-    credentials=pika.PlainCredentials(username=getenv("RABBITMQ_DEFAULT_USER", ""), password=getenv("RABBITMQ_DEFAULT_PASS", ""))
-))
-channel = connection.channel()
-channel.exchange_declare(exchange=exchange_name, exchange_type='direct')
-
-devices = [random.randint(0, 100) for _ in range(100)]
-routing_keys = [getenv("RABBIT_MAIN_EXCHANGE_KEY", '')]
-
-while True:
-    measure = random.choice(routing_keys)
-    data = {'device': random.choice(devices), 'measure': measure, 'value': random.randint(0,100)}
-    message = json.dumps(data)
-    channel.basic_publish(exchange=exchange_name, routing_key=measure, body=message)
-    print(f'Sent: {message}')
-    time.sleep(3)
+logger = logging.getLogger(__name__)
+
+EXCHANGE_NAME = getenv("RABBIT_MAIN_EXCHANGE_NAME", '')
+ROUTING_KEY = getenv("RABBIT_MAIN_EXCHANGE_KEY", '')
+
+PUBLISHED = REGISTRY.counter("rabbit_published_total", "Messages published by outcome", ["outcome"])
+FLUSH_SECONDS = REGISTRY.histogram("rabbit_flush_seconds", "Time to publish and confirm one batch")
+
+
+def _retrieve(future: asyncio.Future) -> None:
+    # Failures are logged by flush(), callers are free to ignore the future
+    if not future.cancelled():
+        future.exception()
+
+
+class Producer:
+    """
+    Batched, confirmed publisher over one long-lived connection and channel.
+
+    publish() only buffers the message and returns a future. The buffer is sent
+    when it reaches `flush_size` messages or every `flush_interval` seconds: the
+    whole batch is published at once on a channel with publisher confirms and each
+    future resolves when the broker confirms its message, or fails on a nack. Await
+    the future before acking an input message to get at-least-once delivery.
+    Messages are persistent and the exchange is durable.
+    """
+
+    def __init__(
+        self,
+        exchange_name: str = EXCHANGE_NAME,
+        exchange_type: ExchangeType = ExchangeType.DIRECT,
+        routing_key: str = ROUTING_KEY,
+        flush_size: int = 500,
+        flush_interval: float = 0.2,
+    ):
+        """
+        Args:
+            exchange_name (str): Exchange to publish to, '' for the default exchange (routing key = queue).
+            exchange_type (ExchangeType): Type of the exchange, used when declaring it.
+            routing_key (str): Routing key of messages published without one.
+            flush_size (int): Buffered messages that trigger a flush.
+            flush_interval (float): Maximum seconds a message waits in the buffer.
+        """
+        self.exchange_name = exchange_name
+        self.exchange_type = exchange_type
+        self.routing_key = routing_key
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.connection: Optional[AbstractRobustConnection] = None
+        self.channel: Optional[AbstractChannel] = None
+        self._exchange: Optional[AbstractExchange] = None
+        self._buffer: List[Tuple[Message, str, asyncio.Future]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> "Producer":
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        """Connect, declare the exchange and start the periodic flush."""
+        if self.connection is not None:
+            return
+        self.connection = await connect()
+        self.channel = await self.connection.channel(publisher_confirms=True)
+        if self.exchange_name:
+            self._exchange = await self.channel.declare_exchange(self.exchange_name, self.exchange_type, durable=True)
+        else:
+            self._exchange = self.channel.default_exchange
+        self._flusher = asyncio.create_task(self._flush_periodically())
+
+    async def close(self) -> None:
+        """Flush what is buffered, wait for outstanding confirms and disconnect."""
+        if self._flusher:
+            self._flusher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flusher
+            self._flusher = None
+        if self._exchange is not None:
+            await self.flush()
+            await asyncio.gather(*self._flushes)
+        # Messages buffered while closing can no longer be sent, their callers must not wait forever
+        batch, self._buffer = self._buffer, []
+        for _, _, future in batch:
+            if not future.done():
+                future.set_exception(RuntimeError("Producer closed before the message was published"))
+        if self.connection is not None:
+            await self.connection.close()
+        self.connection = self.channel = self._exchange = None
+
+    def _require_exchange(self) -> AbstractExchange:
+        if self._exchange is None:
+            raise RuntimeError("Producer is not open, use `async with Producer() as producer` or await open() first")
+        return self._exchange
+
+    def publish(self, payload: Dict[str, Any], routing_key: Optional[str] = None) -> asyncio.Future:
+        """
+        Buffer a JSON message.
+
+        Args:
+            payload (Dict[str, Any]): Message body.
+            routing_key (Optional[str]): Routing key, defaults to the producer's.
+
+        Returns:
+            asyncio.Future: Resolves when the broker confirms the message
+        """
+        self._require_exchange()
+        message = Message(
+            json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"),
+            content_type="application/json",
+            delivery_mode=DeliveryMode.PERSISTENT,
+        )
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_retrieve)
+        self._buffer.append((message, routing_key if routing_key is not None else self.routing_key, future))
+        if len(self._buffer) >= self.flush_size:
+            task = asyncio.create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        return future
+
+    async def flush(self) -> int:
+        """
+        Publish the buffer as one batch and wait for its confirms.
+
+        Returns:
+            int: Number of confirmed messages
+        """
+        exchange = self._require_exchange()
+        batch, self._buffer = self._buffer, []
+        if not batch:
+            return 0
+
+        started = time.perf_counter()
+        # All messages are in flight at once, confirms arrive pipelined
+        results = await asyncio.gather(
+            *(exchange.publish(message, routing_key=routing_key) for message, routing_key, _ in batch),
+            return_exceptions=True,
+        )
+        FLUSH_SECONDS.observe(time.perf_counter() - started)
+
+        confirmed = 0
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(None)
+                confirmed += 1
+        PUBLISHED.inc(confirmed, outcome="confirmed")
+        if confirmed < len(batch):
+            PUBLISHED.inc(len(batch) - confirmed, outcome="failed")
+            logger.error(f"{len(batch) - confirmed} of {len(batch)} messages were not confirmed")
+        return confirmed
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._buffer:
+                task = asyncio.create_task(self.flush())
+                self._flushes.add(task)
+                task.add_done_callback(self._flushes.discard)
+
+
+async def main(count: int, flush_size: int):
+    """Publish `count` sample ad events and report the confirmed rate."""
+    started = time.perf_counter()
+    async with Producer(flush_size=flush_size) as producer:
+        futures = [producer.publish({"event": "sample", "ad_id": i}) for i in range(count)]
+        await asyncio.gather(*futures, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    print(f"Sent {count} messages to '{EXCHANGE_NAME}' in {elapsed:.2f}s ({count / elapsed:.0f}/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish sample events to the main exchange")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--flush-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.count, args.flush_size))
@@ -0,0 +1,50 @@
+from typing import Optional
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Asynchronous token bucket rate limiter.
+
+    Tokens are refilled continuously at `rate` per second up to `capacity`.
+    acquire() waits until enough tokens are available, so callers sharing one
+    bucket never exceed the configured rate on average, while short bursts up
+    to `capacity` go through immediately.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate (float): Tokens added per second.
+            capacity (Optional[float]): Maximum burst size. Defaults to max(rate, 1).
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Wait until `tokens` tokens are available and take them."""
+        if tokens > self.capacity:
+            # The bucket never holds more than its capacity, this would wait forever
+            raise ValueError(f"cannot acquire {tokens} tokens from a bucket of capacity {self.capacity}")
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+
+    def pause(self, seconds: float) -> None:
+        """Drain the bucket so that the next token becomes available after `seconds`."""
+        self._refill()
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
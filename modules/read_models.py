@@ -0,0 +1,63 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Column-projected views of ads for the bot and translation paths. Unlike ORM
+# objects they carry no session state and only the columns their consumer reads.
+
+
+@dataclass(slots=True)
+class ImageView:
+    id: int
+    image_url: str
+    content_hash: Optional[str]
+    image_type: str = 'regular'
+
+
+@dataclass(slots=True)
+class AdCard:
+    """Ad as posted to Telegram: text and regular images."""
+    id: int
+    ad_id: int
+    subject: Optional[str]
+    body: Optional[str]
+    list_time: Optional[int]
+    images: List[ImageView] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class AdText:
+    """Ad as seen by translation: text only."""
+    id: int
+    subject: Optional[str]
+    body: Optional[str]
+    list_time: Optional[int]
+    claim: Optional[str] = None  # lease token of claim_untranslated_ads()
+
+
+@dataclass(slots=True)
+class AdListing:
+    """Ad as returned by searches: headline, price, size and position."""
+    id: int
+    ad_id: int
+    subject: Optional[str]
+    price_string: Optional[str]
+    price: Optional[int]
+    price_unit: Optional[str]
+    price_per_m2: Optional[float]
+    size: Optional[int]
+    latitude: Optional[float]
+    longitude: Optional[float]
+    list_time: Optional[int]
+    distance_km: Optional[float] = None  # set by location searches
+
+
+@dataclass(slots=True)
+class ChangeEvent:
+    """Change of an ad waiting in the outbox, see DataProcessor._ad_events()."""
+    id: int
+    ad_pk: int
+    ad_id: int
+    kind: str
+    data: Optional[Dict[str, Any]]
+    created_at: datetime
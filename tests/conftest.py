@@ -0,0 +1,28 @@
+import copy
+import json
+from pathlib import Path
+
+import pytest
+
+from modules.DatabaseManager import DatabaseManager
+from modules.processor import DataProcessor
+
+SAMPLE_AD = json.loads((Path(__file__).parent.parent / "response.json").read_text(encoding="utf-8"))["ads"][0]
+
+
+@pytest.fixture
+def processor(tmp_path) -> DataProcessor:
+    db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'reeltor.db'}")
+    db_manager.create_tables()
+    return DataProcessor(db_manager)
+
+
+@pytest.fixture
+def make_ad():
+    """Copy of the sample ad with a new ad_id and no images or parameters, unless given."""
+    def make(ad_id: int, **fields):
+        ad = copy.deepcopy(SAMPLE_AD)
+        ad.update(ad_id=ad_id, list_id=ad_id, images=[], image_thumbnails=[], webp_image=None, params=[])
+        ad.update(fields)
+        return ad
+    return make
@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+from modules.rabbit.consumer import BatchConsumer
+
+
+class FakeMessage:
+    def __init__(self, body):
+        self.body = json.dumps(body).encode() if not isinstance(body, bytes) else body
+        self.settled = []
+
+    async def ack(self, multiple=False):
+        self.settled.append("ack")
+
+    async def reject(self, requeue=True):
+        self.settled.append("requeue" if requeue else "dead_letter")
+
+    async def nack(self, multiple=False, requeue=True):
+        self.settled.append("requeue" if requeue else "dead_letter")
+
+
+def consume(handler, messages, **kwargs):
+    consumer = BatchConsumer(None, "test", handler, batch_size=len(messages), retry_delay=0, **kwargs)
+
+    async def run():
+        for message in messages:
+            await consumer._on_message(message)
+
+    asyncio.run(run())
+    return [message.settled for message in messages]
+
+
+def test_batch_is_acked_once_after_the_handler():
+    handled = []
+    settled = consume(handled.append, [FakeMessage({"page": 1}), FakeMessage({"page": 2})])
+    assert handled == [[{"page": 1}, {"page": 2}]]
+    assert settled == [[], ["ack"]]
+
+
+def test_only_failing_messages_are_dead_lettered():
+    def handler(bodies):
+        if any(body.get("bad") for body in bodies):
+            raise ValueError("bad page")
+
+    settled = consume(handler, [FakeMessage({"page": 1}), FakeMessage({"bad": True}), FakeMessage(b"{")])
+    assert settled == [["ack"], ["dead_letter"], ["dead_letter"]]
+
+
+def test_transient_errors_requeue_the_batch():
+    async def handler(bodies):
+        raise ConnectionError("database down")
+
+    settled = consume(handler, [FakeMessage({"page": 1}), FakeMessage({"page": 2})])
+    assert settled == [["requeue"], ["requeue"]]
+
+
+def test_transient_error_of_a_single_message_requeues_the_rest():
+    def handler(bodies):
+        if len(bodies) > 1:
+            raise ValueError("bad page")
+        if bodies[0]["page"] == 2:
+            raise TimeoutError("lock timeout")
+
+    settled = consume(handler, [FakeMessage({"page": 1}), FakeMessage({"page": 2}), FakeMessage({"page": 3})])
+    assert settled == [["ack"], ["requeue"], ["requeue"]]
@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+import pytest
+
+from modules.geo import CELL_BITS, MAX_COVER_CELLS, bounding_box, cover, encode, encode_many, haversine_km
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash(cell: int) -> str:
+    return "".join(BASE32[(cell >> shift) & 31] for shift in range(CELL_BITS - 5, -1, -5))
+
+
+def test_encode_matches_geohash():
+    assert geohash(encode(57.64911, 10.40744)) == "u4pruydqq"
+    assert geohash(encode(10.7769, 106.7009)).startswith("w3gv")
+
+
+def test_encode_without_coordinates():
+    assert encode(None, 106.7) is None
+    assert encode(10.7, None) is None
+
+
+def test_encode_many_matches_encode():
+    rng = random.Random(1)
+    lats = [rng.uniform(-90, 90) for _ in range(1000)] + [None, 10.0]
+    lons = [rng.uniform(-180, 180) for _ in range(1000)] + [106.0, None]
+    assert encode_many(lats, lons) == [encode(lat, lon) for lat, lon in zip(lats, lons)]
+
+
+def test_encode_clamps_the_edges():
+    assert encode(90.0, 180.0) == (1 << CELL_BITS) - 1
+    assert encode(-90.0, -180.0) == 0
+
+
+@pytest.mark.parametrize("latitude, longitude, radius_km", [(10.7769, 106.7009, 0.5), (21.0285, 105.8542, 5.0), (10.0, 179.99, 20.0)])
+def test_cover_contains_every_point_of_the_box(latitude, longitude, radius_km):
+    box = bounding_box(latitude, longitude, radius_km)
+    ranges = cover(*box)
+    assert len(ranges) <= MAX_COVER_CELLS
+    assert all(low < high for low, high in ranges)
+    assert all(ranges[i][1] < ranges[i + 1][0] for i in range(len(ranges) - 1))
+
+    rng = random.Random(0)
+    min_lat, min_lon, max_lat, max_lon = box
+    for _ in range(2000):
+        cell = encode(rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon))
+        assert any(low <= cell < high for low, high in ranges)
+
+
+def test_haversine_km():
+    # Ho Chi Minh City to Hanoi
+    distances = haversine_km(10.7769, 106.7009, np.array([21.0285, 10.7769]), np.array([105.8542, 106.7009]))
+    assert distances[0] == pytest.approx(1140, rel=0.01)
+    assert distances[1] == 0
@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from modules.prices import RENT, SALE, parse_price_string, price_columns, price_columns_many
+
+
+@pytest.mark.parametrize(
+    "price_string, expected",
+    [
+        ("2,5 tỷ", (2_500_000_000, False, None)),
+        ("2.5 tỷ", (2_500_000_000, False, None)),
+        ("850 triệu", (850_000_000, False, None)),
+        ("2 tỷ 500 triệu", (2_500_000_000, False, None)),
+        ("1.500.000 đ", (1_500_000, False, None)),
+        ("500 nghìn/tháng", (500_000, False, RENT)),
+        ("12 triệu/năm", (1_000_000, False, RENT)),
+        ("50 triệu/m²", (50_000_000, True, None)),
+        ("50 triệu/m2", (50_000_000, True, None)),
+        ("0 đ/tháng", (None, False, RENT)),
+        ("Thỏa thuận", (None, False, None)),
+        ("15000000", (15_000_000, False, None)),
+        ("25 tr", (None, False, None)),
+        ("500k/tháng", (None, False, RENT)),
+    ],
+)
+def test_parse_price_string(price_string, expected):
+    assert parse_price_string(price_string) == expected
+
+
+def test_price_columns_sale():
+    assert price_columns("3 tỷ", 100, "s") == {"price": 3_000_000_000, "price_unit": SALE, "price_per_m2": 30_000_000}
+
+
+def test_price_columns_rent_by_ad_type():
+    assert price_columns("8 triệu", 40, "u") == {"price": 8_000_000, "price_unit": RENT, "price_per_m2": 200_000}
+
+
+def test_price_columns_per_m2_price():
+    assert price_columns("50 triệu/m²", 80) == {"price": 4_000_000_000, "price_unit": SALE, "price_per_m2": 50_000_000}
+
+
+def test_price_columns_per_m2_price_without_size():
+    assert price_columns("50 triệu/m²", None)["price"] is None
+
+
+def test_price_columns_missing_price():
+    assert price_columns(None, 50, "u") == {"price": None, "price_unit": RENT, "price_per_m2": None}
+
+
+def test_price_columns_many_matches_price_columns():
+    rng = random.Random(1)
+    strings = ["2,5 tỷ", "50 triệu/m²", "8 triệu", "0 đ/tháng", "12 triệu/năm", "Thỏa thuận", "25 tr", "", None]
+    price_strings = [rng.choice(strings) for _ in range(1000)]
+    sizes = [rng.choice([None, 0, 1, 45, 80, 250]) for _ in price_strings]
+    ad_types = [rng.choice(["s", "u", None]) for _ in price_strings]
+    expected = [price_columns(*ad) for ad in zip(price_strings, sizes, ad_types)]
+    assert price_columns_many(price_strings, sizes, ad_types) == expected
@@ -0,0 +1,159 @@
+from sqlalchemy import select, update
+
+from modules.models import Ad, AdImage
+from modules.processor import IMAGE_KEY
+
+
+def stored_images(processor, ad_id):
+    session = processor.db_manager.get_session()
+    try:
+        query = select(AdImage.id, AdImage.image_url).join(Ad, Ad.id == AdImage.ad_id_fk).where(Ad.ad_id == ad_id)
+        return dict(session.execute(query).all())
+    finally:
+        session.close()
+
+
+def test_sync_rows_writes_only_the_difference(processor, make_ad):
+    stats = processor.process_ads([make_ad(1, images=["a", "b", "c"])])
+    assert (stats["ads"], stats["images"], stats["images_removed"]) == (1, 3, 0)
+    before = stored_images(processor, 1)
+
+    stats = processor.process_ads([make_ad(1, images=["a", "d"])])
+    assert (stats["ads_updated"], stats["images"], stats["images_removed"]) == (1, 1, 2)
+    after = stored_images(processor, 1)
+    assert sorted(after.values()) == ["a", "d"]
+    # The unchanged row is kept, not deleted and inserted again
+    kept = next(row_id for row_id, url in before.items() if url == "a")
+    assert after[kept] == "a"
+
+
+def test_sync_rows_counts_duplicate_rows(processor, make_ad):
+    processor.process_ads([make_ad(1, images=["a", "a", "b"])])
+    stats = processor.process_ads([make_ad(1, images=["a", "b"])])
+    assert (stats["images"], stats["images_removed"]) == (0, 1)
+    assert sorted(stored_images(processor, 1).values()) == ["a", "b"]
+
+
+def test_sync_rows_directly(processor, make_ad):
+    processor.process_ads([make_ad(1), make_ad(2)])
+    session = processor.db_manager.get_session()
+    try:
+        pks = dict(session.execute(select(Ad.ad_id, Ad.id)).all())
+        row = {"image_url": "x", "thumbnail_url": None, "image_type": "regular"}
+        added, removed = processor._sync_rows(session, AdImage, IMAGE_KEY, {pks[1]: [row], pks[2]: [row, dict(row, image_url="y")]})
+        assert (added, removed) == (3, 0)
+        added, removed = processor._sync_rows(session, AdImage, IMAGE_KEY, {pks[1]: [], pks[2]: [row]})
+        assert (added, removed) == (0, 2)
+        session.commit()
+    finally:
+        session.close()
+
+
+def test_unchanged_ads_are_skipped(processor, make_ad):
+    ads = [make_ad(1, images=["a"], params=[{"id": "size", "value": "50", "label": "50 m²"}])]
+    processor.process_ads(ads)
+    stats = processor.process_ads(ads)
+    assert (stats["ads_unchanged"], stats["images"], stats["parameters"]) == (1, 0, 0)
+    assert processor.get_stats()["parameters"] == 1
+
+
+def test_one_by_one_path_syncs_children_of_updated_ads(processor, make_ad):
+    processor.process_response({"ads": [make_ad(1, images=["a", "b"])]}, bulk=False)
+    stats = processor.process_response({"ads": [make_ad(1, images=["b", "c"])]}, bulk=False)
+    assert (stats["ads_updated"], stats["images"], stats["images_removed"]) == (1, 1, 1)
+    assert sorted(stored_images(processor, 1).values()) == ["b", "c"]
+    # The per-ad path stored the same content hash as the bulk path
+    assert processor.process_ads([make_ad(1, images=["b", "c"])])["ads_unchanged"] == 1
+
+
+def test_one_by_one_path_isolates_failing_ads(processor, make_ad, monkeypatch):
+    process_ad = processor._process_ad
+
+    def fail_second(session, ad_data, account):
+        if ad_data["ad_id"] == 2:
+            raise RuntimeError("broken ad")
+        return process_ad(session, ad_data, account)
+
+    monkeypatch.setattr(processor, "_process_ad", fail_second)
+    stats = processor.process_response({"ads": [make_ad(1), make_ad(2), make_ad(3)]}, bulk=False)
+    assert (stats["ads"], stats["errors"]) == (2, 1)
+    assert processor.get_stats()["ads"] == 2
+
+
+def test_claims_only_let_their_owner_write(processor, make_ad):
+    processor.process_ads([make_ad(ad_id) for ad_id in range(1, 4)])
+    expired = processor.claim_untranslated_ads(3, lease_seconds=-1)
+    current = processor.claim_untranslated_ads(3)
+    assert {ad.id for ad in expired} == {ad.id for ad in current}
+
+    translation = {"subject": "Apartment", "body": "Nice"}
+    assert processor.save_translations({ad.id: translation for ad in expired}, expired[0].claim) == 0
+    assert processor.release_claims([ad.id for ad in expired], expired[0].claim) == 0
+
+    assert processor.save_translations({current[0].id: translation}, current[0].claim) == 1
+    assert processor.release_claims([ad.id for ad in current[1:]], current[0].claim) == 2
+    assert len(processor.get_untranslated_ads(10)) == 2
+
+
+def test_reingest_with_new_text_drops_the_claim(processor, make_ad):
+    for bulk in (True, False):
+        ad_id = 1 if bulk else 2
+        processor.process_ads([make_ad(ad_id, subject="Old")])
+        claimed = processor.claim_untranslated_ads(1)
+        assert [ad.subject for ad in claimed] == ["Old"]
+
+        if bulk:
+            processor.process_ads([make_ad(ad_id, subject="New")])
+        else:
+            processor.process_response({"ads": [make_ad(ad_id, subject="New")]}, bulk=False)
+        translation = {"subject": "T1", "body": "Nice"}
+        assert processor.save_translations({claimed[0].id: translation}, claimed[0].claim) == 0
+        assert [ad.subject for ad in processor.get_untranslated_ads(10) if ad.id == claimed[0].id] == ["New"]
+
+
+def test_updates_fill_missing_geo_cells(processor, make_ad):
+    for bulk in (True, False):
+        ad_id = 1 if bulk else 2
+        processor.process_response({"ads": [make_ad(ad_id, latitude=10.7769, longitude=106.7009)]}, bulk=bulk)
+        session = processor.db_manager.get_session()
+        session.execute(update(Ad).where(Ad.ad_id == ad_id).values(geo_cell=None))
+        session.commit()
+        session.close()
+        assert ad_id not in [ad.ad_id for ad in processor.find_ads_near(10.7769, 106.7009, 1)]
+
+        processor.process_response({"ads": [make_ad(ad_id, latitude=10.7769, longitude=106.7009, price_string="9 triệu")]}, bulk=bulk)
+        assert ad_id in [ad.ad_id for ad in processor.find_ads_near(10.7769, 106.7009, 1)]
+
+
+def test_moved_ads_are_found_at_their_new_place(processor, make_ad):
+    for bulk in (True, False):
+        ad_id = 1 if bulk else 2
+        processor.process_response({"ads": [make_ad(ad_id, latitude=10.7769, longitude=106.7009)]}, bulk=bulk)
+        processor.process_response({"ads": [make_ad(ad_id, latitude=21.0285, longitude=105.8542)]}, bulk=bulk)
+        assert ad_id not in [ad.ad_id for ad in processor.find_ads_near(10.7769, 106.7009, 1)]
+        assert ad_id in [ad.ad_id for ad in processor.find_ads_near(21.0285, 105.8542, 1)]
+
+
+def test_resized_ads_get_a_new_price_per_m2(processor, make_ad):
+    for bulk in (True, False):
+        ad_id = 1 if bulk else 2
+        processor.process_response({"ads": [make_ad(ad_id, price_string="50 triệu/m²", size=80)]}, bulk=bulk)
+        processor.process_response({"ads": [make_ad(ad_id, price_string="50 triệu/m²", size=100)]}, bulk=bulk)
+        session = processor.db_manager.get_session()
+        row = session.execute(select(Ad.size, Ad.price).where(Ad.ad_id == ad_id)).one()
+        session.close()
+        assert tuple(row) == (100, 5_000_000_000)
+
+
+def test_backfill_prices(processor, make_ad):
+    processor.process_ads([make_ad(1, price_string="3 tỷ", size=100), make_ad(2, price_string=None)])
+    session = processor.db_manager.get_session()
+    session.execute(update(Ad).values(price=None, price_unit=None, price_per_m2=None))
+    session.commit()
+    session.close()
+
+    assert processor.backfill_prices(batch_size=1) == 2
+    session = processor.db_manager.get_session()
+    rows = session.execute(select(Ad.ad_id, Ad.price, Ad.price_per_m2).order_by(Ad.ad_id)).all()
+    session.close()
+    assert [tuple(row) for row in rows] == [(1, 3_000_000_000, 30_000_000), (2, None, None)]
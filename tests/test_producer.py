@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from modules.rabbit.producer import Producer
+
+
+class FakeExchange:
+    def __init__(self):
+        self.published = []
+
+    async def publish(self, message, routing_key):
+        await asyncio.sleep(0)
+        self.published.append(routing_key)
+
+
+def open_producer(**kwargs):
+    producer = Producer(routing_key="test", **kwargs)
+    producer._exchange = FakeExchange()
+    return producer
+
+
+def test_publish_requires_an_open_producer():
+    async def run():
+        with pytest.raises(RuntimeError):
+            Producer().publish({"page": 1})
+        with pytest.raises(RuntimeError):
+            await Producer().flush()
+
+    asyncio.run(run())
+
+
+def test_flush_confirms_the_buffer():
+    async def run():
+        producer = open_producer()
+        futures = [producer.publish({"page": page}) for page in range(3)]
+        assert await producer.flush() == 3
+        await asyncio.gather(*futures)
+        assert producer._exchange.published == ["test"] * 3
+
+    asyncio.run(run())
+
+
+def test_close_fails_messages_it_cannot_send():
+    async def run():
+        producer = open_producer()
+        sent = producer.publish({"page": 1})
+        late = []
+
+        async def publish_while_closing():
+            await asyncio.sleep(0)
+            late.append(producer.publish({"page": 2}))
+
+        await asyncio.gather(producer.close(), publish_while_closing())
+        await sent
+        with pytest.raises(RuntimeError):
+            await asyncio.wait_for(late[0], timeout=1)
+
+    asyncio.run(run())
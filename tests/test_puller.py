@@ -0,0 +1,86 @@
+import asyncio
+import json
+import types
+
+import pytest
+
+from modules.puller import AdStreamParser, Puller
+
+RESPONSE = {
+    "total": 42,
+    "ads": [
+        {"ad_id": 1, "subject": "Căn hộ {1}", "price": 1_500_000, "params": [{"id": "size", "value": "50"}]},
+        {"ad_id": 2, "subject": "Nhà \"phố\"", "price": 2.5, "images": []},
+    ],
+    "filter_description": None,
+}
+
+
+def parse(body: str, chunk_size: int):
+    parser = AdStreamParser()
+    ads = []
+    for start in range(0, len(body), chunk_size):
+        ads.extend(parser.feed(body[start:start + chunk_size]))
+    ads.extend(parser.close())
+    return ads, parser.meta
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 64, 10_000])
+def test_parser_yields_every_ad_whatever_the_chunking(chunk_size):
+    ads, meta = parse(json.dumps(RESPONSE, ensure_ascii=False), chunk_size)
+    assert ads == RESPONSE["ads"]
+    assert meta == {"total": 42, "filter_description": None}
+
+
+def test_parser_returns_ads_before_the_body_ends():
+    body = json.dumps(RESPONSE)
+    parser = AdStreamParser()
+    ads = parser.feed(body[:body.index('{"ad_id": 2')])
+    assert [ad["ad_id"] for ad in ads] == [1]
+
+
+def test_parser_keeps_numbers_split_across_chunks():
+    ads, meta = parse('{"ads": [], "total": 12345}', 22)
+    assert ads == []
+    assert meta == {"total": 12345}
+
+
+def test_parser_rejects_truncated_body():
+    parser = AdStreamParser()
+    parser.feed('{"total": 1, "ads": [{"ad_id": 1}')
+    with pytest.raises(ValueError):
+        parser.close()
+
+
+def test_parser_rejects_non_object():
+    with pytest.raises(ValueError):
+        AdStreamParser().feed("[]")
+
+
+def test_newest_orders_by_list_time_then_ad_id():
+    ads = [{"list_time": 5, "ad_id": 1}, {"list_time": 7, "ad_id": 2}, {"list_time": 7, "ad_id": 3}]
+    assert Puller.newest(ads) == (7, 3)
+    assert Puller.newest(ads, (8, 0)) == (8, 0)
+    assert Puller.newest([]) is None
+
+
+def test_fetch_window_waits_for_cancelled_requests():
+    finished = []
+
+    async def fetch_page(session, page, sink):
+        try:
+            await asyncio.sleep(0 if page == 1 else 10)
+            return {"page": page}
+        finally:
+            finished.append(page)
+
+    async def run():
+        puller = Puller()
+        puller._session = types.SimpleNamespace(closed=False)
+        puller._fetch_page = fetch_page
+        window = puller._fetch_window(range(1, 5), concurrency=4)
+        assert await window.__anext__() == {"page": 1}
+        await window.aclose()
+        assert sorted(finished) == [1, 2, 3, 4]
+
+    asyncio.run(run())
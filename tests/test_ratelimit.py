@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+import pytest
+
+from modules.ratelimit import TokenBucket
+
+
+def test_burst_up_to_capacity_is_immediate():
+    bucket = TokenBucket(1.0, capacity=5)
+    started = time.monotonic()
+    asyncio.run(bucket.acquire(5))
+    assert time.monotonic() - started < 0.1
+
+
+def test_acquire_waits_for_refill():
+    bucket = TokenBucket(20.0, capacity=1)
+
+    async def run():
+        await bucket.acquire()
+        await bucket.acquire()
+
+    started = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - started >= 0.04
+
+
+def test_acquire_more_than_capacity_fails():
+    bucket = TokenBucket(2.0)
+    with pytest.raises(ValueError):
+        asyncio.run(asyncio.wait_for(bucket.acquire(7), timeout=1))
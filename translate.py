@@ -1,42 +1,83 @@
+from typing import Dict, List
 from modules.DatabaseManager import DatabaseManager
-from modules.gemini import Gemini
+from modules.gemini import AdResponse, Gemini, PROMPT_VERSION, TARGET_LANGUAGE, translation_key
+from modules.read_models import AdText
 from modules.processor import DataProcessor
-from google.genai.types import Schema, GenerateContentConfig
-from pydantic import BaseModel
-import json
+import argparse
+import asyncio
 
-class AdResponse(BaseModel):
-    subject: str
-    body: str
+
+async def translate_ads(processor: DataProcessor, gemini: Gemini, ads: List[AdText], batch_size: int = 10) -> Dict[str, int]:
+    """
+    Translate ads of one claim, serving texts already in the translation cache without a model call.
+    
+    Returns:
+        Dict[str, int]: "translated" ads, cache "hits" and "misses" counted per distinct text
+    """
+    keys = {ad.id: translation_key(ad.subject or "", ad.body or "") for ad in ads}
+    translations = processor.get_cached_translations(set(keys.values()))
+    hits = len(translations)
+    
+    # One model call per distinct text, reposts in the same run share it
+    sources: Dict[str, AdResponse] = {}
+    for ad in ads:
+        key = keys[ad.id]
+        if key not in translations and key not in sources:
+            sources[key] = AdResponse(id=ad.id, subject=ad.subject or "", body=ad.body or "")
+    
+    # Fresh ads first: newer list_time, lower priority value
+    priorities = {ad.id: -(ad.list_time or 0) for ad in ads}
+    results = await gemini.translate_ads(list(sources.values()), batch_size=batch_size, priorities=priorities)
+    fresh = {
+        key: {"subject": results[source.id].subject, "body": results[source.id].body}
+        for key, source in sources.items() if source.id in results
+    }
+    processor.cache_translations(fresh, TARGET_LANGUAGE, PROMPT_VERSION)
+    translations.update(fresh)
+    
+    claim = ads[0].claim
+    translated = processor.save_translations(
+        {ad.id: translations[keys[ad.id]] for ad in ads if keys[ad.id] in translations}, claim
+    )
+    # Hand failed ads back to the queue instead of waiting for their lease to expire
+    processor.release_claims([ad.id for ad in ads if keys[ad.id] not in translations], claim)
+    return {"translated": translated, "hits": hits, "misses": len(sources)}
 
 
-def translate():
-    db_manager = DatabaseManager()
+async def translate(limit: int = 500, claim_size: int = 50, batch_size: int = 10, concurrency: int = 4):
+    db_manager = DatabaseManager(profile="worker")
     
     # Initialize data processor
     processor = DataProcessor(db_manager)
-    ads = processor.get_recent_ads(5)
-    config = GenerateContentConfig(
-        temperature=0.8,
-        response_schema=AdResponse,
-        response_mime_type="application/json"
-    )
-    gemini = Gemini()
-    for _, ad in enumerate(ads):
-        try:
-            prompt = f"Translate this annonce in english: the anonce's title:'{ad.subject}'; 'the anonce body: {ad.body}'"
-            resp = gemini.generate(prompt, config)
-            dic = json.loads(resp)
-            if resp and dic.get("subject", "") and dic.get("body", ""):
-                dic["translated"] = True
-                processor._update_ad_fields(ad, dic, None)
-                print(f"ad {ad.id} translated!")
-            else:
-                print(f"ad {ad.id} failed translate!")
-        except Exception as e:
-            print(f"ERROR {e}")
+    gemini = Gemini(concurrency=concurrency)
+    totals = {"claimed": 0, "translated": 0, "hits": 0, "misses": 0}
+    
+    # Any number of workers can run this loop, each claim is leased to one of them
+    while totals["claimed"] < limit:
+        ads = processor.claim_untranslated_ads(min(claim_size, limit - totals["claimed"]))
+        if not ads:
+            break
+        stats = await translate_ads(processor, gemini, ads, batch_size)
+        totals["claimed"] += len(ads)
+        for key, value in stats.items():
+            totals[key] += value
+        if not stats["translated"]:
+            print("Nothing translated in the last claim, stopping")
             break
-        
-        
+    
+    print(f"{totals['translated']} of {totals['claimed']} claimed ads translated, cache hits: {totals['hits']}, misses: {totals['misses']}")
+    print(f"Gemini: {gemini.scheduler.stats()}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Translate untranslated ads into English with Gemini")
+    parser.add_argument("--limit", type=int, default=500, help="maximum number of ads to translate")
+    parser.add_argument("--claim-size", type=int, default=50, help="ads claimed from the queue at a time")
+    parser.add_argument("--batch-size", type=int, default=10, help="ads per Gemini request")
+    parser.add_argument("--concurrency", type=int, default=4, help="initial number of Gemini requests in flight, adapted to the quota")
+    return parser.parse_args()
+
+
 if __name__=="__main__":
-    translate()
\ No newline at end of file
+    args = parse_args()
+    asyncio.run(translate(args.limit, args.claim_size, args.batch_size, args.concurrency))